@@ -1,74 +1,155 @@
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-import plotly.figure_factory as ff
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from chat import (
     initialize_chat_session,
-    send_message_to_chatbot,
+    stream_message_to_chatbot,
     update_user_data,
     update_health_metrics,
+    import_health_metrics,
     set_reminder,
     detect_emergency,
     personalize_response,
     get_health_report,
     get_health_metrics_summary,
-    health_metrics_tracker  # Import the tracker to access DataFrame
+    get_health_metrics_tracker,  # Per-user tracker to access the DataFrame
+    get_tracker_registry
 )
-import logging
-from notifications import notification_manager, TWILIO_AVAILABLE
-import uuid
+from notifications import get_notification_manager, TWILIO_AVAILABLE
+from auth import get_auth_manager
+from metrics_rollup import MAX_CHART_POINTS
+from metrics_store import utc_now
+from caching import LRUCache
+from chat_context import ChatContextManager
+from reminder_dispatcher import ReminderDispatcher
+from outbox import NotificationOutbox
+from instrumentation import registry
+from logging_setup import configure_logging
 
 reminder_schedule = {} 
 
-# Configure logging
-logging.basicConfig(filename='app.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+# History windows offered on the dashboard; only the selected window is loaded from storage
+HISTORY_WINDOWS = {
+    "Last 7 Days": timedelta(days=7),
+    "Last 30 Days": timedelta(days=30),
+    "Last 90 Days": timedelta(days=90),
+    "All Time": None
+}
+
+# Dashboard figures kept in the process-wide cache, and the estimated bytes of data they may hold
+FIGURE_CACHE_MAX_ENTRIES = 64
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Chat messages rendered per transcript page
+CHAT_PAGE_SIZE = 20
+
+FIGURE_BUILD_SECONDS = registry.histogram(
+    'figure_build_seconds', 'Seconds to build a dashboard figure on a cache miss', ['viz_type']
+)
+
+# Log through a background writer thread; later reruns keep the running pipeline
+configure_logging()
 
 # Initialize Streamlit app
 st.set_page_config(page_title="Cardio-Health Assistant", layout="wide")
 st.title("Cardio-Health Assistant")
 st.write("Welcome to the Cardio Health Bot! This tool helps manage cardiovascular health by tracking health metrics, setting reminders, and providing personalized advice.")
 
+def authenticate_user():
+    """Return the signed-in user's ID, showing the sign-in form and stopping the run until there is one."""
+    auth_manager = get_auth_manager()
+    session_token = st.session_state.get('session_token')
+    user_id = auth_manager.validate_session(session_token) if session_token else None
+    if user_id is not None:
+        if st.sidebar.button("Log Out"):
+            auth_manager.logout(session_token)
+            st.session_state.clear()
+            st.experimental_rerun()
+        return user_id
+
+    st.session_state.pop('session_token', None)
+    sign_in, register = st.tabs(["Sign In", "Register"])
+    with sign_in:
+        with st.form("sign_in"):
+            username = st.text_input("Username")
+            password = st.text_input("Password", type="password")
+            if st.form_submit_button("Sign In"):
+                session_token = auth_manager.login(username, password)
+                if session_token:
+                    st.session_state.session_token = session_token
+                    st.experimental_rerun()
+                st.error("Invalid username or password")
+    with register:
+        with st.form("register"):
+            username = st.text_input("Username")
+            email = st.text_input("Email")
+            password = st.text_input("Password", type="password")
+            if st.form_submit_button("Register"):
+                if username and email and password and auth_manager.register_user(username, email, password):
+                    st.success("Account created. You can now sign in.")
+                else:
+                    st.error("Registration failed: fill in every field with an unused username and email")
+    st.stop()
+
+# Metrics, reminders and rollups are keyed on the account, so they are found again in later sessions
+user_id = authenticate_user()
+health_metrics_tracker = get_health_metrics_tracker(user_id)
+
 # Create tabs for different sections
 tab1, tab2, tab3 = st.tabs(["Health Metrics", "Chat", "Health Report"])
 
-# Add more visualization methods
-def create_health_metrics_dashboard(metrics_df):
-    """Create a comprehensive health metrics dashboard with multiple visualizations."""
-    st.subheader("Health Metrics Visualization")
-    
-    # Ensure timestamp is datetime
-    metrics_df['timestamp'] = pd.to_datetime(metrics_df['timestamp'])
-    
-    # Select visualization type
-    viz_type = st.selectbox("Select Visualization Type", [
-        "Time Series Trends", 
-        "Distribution Analysis", 
-        "Correlation Heatmap", 
-        "Box Plot Comparison"
-    ])
-    
-    # Metrics selection
-    numeric_columns = [col for col in metrics_df.columns if col not in ['timestamp', 'blood_pressure']]
-    selected_metrics = st.multiselect("Select Metrics", numeric_columns, default=numeric_columns[:3])
-    
-    if not selected_metrics:
-        st.warning("Please select at least one metric to visualize.")
-        return
-    
-    # Visualization logic based on selected type
+@st.cache_resource
+def start_notification_workers():
+    """Start the process-wide outbox workers and the dispatcher that queues due reminders."""
+    notification_manager = get_notification_manager()
+    outbox = NotificationOutbox(notification_manager.db_path).start()
+    dispatcher = ReminderDispatcher(notification_manager.db_path, send=outbox.enqueue_reminder).start()
+    notification_manager.reminder_listeners.append(dispatcher.wake)
+    return outbox
+
+notification_outbox = start_notification_workers()
+
+@st.cache_resource
+def get_figure_cache():
+    """Process-wide LRU cache of dashboard figures, shared across reruns and sessions."""
+    return LRUCache(max_entries=FIGURE_CACHE_MAX_ENTRIES, max_bytes=FIGURE_CACHE_MAX_BYTES, sizeof=figure_nbytes)
+
+def figure_nbytes(fig):
+    """Estimate a figure's size from the data points its traces embed, at 8 bytes per value."""
+    values = 0
+    for trace in fig.data:
+        for attr in ('x', 'y', 'z'):
+            data = getattr(trace, attr, None)
+            if data is not None:
+                values += np.size(data)
+    return values * 8
+
+def build_health_metrics_figure(tracker, viz_type, selected_metrics):
+    """Build the Plotly figure for a visualization type and set of metrics."""
     if viz_type == "Time Series Trends":
-        # Interactive time series line chart
+        # Interactive time series line chart, downsampled to a bounded number of points
         fig = go.Figure()
         for metric in selected_metrics:
+            series, resolution = tracker.get_time_series(metric, max_points=MAX_CHART_POINTS)
+            if resolution != 'raw':
+                # Shade the min/max envelope of each rollup bucket
+                fig.add_trace(go.Scatter(
+                    x=series['timestamp'], y=series['max'],
+                    mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'
+                ))
+                fig.add_trace(go.Scatter(
+                    x=series['timestamp'], y=series['min'],
+                    mode='lines', line=dict(width=0), fill='tonexty', opacity=0.2,
+                    showlegend=False, hoverinfo='skip'
+                ))
             fig.add_trace(go.Scatter(
-                x=metrics_df['timestamp'], 
-                y=metrics_df[metric], 
-                mode='lines+markers', 
-                name=metric
+                x=series['timestamp'], 
+                y=series['value'], 
+                mode='lines+markers' if resolution == 'raw' else 'lines', 
+                name=metric if resolution == 'raw' else f"{metric} ({resolution} mean)"
             ))
         fig.update_layout(
             title='Health Metrics Trends Over Time',
@@ -76,10 +157,13 @@ def create_health_metrics_dashboard(metrics_df):
             yaxis_title='Value',
             height=500
         )
-        st.plotly_chart(fig, use_container_width=True)
+        return fig
     
-    elif viz_type == "Distribution Analysis":
-        # Kernel Density Estimation (KDE) plot
+    metrics_df = tracker.metrics_df
+    
+    if viz_type == "Distribution Analysis":
+        # Kernel Density Estimation (KDE) plot; figure_factory is slow to import, so load it on demand
+        import plotly.figure_factory as ff
         fig = ff.create_distplot(
             [metrics_df[metric].dropna() for metric in selected_metrics],
             selected_metrics,
@@ -92,39 +176,75 @@ def create_health_metrics_dashboard(metrics_df):
             yaxis_title='Density',
             height=500
         )
-        st.plotly_chart(fig, use_container_width=True)
+        return fig
     
-    elif viz_type == "Correlation Heatmap":
+    if viz_type == "Correlation Heatmap":
         # Correlation heatmap
         corr_matrix = metrics_df[selected_metrics].corr()
-        fig = px.imshow(
+        return px.imshow(
             corr_matrix, 
             text_auto=True, 
             aspect="auto", 
             title="Correlation Between Health Metrics"
         )
-        st.plotly_chart(fig, use_container_width=True)
     
-    elif viz_type == "Box Plot Comparison":
-        # Box plot for comparing metric distributions
-        fig = go.Figure()
-        for metric in selected_metrics:
-            fig.add_trace(go.Box(y=metrics_df[metric], name=metric))
-        
-        fig.update_layout(
-            title='Box Plot: Health Metrics Distribution',
-            yaxis_title='Value',
-            height=500
-        )
-        st.plotly_chart(fig, use_container_width=True)
+    # Box plot for comparing metric distributions
+    fig = go.Figure()
+    for metric in selected_metrics:
+        fig.add_trace(go.Box(y=metrics_df[metric], name=metric))
+    
+    fig.update_layout(
+        title='Box Plot: Health Metrics Distribution',
+        yaxis_title='Value',
+        height=500
+    )
+    return fig
+
+# Add more visualization methods
+def create_health_metrics_dashboard(tracker):
+    """Create a comprehensive health metrics dashboard with multiple visualizations."""
+    st.subheader("Health Metrics Visualization")
+    
+    # Select visualization type
+    viz_type = st.selectbox("Select Visualization Type", [
+        "Time Series Trends", 
+        "Distribution Analysis", 
+        "Correlation Heatmap", 
+        "Box Plot Comparison"
+    ])
+    
+    # Metrics selection
+    numeric_columns = tracker.store.numeric_columns
+    selected_metrics = st.multiselect("Select Metrics", numeric_columns, default=numeric_columns[:3])
+    
+    if not selected_metrics:
+        st.warning("Please select at least one metric to visualize.")
+        return
+    
+    # Figures are keyed on the tracker's data version, which is never reused, so unchanged data skips rebuilding them
+    cache_key = (tracker.user_id, tracker.data_version, viz_type, tuple(selected_metrics))
+    
+    def build_figure():
+        with FIGURE_BUILD_SECONDS.labels(viz_type).time():
+            return build_health_metrics_figure(tracker, viz_type, selected_metrics)
+    
+    fig = get_figure_cache().get_or_set(cache_key, build_figure)
+    st.plotly_chart(fig, use_container_width=True)
 
 with tab1:
     st.header("Health Metrics Dashboard")
     
+    # Load only the selected history window into the dashboard
+    history_window = st.selectbox("History Window", list(HISTORY_WINDOWS), index=1)
+    if st.session_state.get('history_window') != history_window:
+        window = HISTORY_WINDOWS[history_window]
+        health_metrics_tracker.load_history(start=utc_now() - window if window else None)
+        st.session_state.history_window = history_window
+    
     # Display metrics summary
-    metrics_summary = get_health_metrics_summary()
+    metrics_summary = get_health_metrics_summary(user_id)
     
-    if metrics_summary and not health_metrics_tracker.metrics_df.empty:
+    if metrics_summary and len(health_metrics_tracker.store):
         # Existing metric cards
         col1, col2, col3 = st.columns(3)
         
@@ -140,9 +260,13 @@ with tab1:
                 st.metric("Heart Rate", "N/A", "")
         
         with col2:
-            st.metric("Blood Pressure", 
-                      str(metrics_summary.get('blood_pressure', {}).get('last', 'N/A')), 
-                      "")
+            bp_systolic_last = metrics_summary.get('bp_systolic', {}).get('last')
+            bp_diastolic_last = metrics_summary.get('bp_diastolic', {}).get('last')
+            
+            if bp_systolic_last is not None and bp_diastolic_last is not None:
+                st.metric("Blood Pressure", f"{bp_systolic_last:.0f}/{bp_diastolic_last:.0f}", "")
+            else:
+                st.metric("Blood Pressure", "N/A", "")
         
         with col3:
             bmi_last = metrics_summary.get('bmi', {}).get('last', 'N/A')
@@ -156,7 +280,7 @@ with tab1:
                 st.metric("BMI", "N/A", "")
         
         # New comprehensive visualization dashboard
-        create_health_metrics_dashboard(health_metrics_tracker.metrics_df)
+        create_health_metrics_dashboard(health_metrics_tracker)
     
     else:
         st.warning("No health metrics recorded yet. Start tracking your health by entering metrics in the sidebar!")
@@ -178,7 +302,6 @@ with tab1:
     # Blood Pressure
     bp_systolic = st.sidebar.number_input("Blood Pressure (Systolic)", min_value=0, max_value=300, step=1)
     bp_diastolic = st.sidebar.number_input("Blood Pressure (Diastolic)", min_value=0, max_value=200, step=1)
-    blood_pressure = f"{bp_systolic}/{bp_diastolic}"
     
     # Cholesterol
     cholesterol_total = st.sidebar.number_input("Total Cholesterol", min_value=0, max_value=500, step=1)
@@ -200,7 +323,9 @@ with tab1:
         # Update health metrics
         update_health_metrics(
             'heart_rate', heart_rate,
-            blood_pressure=blood_pressure,
+            user_id=user_id,
+            bp_systolic=bp_systolic,
+            bp_diastolic=bp_diastolic,
             cholesterol_total=cholesterol_total,
             cholesterol_ldl=cholesterol_ldl,
             cholesterol_hdl=cholesterol_hdl,
@@ -211,6 +336,21 @@ with tab1:
         )
         st.sidebar.success("Health metrics updated successfully!")
 
+    # Bulk import of device exports (Apple Health / Fitbit style)
+    st.sidebar.header("Import Device Data")
+    export_file = st.sidebar.file_uploader("CSV or NDJSON export", type=["csv", "ndjson", "jsonl", "json"])
+    if export_file is not None and st.sidebar.button("Import Health Data"):
+        try:
+            result = import_health_metrics(export_file, user_id=user_id)
+            # Reload the selected dashboard window on the next run
+            st.session_state.history_window = None
+            st.sidebar.success(
+                f"Imported {result.rows_imported:,} readings ({result.rows_rejected:,} rejected) "
+                f"at {result.rows_per_sec:,.0f} rows/sec"
+            )
+        except ValueError as e:
+            st.sidebar.error(f"Could not import file: {e}")
+
     # Reminders and Alerts
     st.sidebar.header("Reminders")
     medication_reminder = st.sidebar.checkbox("Medication Reminder")
@@ -234,45 +374,80 @@ with tab1:
     # Add Medication Reminder Button
     if st.sidebar.button("Add Medication Reminder"):
         if medication_name and medication_dosage and contact_info:
-            # Generate a unique user ID (in a real app, this would come from user authentication)
-            user_id = str(uuid.uuid4())
-            
             # Add reminder to database
-            reminder_id = notification_manager.add_medication_reminder(
+            reminder_id = get_notification_manager().add_medication_reminder(
                 user_id, 
                 medication_name, 
                 medication_dosage, 
-                reminder_frequency
+                reminder_frequency,
+                contact_method=contact_method,
+                contact_info=contact_info
             )
             
-            # Send initial notification
+            # Queue the initial notification; outbox workers deliver it in the background
             reminder_message = f"Reminder: Take {medication_name} ({medication_dosage})"
             
-            if contact_method in ["Email", "Both"]:
-                notification_manager.send_email_reminder(contact_info, "Medication Reminder", reminder_message)
-            
-            if contact_method in ["SMS", "Both"]:
-                if not TWILIO_AVAILABLE:
-                    st.sidebar.warning("Twilio module not installed. SMS notifications are unavailable.")
-                else:
-                    notification_manager.send_sms_reminder(contact_info, reminder_message)
+            if contact_method in ["SMS", "Both"] and not TWILIO_AVAILABLE:
+                st.sidebar.warning("Twilio is not configured. SMS notifications are unavailable.")
+            notification_outbox.enqueue_for_contact(
+                contact_method, contact_info, reminder_message,
+                idempotency_key=f"reminder:{reminder_id}:initial"
+            )
             
             st.sidebar.success(f"Medication reminder set for {medication_name}")
         else:
             st.sidebar.error("Please fill in all medication reminder details")
 
+    # Outbound notification queue health
+    with st.sidebar.expander("Notification Queue"):
+        outbox_stats = notification_outbox.stats()
+        st.metric("Queued", outbox_stats['depth'])
+        st.metric("Failed (dead-lettered)", outbox_stats['dead_letters'])
+        if outbox_stats['drain_latency_p50'] is not None:
+            st.metric("Delivery latency p50 (s)", f"{outbox_stats['drain_latency_p50']:.1f}")
+    
+    # Hot-path timings recorded in this process
+    with st.sidebar.expander("Performance"):
+        timings = [
+            {
+                'metric': name + ''.join(f" {value}" for value in sample['labels'].values()),
+                'calls': sample['count'],
+                'mean ms': sample['mean'] * 1000 if sample['mean'] is not None else None,
+                'p99 ms': sample['p99'] * 1000 if sample['p99'] is not None else None,
+            }
+            for name, metric in registry.to_dict().items() if metric['type'] == 'histogram'
+            for sample in metric['samples'] if sample['count']
+        ]
+        if timings:
+            st.dataframe(pd.DataFrame(timings), hide_index=True)
+        else:
+            st.write("No timings recorded yet.")
+        trackers = get_tracker_registry().stats()
+        st.caption(
+            f"Trackers: {trackers['resident']} in memory "
+            f"({trackers['resident_bytes'] / 2**20:.1f} of {trackers['memory_budget'] / 2**20:.0f} MiB), "
+            f"{trackers['spilled']} on disk; {trackers['hits']} hits, {trackers['reloads']} reloads, "
+            f"{trackers['misses']} misses, {trackers['evictions']} evictions"
+        )
+
 with tab2:
     # Chat interface (existing code remains the same)
     st.header("AI Health Assistant")
     
-    # Initialize chat session
+    # Initialize chat session and its token-budgeted context
     if 'chat_session' not in st.session_state:
         st.session_state.chat_session = initialize_chat_session()
+        st.session_state.chat_context = ChatContextManager()
+        st.session_state.chat_pages = 1
+    chat_context = st.session_state.chat_context
 
-    # Display chat messages
-    for message in st.session_state.chat_session.history:
-        with st.chat_message(message.role):
-            st.markdown(message.parts[0].text)
+    # Display only the most recent pages of the transcript
+    if st.session_state.chat_pages < chat_context.page_count(CHAT_PAGE_SIZE):
+        if st.button("Show earlier messages"):
+            st.session_state.chat_pages += 1
+    for role, text in chat_context.page(st.session_state.chat_pages, CHAT_PAGE_SIZE):
+        with st.chat_message(role):
+            st.markdown(text)
 
     # Chat input
     user_input = st.chat_input("Ask me anything about your cardiovascular health")
@@ -281,19 +456,24 @@ with tab2:
         with st.chat_message("user"):
             st.markdown(user_input)
 
-        # Get AI response
-        response = send_message_to_chatbot(st.session_state.chat_session, user_input)
-        
-        # Display AI response
+        # Stream the AI response, rendering partial text as it arrives
         with st.chat_message("assistant"):
-            st.markdown(response)
+            placeholder = st.empty()
+            response = ""
+            for chunk in stream_message_to_chatbot(st.session_state.chat_session, user_input):
+                response += chunk
+                placeholder.markdown(response + "▌")
+            placeholder.markdown(response)
+        
+        # Keep the model-facing history within budget
+        chat_context.record_exchange(st.session_state.chat_session, user_input, response)
 
 with tab3:
     # Health Report Section
     st.header("Comprehensive Health Report")
     
     # Generate and display health report
-    health_report = get_health_report()
+    health_report = get_health_report(user_id)
     st.text_area("Detailed Health Metrics Report", health_report, height=400)
     
     # Option to download report
@@ -305,7 +485,7 @@ with tab3:
     )
 
 # Emergency detection
-emergency_alert = detect_emergency()
+emergency_alert = detect_emergency(user_id)
 if emergency_alert:
     st.error(emergency_alert)
 
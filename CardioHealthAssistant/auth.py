@@ -1,22 +1,54 @@
+import asyncio
 import sqlite3
-import hashlib
-import os
+import logging
+import threading
 import uuid
 from datetime import datetime, timedelta
 
+from caching import LazySingleton, LRUCache
+from db_pool import SQLITE_QUERY_SECONDS, SQLiteConnectionPool
+from instrumentation import timed
+from password_hashing import LEGACY_ITERATIONS, PasswordHasher
+
+# Validated session tokens kept in memory. Entries expire with their session,
+# or after SESSION_CACHE_TTL so logouts made by other processes are seen promptly.
+SESSION_CACHE_MAX_ENTRIES = 10000
+SESSION_CACHE_TTL = 300
+
+# How often expired sessions are deleted, and how many rows per delete transaction
+SESSION_SWEEP_INTERVAL = 600
+SESSION_SWEEP_BATCH_SIZE = 1000
+
 class UserAuthentication:
-    def __init__(self, db_path='users.db'):
+    def __init__(self, db_path='users.db', sweep_interval=SESSION_SWEEP_INTERVAL, hasher=None):
         """
         Initialize user authentication system with SQLite database.
         
         :param db_path: Path to SQLite database file
+        :param sweep_interval: Seconds between expired-session sweeps; None disables the sweeper
+        :param hasher: PasswordHasher to use; defaults to one at DEFAULT_ITERATIONS
         """
-        self.conn = sqlite3.connect(db_path)
+        self.pool = SQLiteConnectionPool(db_path)
+        self.hasher = hasher or PasswordHasher()
         self.create_tables()
+        
+        self.session_cache = LRUCache(max_entries=SESSION_CACHE_MAX_ENTRIES, ttl=SESSION_CACHE_TTL)
+        # Tokens logged out recently; a validation that read the session row before it was deleted must not re-cache it
+        self._revoked_sessions = LRUCache(max_entries=SESSION_CACHE_MAX_ENTRIES, ttl=SESSION_CACHE_TTL)
+        self._session_cache_lock = threading.Lock()
+        
+        # Background thread that keeps the sessions table bounded
+        self._stop_sweeper = threading.Event()
+        self._sweeper = None
+        if sweep_interval:
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,),
+                                             name='session-sweeper', daemon=True)
+            self._sweeper.start()
 
     def create_tables(self):
         """Create necessary tables for user management."""
-        cursor = self.conn.cursor()
+        conn = self.pool.connection()
+        cursor = conn.cursor()
         
         # Users table
         cursor.execute('''
@@ -27,10 +59,16 @@ class UserAuthentication:
                 password_hash TEXT NOT NULL,
                 salt TEXT NOT NULL,
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                last_login DATETIME
+                last_login DATETIME,
+                hash_iterations INTEGER
             )
         ''')
         
+        # Record each user's PBKDF2 cost; older rows fall back to LEGACY_ITERATIONS
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(users)')}
+        if 'hash_iterations' not in columns:
+            cursor.execute('ALTER TABLE users ADD COLUMN hash_iterations INTEGER')
+        
         # User sessions table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS sessions (
@@ -42,27 +80,13 @@ class UserAuthentication:
             )
         ''')
         
-        self.conn.commit()
-
-    def _hash_password(self, password, salt=None):
-        """
-        Hash password with salt.
-        
-        :param password: Plain text password
-        :param salt: Optional salt, generated if not provided
-        :return: Tuple of (hashed_password, salt)
-        """
-        if salt is None:
-            salt = os.urandom(32)  # 32 bytes = 256 bits
-        
-        pwd_hash = hashlib.pbkdf2_hmac(
-            'sha256',  # Hash digest algorithm
-            password.encode('utf-8'),
-            salt,
-            100000  # Number of iterations
-        )
+        # Lets the sweeper find expired sessions without scanning the table
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sessions_expires_at
+            ON sessions (expires_at)
+        ''')
         
-        return pwd_hash, salt
+        conn.commit()
 
     def register_user(self, username, email, password):
         """
@@ -73,27 +97,34 @@ class UserAuthentication:
         :param password: User's password
         :return: User ID or None if registration fails
         """
+        pwd_hash, salt, iterations = self.hasher.hash(password)
+        return self._insert_user(username, email, pwd_hash, salt, iterations)
+
+    async def register_user_async(self, username, email, password):
+        """Async ``register_user``: hashing and database work stay off the event loop."""
+        pwd_hash, salt, iterations = await self.hasher.hash_async(password)
+        return await asyncio.to_thread(self._insert_user, username, email, pwd_hash, salt, iterations)
+
+    @timed(SQLITE_QUERY_SECONDS, 'auth.insert_user')
+    def _insert_user(self, username, email, pwd_hash, salt, iterations):
         try:
-            # Check if username or email already exists
-            cursor = self.conn.cursor()
-            cursor.execute('SELECT * FROM users WHERE username = ? OR email = ?', (username, email))
-            if cursor.fetchone():
-                return None
-            
             # Generate user ID
             user_id = str(uuid.uuid4())
             
-            # Hash password
-            pwd_hash, salt = self._hash_password(password)
-            
-            # Insert user
-            cursor.execute('''
-                INSERT INTO users 
-                (id, username, email, password_hash, salt) 
-                VALUES (?, ?, ?, ?, ?)
-            ''', (user_id, username, email, pwd_hash, salt))
+            with self.pool.transaction() as conn:
+                # Check if username or email already exists
+                cursor = conn.cursor()
+                cursor.execute('SELECT 1 FROM users WHERE username = ? OR email = ?', (username, email))
+                if cursor.fetchone():
+                    return None
+                
+                # Insert user; hash and salt are stored hex-encoded
+                cursor.execute('''
+                    INSERT INTO users 
+                    (id, username, email, password_hash, salt, hash_iterations) 
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (user_id, username, email, pwd_hash.hex(), salt.hex(), iterations))
             
-            self.conn.commit()
             return user_id
         
         except sqlite3.Error as e:
@@ -104,46 +135,91 @@ class UserAuthentication:
         """
         Authenticate user and create a session.
         
+        Hashes stored below the current iteration count are upgraded
+        transparently once the password has been verified.
+        
         :param username: Username
         :param password: Password
         :return: Session token or None if login fails
         """
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-        user = cursor.fetchone()
+        credentials = self._fetch_credentials(username)
+        if not credentials:
+            return None
         
-        if not user:
+        user_id, pwd_hash, salt, iterations = credentials
+        if not self.hasher.verify(password, salt, pwd_hash, iterations):
             return None
         
-        # Unpack user data
-        user_id, db_username, email, db_pwd_hash, salt, created_at, last_login = user
+        if self.hasher.needs_rehash(iterations):
+            self._store_password_hash(user_id, *self.hasher.hash(password))
+        return self._create_session(user_id)
+
+    async def login_async(self, username, password):
+        """Async ``login``: hashing and database work stay off the event loop."""
+        credentials = await asyncio.to_thread(self._fetch_credentials, username)
+        if not credentials:
+            return None
         
-        # Verify password
-        pwd_hash, _ = self._hash_password(password, bytes.fromhex(salt))
+        user_id, pwd_hash, salt, iterations = credentials
+        if not await self.hasher.verify_async(password, salt, pwd_hash, iterations):
+            return None
         
-        if pwd_hash != bytes.fromhex(db_pwd_hash):
+        if self.hasher.needs_rehash(iterations):
+            new_hash = await self.hasher.hash_async(password)
+            await asyncio.to_thread(self._store_password_hash, user_id, *new_hash)
+        return await asyncio.to_thread(self._create_session, user_id)
+
+    @timed(SQLITE_QUERY_SECONDS, 'auth.fetch_credentials')
+    def _fetch_credentials(self, username):
+        """Return (user_id, hash, salt, iterations) for a username, or None."""
+        cursor = self.pool.connection().cursor()
+        cursor.execute('''
+            SELECT id, password_hash, salt, hash_iterations FROM users WHERE username = ?
+        ''', (username,))
+        user = cursor.fetchone()
+        if not user:
             return None
         
+        user_id, pwd_hash, salt, iterations = user
+        return user_id, _decode(pwd_hash), _decode(salt), iterations or LEGACY_ITERATIONS
+
+    @timed(SQLITE_QUERY_SECONDS, 'auth.store_password_hash')
+    def _store_password_hash(self, user_id, pwd_hash, salt, iterations):
+        with self.pool.transaction() as conn:
+            conn.execute('''
+                UPDATE users 
+                SET password_hash = ?, salt = ?, hash_iterations = ? 
+                WHERE id = ?
+            ''', (pwd_hash.hex(), salt.hex(), iterations, user_id))
+
+    @timed(SQLITE_QUERY_SECONDS, 'auth.create_session')
+    def _create_session(self, user_id):
         # Create session token
         session_token = str(uuid.uuid4())
         session_expires = datetime.now() + timedelta(hours=24)  # Token valid for 24 hours
         
-        cursor.execute('''
-            INSERT INTO sessions 
-            (user_id, session_token, expires_at) 
-            VALUES (?, ?, ?)
-        ''', (user_id, session_token, session_expires))
-        
-        # Update last login
-        cursor.execute('''
-            UPDATE users 
-            SET last_login = ? 
-            WHERE id = ?
-        ''', (datetime.now(), user_id))
+        with self.pool.transaction() as conn:
+            conn.execute('''
+                INSERT INTO sessions 
+                (user_id, session_token, expires_at) 
+                VALUES (?, ?, ?)
+            ''', (user_id, session_token, session_expires))
+            
+            # Update last login
+            conn.execute('''
+                UPDATE users 
+                SET last_login = ? 
+                WHERE id = ?
+            ''', (datetime.now(), user_id))
         
-        self.conn.commit()
+        self._cache_session(session_token, user_id, session_expires)
         return session_token
 
+    def _cache_session(self, session_token, user_id, expires_at):
+        remaining = (expires_at - datetime.now()).total_seconds()
+        if remaining > 0:
+            self.session_cache.set(session_token, user_id, ttl=min(remaining, SESSION_CACHE_TTL))
+
     def validate_session(self, session_token):
         """
         Validate an existing session.
@@ -151,28 +227,103 @@ class UserAuthentication:
         :param session_token: Session token to validate
         :return: User ID if valid, None otherwise
         """
-        cursor = self.conn.cursor()
+        user_id = self.session_cache.get(session_token)
+        if user_id is not None:
+            return user_id
+        return self._fetch_session(session_token)
+
+    # Only the database fallback is timed, so in-memory cache hits don't skew the SQLite latency histogram
+    @timed(SQLITE_QUERY_SECONDS, 'auth.validate_session')
+    def _fetch_session(self, session_token):
+        cursor = self.pool.connection().cursor()
         cursor.execute('''
-            SELECT user_id FROM sessions 
+            SELECT user_id, expires_at FROM sessions 
             WHERE session_token = ? AND expires_at > ?
         ''', (session_token, datetime.now()))
         
         result = cursor.fetchone()
-        return result[0] if result else None
+        if not result:
+            return None
+        with self._session_cache_lock:
+            if session_token in self._revoked_sessions:
+                return None
+            self._cache_session(session_token, result[0], datetime.fromisoformat(result[1]))
+        return result[0]
 
+    @timed(SQLITE_QUERY_SECONDS, 'auth.logout')
     def logout(self, session_token):
         """
         Invalidate a session.
         
         :param session_token: Session token to invalidate
         """
-        cursor = self.conn.cursor()
-        cursor.execute('DELETE FROM sessions WHERE session_token = ?', (session_token,))
-        self.conn.commit()
+        with self.pool.transaction() as conn:
+            conn.execute('DELETE FROM sessions WHERE session_token = ?', (session_token,))
+        # Evict only once the row is gone, and tombstone the token so a concurrent lookup can't cache it again
+        with self._session_cache_lock:
+            self._revoked_sessions.set(session_token, True)
+            self.session_cache.pop(session_token)
+
+    @timed(SQLITE_QUERY_SECONDS, 'auth.get_user')
+    def get_user(self, user_id):
+        """
+        Look up a user's account details.
+        
+        :param user_id: User ID
+        :return: Tuple of (id, username, email) or None if not found
+        """
+        cursor = self.pool.connection().cursor()
+        cursor.execute('SELECT id, username, email FROM users WHERE id = ?', (user_id,))
+        return cursor.fetchone()
+
+    @timed(SQLITE_QUERY_SECONDS, 'auth.sweep_expired_sessions')
+    def sweep_expired_sessions(self, batch_size=SESSION_SWEEP_BATCH_SIZE):
+        """
+        Delete expired sessions in short batched transactions.
+        
+        :param batch_size: Rows deleted per transaction
+        :return: Number of sessions deleted
+        """
+        deleted = 0
+        now = datetime.now()
+        while True:
+            with self.pool.transaction() as conn:
+                cursor = conn.execute('''
+                    DELETE FROM sessions WHERE rowid IN (
+                        SELECT rowid FROM sessions WHERE expires_at <= ? LIMIT ?
+                    )
+                ''', (now, batch_size))
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                return deleted
+
+    def _sweep_loop(self, interval):
+        while not self._stop_sweeper.wait(interval):
+            try:
+                deleted = self.sweep_expired_sessions()
+                if deleted:
+                    logging.info(f"Deleted {deleted} expired sessions")
+            except sqlite3.Error as e:
+                logging.error(f"Session sweep failed: {e}")
 
     def close(self):
-        """Close database connection."""
-        self.conn.close()
+        """Stop the session sweeper and close pooled database connections and hashing workers."""
+        self._stop_sweeper.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+        self.pool.close_all()
+        self.hasher.close()
+
+
+def _decode(value):
+    """Stored hashes and salts are hex text; very early rows stored raw bytes."""
+    return value if isinstance(value, bytes) else bytes.fromhex(value)
+
+# Global authentication manager, created on first use
+get_auth_manager = LazySingleton(UserAuthentication)
+
 
-# Global authentication manager
-auth_manager = UserAuthentication()
+def __getattr__(name):
+    if name == 'auth_manager':
+        return get_auth_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,87 @@
+# benchmarks/bench_emergency.py
+"""
+Emergency detection throughput in readings/sec.
+
+Generates a synthetic multi-user stream (heart rate plus blood pressure)
+and runs EmergencyDetector over it per reading, as one batch, and
+incrementally in chunks as a streaming consumer would.
+
+Usage:
+    python benchmarks/bench_emergency.py [--readings 1000000] [--users 1000] [--chunk 10000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emergency_detection import EmergencyDetector  # noqa: E402
+
+
+def synthetic_stream(n, users, seed=0):
+    """Readings ~1/min per user with occasional tachycardia and hypertensive spikes."""
+    rng = np.random.default_rng(seed)
+    keys = np.array([f"user-{i}" for i in range(users)], dtype=object)[rng.integers(0, users, n)]
+    start = np.datetime64('2024-01-01T00:00:00', 'ns')
+    timestamps = start + np.sort(rng.integers(0, n // users * 60 * 10**9 + 1, n)).astype('timedelta64[ns]')
+    heart_rate = rng.normal(85, 20, n)
+    heart_rate[rng.random(n) < 0.05] = np.nan
+    columns = {
+        'heart_rate': heart_rate,
+        'bp_systolic': rng.normal(130, 20, n),
+        'bp_diastolic': rng.normal(85, 12, n),
+    }
+    return timestamps, columns, keys
+
+
+def report(label, n, elapsed, alerts):
+    print(f"{label:<28} {n:>10,} readings in {elapsed:7.3f}s = {n / elapsed:>12,.0f} readings/s ({alerts:,} alerts)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readings', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--chunk', type=int, default=10_000)
+    parser.add_argument('--scalar-readings', type=int, default=100_000,
+                        help='Readings used for the per-reading loop, which is much slower')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    timestamps, columns, keys = synthetic_stream(args.readings, args.users)
+
+    n = min(args.scalar_readings, args.readings)
+    detector = EmergencyDetector()
+    rows = [{metric: values[i] for metric, values in columns.items()} for i in range(n)]
+    start = time.perf_counter()
+    alerts = sum(len(detector.update(keys[i], timestamps[i], rows[i])) for i in range(n))
+    report('per reading (update)', n, time.perf_counter() - start, alerts)
+
+    def single_batch():
+        return len(EmergencyDetector().process(timestamps, columns, keys))
+
+    def incremental():
+        detector = EmergencyDetector()
+        alerts = 0
+        for lo in range(0, args.readings, args.chunk):
+            chunk = slice(lo, lo + args.chunk)
+            alerts += len(detector.process(timestamps[chunk], {m: v[chunk] for m, v in columns.items()}, keys[chunk]))
+        return alerts
+
+    for label, run in [('single batch (process)', single_batch),
+                       (f"incremental ({args.chunk:,}/chunk)", incremental)]:
+        # Best of several runs; the first pays for page-faulting fresh arrays
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            alerts = run()
+            best = min(best, time.perf_counter() - start)
+        report(label, args.readings, best, alerts)
+
+
+if __name__ == '__main__':
+    main()
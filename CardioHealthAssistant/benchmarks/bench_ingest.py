@@ -0,0 +1,93 @@
+# benchmarks/bench_ingest.py
+"""
+Ingest throughput benchmark for HealthMetricsTracker.
+
+Usage:
+    python benchmarks/bench_ingest.py [--sizes 10000 100000 1000000] [--baseline]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat import HealthMetricsTracker  # noqa: E402
+from metrics_store import METRIC_COLUMNS  # noqa: E402
+
+
+def synthetic_readings(n, seed=0):
+    """Yield ``n`` synthetic metric readings as keyword dicts."""
+    rng = np.random.default_rng(seed)
+    heart_rate = rng.normal(72, 10, n)
+    systolic = rng.normal(120, 12, n)
+    diastolic = rng.normal(80, 8, n)
+    weight = rng.normal(75, 12, n)
+    for i in range(n):
+        yield {
+            'heart_rate': float(heart_rate[i]),
+            'bp_systolic': float(systolic[i]),
+            'bp_diastolic': float(diastolic[i]),
+            'blood_sugar': 95.0,
+            'weight': float(weight[i]),
+            'height': 1.75,
+            'exercise_minutes': 30,
+        }
+
+
+def bench_tracker(n):
+    """Return rows/sec for ``n`` appends through HealthMetricsTracker."""
+    tracker = HealthMetricsTracker()
+    readings = list(synthetic_readings(n))
+    start = time.perf_counter()
+    for reading in readings:
+        tracker.add_metric(**reading)
+    elapsed = time.perf_counter() - start
+
+    materialize_start = time.perf_counter()
+    df = tracker.metrics_df
+    materialize = time.perf_counter() - materialize_start
+    assert len(df) == n
+    return n / elapsed, elapsed, materialize
+
+
+def bench_concat_baseline(n):
+    """Return rows/sec for the previous ``pd.concat``-per-reading approach."""
+    df = pd.DataFrame(columns=['timestamp'] + METRIC_COLUMNS)
+    readings = list(synthetic_readings(n))
+    start = time.perf_counter()
+    for reading in readings:
+        entry = {'timestamp': pd.Timestamp.now(), **reading}
+        df = pd.concat([df, pd.DataFrame([entry])], ignore_index=True)
+    elapsed = time.perf_counter() - start
+    return n / elapsed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--baseline', action='store_true',
+                        help='Also time the pd.concat baseline (capped at 10k rows)')
+    args = parser.parse_args()
+
+    # Keep per-reading log I/O out of the measurement
+    logging.disable(logging.INFO)
+
+    print(f"{'rows':>10} {'rows/sec':>12} {'ingest (s)':>11} {'to_df (s)':>10}")
+    for n in args.sizes:
+        rate, elapsed, materialize = bench_tracker(n)
+        print(f"{n:>10} {rate:>12,.0f} {elapsed:>11.2f} {materialize:>10.3f}")
+
+    if args.baseline:
+        n = min(10_000, min(args.sizes))
+        rate, elapsed = bench_concat_baseline(n)
+        print(f"\npd.concat baseline: {n} rows at {rate:,.0f} rows/sec ({elapsed:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_instrumentation.py
+"""
+Overhead of the instrumentation layer, enabled and disabled.
+
+Reports nanoseconds per call for a trivial function bare, wrapped by
+``timed``, and for counter increments, then the cost of instrumentation
+on HealthMetricsTracker.add_metric and of the sampling profiler on a
+CPU-bound loop.
+
+Usage:
+    python benchmarks/bench_instrumentation.py [--calls 1000000] [--readings 50000]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat import HealthMetricsTracker  # noqa: E402
+from instrumentation import MetricsRegistry, SamplingProfiler, registry, timed  # noqa: E402
+
+
+def per_call_ns(func, calls, repeat):
+    return min(timeit.repeat(func, number=calls, repeat=repeat)) / calls * 1e9
+
+
+def bench_add_metric(readings, repeat):
+    """Best seconds to append ``readings`` readings through a fresh tracker."""
+    best = float('inf')
+    for _ in range(repeat):
+        tracker = HealthMetricsTracker()
+        start = time.perf_counter()
+        for i in range(readings):
+            tracker.add_metric(heart_rate=70.0 + i % 30, bp_systolic=120.0, bp_diastolic=80.0)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def cpu_work():
+    total = 0
+    for i in range(2_000_000):
+        total += i * i
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=1_000_000)
+    parser.add_argument('--readings', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    local = MetricsRegistry()
+    histogram = local.histogram('bench_seconds', 'Benchmark timer')
+    counter = local.counter('bench_total', 'Benchmark counter')
+
+    def noop():
+        return None
+
+    timed_noop = timed(histogram)(noop)
+
+    print(f"{'per call':<34} {'disabled ns':>12} {'enabled ns':>12}")
+    bare = per_call_ns(noop, args.calls, args.repeat)
+    print(f"{'bare function':<34} {bare:>12.0f} {bare:>12.0f}")
+    for label, func in [('@timed function', timed_noop), ('counter.inc()', counter.inc)]:
+        local.enabled = False
+        disabled = per_call_ns(func, args.calls, args.repeat)
+        local.enabled = True
+        enabled = per_call_ns(func, args.calls, args.repeat)
+        print(f"{label:<34} {disabled:>12.0f} {enabled:>12.0f}")
+
+    registry.enabled = False
+    disabled = bench_add_metric(args.readings, args.repeat)
+    registry.enabled = True
+    enabled = bench_add_metric(args.readings, args.repeat)
+    print(f"\nadd_metric x {args.readings:,}: disabled {disabled:.3f}s, enabled {enabled:.3f}s "
+          f"({(enabled / disabled - 1) * 100:+.1f}%, {(enabled - disabled) / args.readings * 1e9:+.0f} ns/reading)")
+
+    plain = min(timeit.repeat(cpu_work, number=1, repeat=args.repeat))
+    profiled = float('inf')
+    for _ in range(args.repeat):
+        with SamplingProfiler() as profiler:
+            start = time.perf_counter()
+            cpu_work()
+            profiled = min(profiled, time.perf_counter() - start)
+    print(f"CPU loop: plain {plain:.3f}s, sampled every {profiler.interval * 1000:.0f}ms {profiled:.3f}s "
+          f"({(profiled / plain - 1) * 100:+.1f}%, {profiler.samples} samples)")
+
+
+if __name__ == '__main__':
+    main()
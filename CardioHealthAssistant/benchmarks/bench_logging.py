@@ -0,0 +1,115 @@
+# benchmarks/bench_logging.py
+"""
+Request-thread cost of logging under chat and ingest load.
+
+Runs chat turns against the local fake model and add_metric readings
+through each logging pipeline: logging disabled, the old synchronous
+basicConfig FileHandler, and the queue pipeline from logging_setup with
+and without sampling. Reports throughput and p99 latency seen by the
+caller, how long the writer thread needed afterwards to drain its queue,
+and how many records reached the file.
+
+Usage:
+    python benchmarks/bench_logging.py [--turns 5000] [--readings 50000] [--repeat 3]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_model import FakeGenerativeModel  # noqa: E402
+from chat import HealthMetricsTracker, initialize_chat_session, send_message_to_chatbot  # noqa: E402
+from logging_setup import LOG_RECORDS_DROPPED, TEXT_FORMAT, configure_logging, shutdown_logging  # noqa: E402
+
+
+def use_pipeline(name, path):
+    shutdown_logging()
+    logging.disable(logging.NOTSET)
+    if name == 'disabled':
+        logging.disable(logging.CRITICAL)
+    elif name == 'sync file':
+        logging.basicConfig(filename=path, level=logging.INFO, format=TEXT_FORMAT, force=True)
+    else:
+        configure_logging(path, sample_rate=0 if name == 'queue' else 10, force=True)
+
+
+def finish_pipeline(name):
+    """Stop the pipeline, returning seconds spent writing out records still queued."""
+    start = time.perf_counter()
+    if name.startswith('queue'):
+        shutdown_logging()
+    else:
+        for handler in logging.getLogger().handlers[:]:
+            handler.close()
+            logging.getLogger().removeHandler(handler)
+    return time.perf_counter() - start
+
+
+def chat_load(turns, run):
+    session = initialize_chat_session(chat_model=FakeGenerativeModel())
+    for i in range(turns):
+        start = time.perf_counter()
+        # Unique per run, so every turn reaches the model instead of the reply cache
+        send_message_to_chatbot(session, f"My blood pressure was {110 + i % 50}/{70 + i % 30} today [{run}-{i}]")
+        yield time.perf_counter() - start
+
+
+def ingest_load(readings, run):
+    tracker = HealthMetricsTracker(user_id='bench')
+    for i in range(readings):
+        start = time.perf_counter()
+        tracker.add_metric(heart_rate=70.0 + i % 30, bp_systolic=120.0, bp_diastolic=80.0, blood_sugar=95.0)
+        yield time.perf_counter() - start
+
+
+def dropped():
+    return sum(child.value for _, child in LOG_RECORDS_DROPPED.samples())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--turns', type=int, default=5000)
+    parser.add_argument('--readings', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='cardio-logging-')
+    loads = [('chat', chat_load, args.turns), ('ingest', ingest_load, args.readings)]
+    pipelines = ['disabled', 'sync file', 'queue', 'queue + sampling']
+    runs = iter(range(10**9))
+
+    # Warm up imports, caches and allocators so the first pipeline measured isn't penalized
+    logging.disable(logging.CRITICAL)
+    for _, load, ops in loads:
+        for _ in load(max(ops // 10, 1), next(runs)):
+            pass
+    print(f"{'load':<8} {'pipeline':<18} {'ops/s':>10} {'p99 us':>9} {'drain ms':>9} {'records':>9} {'dropped':>9}")
+    for load_name, load, ops in loads:
+        for pipeline in pipelines:
+            best = None
+            for attempt in range(args.repeat):
+                path = os.path.join(workdir, f"{load_name}-{pipeline.replace(' ', '_')}-{attempt}.log")
+                use_pipeline(pipeline, path)
+                dropped_before = dropped()
+                start = time.perf_counter()
+                latencies = np.fromiter(load(ops, next(runs)), dtype=np.float64)
+                elapsed = time.perf_counter() - start
+                drain = finish_pipeline(pipeline)
+                records = sum(1 for _ in open(path)) if os.path.exists(path) else 0
+                result = (ops / elapsed, np.percentile(latencies, 99), drain, records, dropped() - dropped_before)
+                if best is None or result[0] > best[0]:
+                    best = result
+            throughput, p99, drain, records, lost = best
+            print(f"{load_name:<8} {pipeline:<18} {throughput:>10,.0f} {p99 * 1e6:>9.1f} "
+                  f"{drain * 1000:>9.1f} {records:>9,} {lost:>9,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_login.py
+"""
+Login throughput versus password-hashing pool size.
+
+Registers a set of users, then fires concurrent async logins at
+UserAuthentication for each pool size and reports logins/sec and p99
+latency. Throughput should scale with pool size up to the core count.
+
+Usage:
+    python benchmarks/bench_login.py [--pool-sizes 1 2 4 8] [--logins 200] [--iterations 100000]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth import UserAuthentication  # noqa: E402
+from password_hashing import DEFAULT_ITERATIONS, PasswordHasher  # noqa: E402
+
+
+async def storm(auth, users, logins):
+    latencies = []
+
+    async def login(i):
+        start = time.perf_counter()
+        token = await auth.login_async(users[i % len(users)], 'correct horse')
+        latencies.append(time.perf_counter() - start)
+        assert token, "login failed"
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login(i) for i in range(logins)))
+    return time.perf_counter() - start, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pool-sizes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--processes', action='store_true', help='Hash in a process pool instead of threads')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    db_path = os.path.join(tempfile.mkdtemp(prefix='cardio-login-'), 'users.db')
+    print(f"{os.cpu_count()} CPUs, {args.iterations:,} PBKDF2 iterations, {args.logins} concurrent logins")
+
+    setup = UserAuthentication(db_path, sweep_interval=None, hasher=PasswordHasher(args.iterations))
+    users = [f"user{i}" for i in range(args.users)]
+    for username in users:
+        setup.register_user(username, f"{username}@example.com", 'correct horse')
+    setup.close()
+
+    print(f"{'pool size':>9} {'logins/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for pool_size in args.pool_sizes:
+        hasher = PasswordHasher(args.iterations, max_workers=pool_size, use_processes=args.processes)
+        auth = UserAuthentication(db_path, sweep_interval=None, hasher=hasher)
+        elapsed, latencies = asyncio.run(storm(auth, users, args.logins))
+        auth.close()
+        print(f"{pool_size:>9} {args.logins / elapsed:>10.1f} "
+              f"{np.percentile(latencies, 50) * 1000:>8.1f} {np.percentile(latencies, 99) * 1000:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
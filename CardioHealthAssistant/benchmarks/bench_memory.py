@@ -0,0 +1,114 @@
+# benchmarks/bench_memory.py
+"""
+Bytes per stored reading for each in-memory representation.
+
+Builds the same synthetic readings as a list of dicts, as the float64
+DataFrame with "sys/dia" strings the tracker used to keep, and as
+ColumnarMetricsStore with float64 and float32 buffers, and reports the
+memory traced for each. Rollup tiers are reported separately.
+
+Usage:
+    python benchmarks/bench_memory.py [--readings 1000000]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics_rollup import MetricRollups  # noqa: E402
+from metrics_store import METRIC_COLUMNS, ColumnarMetricsStore  # noqa: E402
+
+
+def synthetic_columns(n, seed=0):
+    """Readings every 15 seconds with a few metrics missing, as columns."""
+    rng = np.random.default_rng(seed)
+    timestamps = np.datetime64('2024-01-01T00:00:00', 'ns') + np.arange(n) * np.timedelta64(15, 's')
+    columns = {column: np.full(n, np.nan) for column in METRIC_COLUMNS}
+    columns['heart_rate'] = rng.normal(72, 10, n).round(1)
+    columns['bp_systolic'] = rng.normal(120, 12, n).round()
+    columns['bp_diastolic'] = rng.normal(80, 8, n).round()
+    columns['weight'] = rng.normal(75, 12, n).round(1)
+    columns['height'] = np.full(n, 1.75)
+    columns['bmi'] = columns['weight'] / 1.75 ** 2
+    columns['exercise_minutes'] = rng.integers(0, 90, n).astype(np.float64)
+    return timestamps, columns
+
+
+def measure(build):
+    """Return (object, bytes allocated by ``build`` and still alive)."""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return result, used
+
+
+def dict_rows(timestamps, columns):
+    names = list(columns)
+    return [
+        {'timestamp': timestamp, **{name: value for name, value in zip(names, row) if value == value}}
+        for timestamp, row in zip(timestamps.tolist(), zip(*(columns[name].tolist() for name in names)))
+    ]
+
+
+def legacy_dataframe(timestamps, columns):
+    data = {'timestamp': timestamps}
+    for column in METRIC_COLUMNS:
+        if column == 'bp_systolic':
+            data['blood_pressure'] = [
+                f"{systolic:.0f}/{diastolic:.0f}"
+                for systolic, diastolic in zip(columns['bp_systolic'].tolist(), columns['bp_diastolic'].tolist())
+            ]
+        elif column != 'bp_diastolic':
+            data[column] = columns[column]
+    return pd.DataFrame(data)
+
+
+def columnar_store(timestamps, columns, dtype):
+    store = ColumnarMetricsStore(dtype=dtype)
+    store.extend(timestamps, columns)
+    return store
+
+
+def rollups(timestamps, columns):
+    result = MetricRollups(METRIC_COLUMNS)
+    result.extend(timestamps, columns)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readings', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    n = args.readings
+    timestamps, columns = synthetic_columns(n)
+    cases = [
+        ('dict per reading', lambda: dict_rows(timestamps, columns)),
+        ('DataFrame (float64 + "sys/dia")', lambda: legacy_dataframe(timestamps, columns)),
+        ('ColumnarMetricsStore float64', lambda: columnar_store(timestamps, columns, np.float64)),
+        ('ColumnarMetricsStore float32', lambda: columnar_store(timestamps, columns, np.float32)),
+        ('structured records (float32)', lambda: columnar_store(timestamps, columns, np.float32).to_records()),
+        ('rollups (minute/hour/day)', lambda: rollups(timestamps, columns)),
+    ]
+
+    print(f"{n:,} readings, {len(METRIC_COLUMNS)} metrics")
+    print(f"{'representation':<34} {'MB':>9} {'bytes/reading':>14}")
+    for label, build in cases:
+        result, used = measure(build)
+        print(f"{label:<34} {used / 1e6:>9.1f} {used / n:>14.1f}")
+        del result
+
+
+if __name__ == '__main__':
+    main()
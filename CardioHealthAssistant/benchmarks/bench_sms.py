@@ -0,0 +1,105 @@
+# benchmarks/bench_sms.py
+"""
+SMS fan-out benchmark against a local stub of Twilio's Messages API.
+
+Compares the old path (new HTTP connection per message, sent serially)
+with the shared TwilioSMSClient fanning out across a worker pool. The
+stub can inject 429/503 responses to exercise retry with backoff.
+
+Usage:
+    python benchmarks/bench_sms.py [--messages 500] [--workers 8] [--rate-limit 100] [--failure-rate 0.05]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sms_client import TwilioSMSClient  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Accepts Messages.json POSTs, optionally failing some with 429/503."""
+
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    failure_rate = 0.0
+    received = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            status, payload = random.choice([429, 503]), {'message': 'Too Many Requests'}
+        else:
+            with StubHandler.lock:
+                StubHandler.received += 1
+            status, payload = 201, {'sid': 'SM' + uuid.uuid4().hex, 'status': 'queued'}
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def send_serial_unpooled(base_url, messages):
+    """Baseline: a fresh client and connection per message, no retries."""
+    sent = 0
+    for to, body in messages:
+        response = requests.post(f"{base_url}/2010-04-01/Accounts/AC0/Messages.json",
+                                 data={'To': to, 'From': '+15550000000', 'Body': body}, auth=('AC0', 'token'))
+        sent += response.status_code < 300
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate-limit', type=float, default=100.0, help='Account messages per second')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds the stub takes per request')
+    parser.add_argument('--failure-rate', type=float, default=0.05, help='Fraction of requests answered 429/503')
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency
+    StubHandler.failure_rate = args.failure_rate
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    messages = [(f"+1555{i:07d}", f"Reminder: Take Lisinopril (10mg) [{i}]") for i in range(args.messages)]
+
+    start = time.perf_counter()
+    sent = send_serial_unpooled(base_url, messages)
+    elapsed = time.perf_counter() - start
+    print(f"{'serial, no reuse':<20} {sent:>6}/{len(messages)} sent in {elapsed:7.2f}s = {sent / elapsed:8.1f} msg/s")
+
+    client = TwilioSMSClient('AC0', 'token', '+15550000000', rate_limit=args.rate_limit,
+                             max_workers=args.workers, backoff_base=0.05, base_url=base_url)
+    start = time.perf_counter()
+    sent = sum(client.send_many(messages))
+    elapsed = time.perf_counter() - start
+    client.close()
+    print(f"{'shared client':<20} {sent:>6}/{len(messages)} sent in {elapsed:7.2f}s = {sent / elapsed:8.1f} msg/s "
+          f"({client.retries} retries, limit {args.rate_limit:g} msg/s)")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# benchmarks/bench_smtp.py
+"""
+Email throughput benchmark: one connection per message vs. the SMTP pool.
+
+Starts an in-process SMTP sink that delays each new connection to mimic
+the TLS handshake and login of a real provider. Pass --port to target an
+external debugging server instead, e.g. ``python -m aiosmtpd -n -l localhost:8025``.
+
+Usage:
+    python benchmarks/bench_smtp.py [--messages 500] [--pool-size 4] [--connect-latency 0.1]
+"""
+
+import argparse
+import os
+import smtplib
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from smtp_pool import SMTPConnectionPool  # noqa: E402
+
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP server that accepts and discards every message."""
+
+    connect_latency = 0.0
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        time.sleep(self.connect_latency)
+        self.reply('220 localhost sink ready')
+        in_data = False
+        for raw in self.rfile:
+            line = raw.decode(errors='replace').rstrip('\r\n')
+            if in_data:
+                if line == '.':
+                    in_data = False
+                    self.reply('250 OK')
+                continue
+            command = line[:4].upper()
+            if command == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 SIZE 10485760')
+            elif command == 'DATA':
+                in_data = True
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_message(i):
+    message = MIMEText(f"Reminder: Take Lisinopril (10mg) [{i}]")
+    message['From'] = 'reminders@example.com'
+    message['To'] = f"patient{i}@example.com"
+    message['Subject'] = 'Medication Reminder'
+    return message
+
+
+def send_unpooled(host, port, messages, concurrency):
+    """Baseline: connect, send and quit for every message, as before pooling."""
+    def send(message):
+        with smtplib.SMTP(host, port) as smtp:
+            smtp.send_message(message)
+        return True
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(send, messages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--pool-size', type=int, default=4)
+    parser.add_argument('--connect-latency', type=float, default=0.1,
+                        help='Seconds the sink delays each new connection (handshake + login)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help='Use an already running SMTP server on this port')
+    args = parser.parse_args()
+
+    server = None
+    port = args.port
+    if port is None:
+        SinkHandler.connect_latency = args.connect_latency
+        server = SinkServer((args.host, 0), SinkHandler)
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    messages = [make_message(i) for i in range(args.messages)]
+
+    start = time.perf_counter()
+    sent = sum(send_unpooled(args.host, port, messages, args.pool_size))
+    elapsed = time.perf_counter() - start
+    print(f"{'per-message connection':<24} {sent:>6} sent in {elapsed:7.2f}s = {sent / elapsed:8.1f} msg/s")
+
+    pool = SMTPConnectionPool(args.host, port, security='none', pool_size=args.pool_size)
+    start = time.perf_counter()
+    sent = sum(pool.send_many(messages))
+    elapsed = time.perf_counter() - start
+    pool.close()
+    print(f"{'pooled connections':<24} {sent:>6} sent in {elapsed:7.2f}s = {sent / elapsed:8.1f} msg/s "
+          f"({pool.connections_opened} connections opened)")
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
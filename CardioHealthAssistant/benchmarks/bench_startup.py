@@ -0,0 +1,83 @@
+# benchmarks/bench_startup.py
+"""
+Cold import time of the app modules and time to first render.
+
+Each measurement runs in a fresh interpreter inside an empty working
+directory, so no module or database from an earlier run is reused.
+First render runs app.py once through Streamlit's AppTest harness.
+
+Usage:
+    python benchmarks/bench_startup.py [--modules chat notifications auth server app] [--repeat 5]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+RENDER_SCRIPT = """
+import time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+app = AppTest.from_file({path!r}, default_timeout=120).run()
+elapsed = time.perf_counter() - start
+if app.exception:
+    raise SystemExit(f"app.py raised: {{app.exception[0].message}}")
+print(elapsed)
+"""
+
+
+def run_timed(script):
+    """Run ``script`` in a fresh interpreter; return its printed seconds, or the error it died with."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.getenv('PYTHONPATH')])))
+    with tempfile.TemporaryDirectory(prefix='cardio-startup-') as workdir:
+        result = subprocess.run([sys.executable, '-c', script], cwd=workdir, env=env,
+                                capture_output=True, text=True, timeout=600)
+    if result.returncode != 0:
+        lines = (result.stderr or result.stdout).strip().splitlines()
+        return None, lines[-1] if lines else f"exit code {result.returncode}"
+    return float(result.stdout.strip().splitlines()[-1]), None
+
+
+def best_of(script, repeat):
+    times = []
+    for _ in range(repeat):
+        seconds, error = run_timed(script)
+        if error:
+            return None, error
+        times.append(seconds)
+    return min(times), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modules', nargs='+', default=['chat', 'notifications', 'auth', 'server', 'app'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-render', action='store_true', help='Skip the first-render measurement')
+    args = parser.parse_args()
+
+    cases = [(f"import {module}", IMPORT_SCRIPT.format(module=module)) for module in args.modules]
+    if not args.no_render:
+        cases.append(('first render (app.py)', RENDER_SCRIPT.format(path=os.path.join(REPO_DIR, 'app.py'))))
+
+    print(f"{'measurement':<24} {'best ms':>9}")
+    for label, script in cases:
+        seconds, error = best_of(script, args.repeat)
+        if error:
+            print(f"{label:<24} {'n/a':>9}  ({error})")
+        else:
+            print(f"{label:<24} {seconds * 1000:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
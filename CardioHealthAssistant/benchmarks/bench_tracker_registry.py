@@ -0,0 +1,99 @@
+# benchmarks/bench_tracker_registry.py
+"""
+Tracker registry residency under a memory budget.
+
+Seeds a metrics database with many users, then looks trackers up through
+a TrackerRegistry with a Zipf-skewed access pattern (a few hot patients,
+a long tail of cold ones). Reports lookup latency by result (memory hit,
+reload from a spill file, miss loaded from SQLite), resident memory
+against the budget, and spill file sizes.
+
+Usage:
+    python benchmarks/bench_tracker_registry.py [--users 2000] [--readings 500] [--budget-mb 64] [--lookups 20000]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat import HISTORY_WINDOW, HealthMetricsTracker  # noqa: E402
+from metrics_db import MetricsDatabase  # noqa: E402
+from synthetic import generate_readings, user_ids  # noqa: E402
+from tracker_registry import TrackerRegistry  # noqa: E402
+
+
+def percentile_ms(latencies, q):
+    return np.percentile(latencies, q) * 1000 if latencies else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--readings', type=int, default=500, help='Readings per user')
+    parser.add_argument('--budget-mb', type=float, default=64)
+    parser.add_argument('--lookups', type=int, default=20_000)
+    parser.add_argument('--zipf', type=float, default=1.2, help='Zipf exponent of the access pattern')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    workdir = tempfile.mkdtemp(prefix='cardio-registry-')
+    database = MetricsDatabase(os.path.join(workdir, 'metrics.db'))
+    users = user_ids(args.users)
+    start = time.perf_counter()
+    for i, user_id in enumerate(users):
+        database.add_frame(user_id, generate_readings(args.readings, seed=i))
+    print(f"Seeded {args.users:,} users x {args.readings:,} readings in {time.perf_counter() - start:.1f}s")
+
+    def factory(user_id):
+        return HealthMetricsTracker(user_id=user_id, database=database)
+
+    def loader(tracker):
+        tracker.load_history(start=datetime.now() - HISTORY_WINDOW)
+
+    budget = int(args.budget_mb * 1024 * 1024)
+    registry = TrackerRegistry(factory, loader, memory_budget=budget, spill_dir=os.path.join(workdir, 'spill'))
+
+    rng = np.random.default_rng(0)
+    # Cold pass touches everyone once, then a skewed stream keeps a hot set resident
+    order = list(range(args.users)) + list((rng.zipf(args.zipf, args.lookups) - 1) % args.users)
+    latencies = {'hit': [], 'reload': [], 'miss': []}
+    largest = 0
+    start = time.perf_counter()
+    for index in order:
+        before = (registry.hits, registry.reloads, registry.misses)
+        lookup_start = time.perf_counter()
+        registry.get(users[index])
+        elapsed = time.perf_counter() - lookup_start
+        after = (registry.hits, registry.reloads, registry.misses)
+        result = ('hit', 'reload', 'miss')[[a - b for a, b in zip(after, before)].index(1)]
+        latencies[result].append(elapsed)
+        largest = max(largest, registry.resident_bytes)
+    total = time.perf_counter() - start
+
+    stats = registry.stats()
+    spill_files = [os.path.join(registry.spill_dir, name) for name in os.listdir(registry.spill_dir)]
+    spill_bytes = sum(os.path.getsize(path) for path in spill_files)
+    print(f"{len(order):,} lookups in {total:.2f}s ({len(order) / total:,.0f}/s)")
+    print(f"{'result':<8} {'count':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for result, values in latencies.items():
+        print(f"{result:<8} {len(values):>8,} {percentile_ms(values, 50):>8.3f} {percentile_ms(values, 99):>8.3f}")
+    print(f"resident: {stats['resident']:,} trackers, {stats['resident_bytes'] / 2**20:.1f} MiB "
+          f"(peak {largest / 2**20:.1f} MiB, budget {budget / 2**20:.1f} MiB)")
+    print(f"spilled: {stats['spilled']:,} trackers in {len(spill_files):,} files, {spill_bytes / 2**20:.1f} MiB "
+          f"({spill_bytes / max(len(spill_files), 1) / 1024:.1f} KiB each); evictions {stats['evictions']:,}")
+    print(f"all users resident would need ~{stats['resident_bytes'] / max(stats['resident'], 1) * args.users / 2**20:,.0f} MiB")
+
+    registry.close()
+    database.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/fake_model.py
+"""
+Local stand-in for google.generativeai.GenerativeModel.
+
+Mirrors the small surface chat.py uses (start_chat, send_message and
+send_message_async, each with optional streaming) so chat code can be
+exercised and benchmarked without network access or an API key.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+
+def _content(role, text):
+    return SimpleNamespace(role=role, parts=[SimpleNamespace(text=text)])
+
+
+def _response(text):
+    return SimpleNamespace(candidates=[SimpleNamespace(content=_content('model', text))])
+
+
+class FakeGenerativeModel:
+    def __init__(self, reply=None, chunk_size=32, first_chunk_latency=0.0, chunk_latency=0.0):
+        """
+        :param reply: Callable mapping the user message to reply text, or a fixed string
+        :param chunk_size: Characters per streamed chunk
+        :param first_chunk_latency: Seconds before the first chunk (time to first token)
+        :param chunk_latency: Seconds between subsequent chunks
+        """
+        if reply is None:
+            reply = "Please consult your healthcare provider. " * 8
+        self.reply = reply if callable(reply) else (lambda message, text=reply: text)
+        self.chunk_size = chunk_size
+        self.first_chunk_latency = first_chunk_latency
+        self.chunk_latency = chunk_latency
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history)
+
+    def count_tokens(self, contents):
+        text = contents if isinstance(contents, str) else str(contents)
+        return SimpleNamespace(total_tokens=max(1, len(text) // 4))
+
+
+class FakeChatSession:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def _chunks(self, message):
+        text = self.model.reply(message)
+        size = self.model.chunk_size
+        return [text[i:i + size] for i in range(0, len(text), size)] or ['']
+
+    def _record(self, message, chunks):
+        self.history.append(_content('user', message))
+        self.history.append(_content('model', ''.join(chunks)))
+
+    def send_message(self, message, stream=False):
+        chunks = self._chunks(message)
+        if stream:
+            return self._stream(message, chunks)
+        time.sleep(self.model.first_chunk_latency + self.model.chunk_latency * (len(chunks) - 1))
+        self._record(message, chunks)
+        return _response(''.join(chunks))
+
+    def _stream(self, message, chunks):
+        for i, chunk in enumerate(chunks):
+            time.sleep(self.model.first_chunk_latency if i == 0 else self.model.chunk_latency)
+            yield _response(chunk)
+        self._record(message, chunks)
+
+    async def send_message_async(self, message, stream=False):
+        chunks = self._chunks(message)
+        if stream:
+            return self._stream_async(message, chunks)
+        await asyncio.sleep(self.model.first_chunk_latency + self.model.chunk_latency * (len(chunks) - 1))
+        self._record(message, chunks)
+        return _response(''.join(chunks))
+
+    async def _stream_async(self, message, chunks):
+        for i, chunk in enumerate(chunks):
+            await asyncio.sleep(self.model.first_chunk_latency if i == 0 else self.model.chunk_latency)
+            yield _response(chunk)
+        self._record(message, chunks)
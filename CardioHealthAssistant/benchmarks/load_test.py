@@ -0,0 +1,145 @@
+# benchmarks/load_test.py
+"""
+Load-test harness for the mobile backend (server.py).
+
+Drives a mix of chat, metric ingest and metric reads against a stubbed
+model and reports p50/p99 latency and requests/sec per endpoint.
+Runs in-process over ASGI by default, or against a live server with --url.
+Each simulated user signs in through /login first; in-process the
+accounts are created on the fly, while a live server must already have
+accounts load-user-0 .. load-user-N with the --password given.
+
+Usage:
+    python benchmarks/load_test.py [--requests 2000] [--concurrency 64] [--url http://localhost:8000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_model import FakeGenerativeModel  # noqa: E402
+
+LOAD_PASSWORD = 'correct horse'
+
+QUESTIONS = [
+    "What is a normal resting heart rate?",
+    "How can I lower my blood pressure naturally?",
+    "Which foods raise HDL cholesterol?",
+    "How much exercise do I need each week?",
+]
+
+
+def make_request(rng, user_ids):
+    """Return (label, method, path, json) for one randomly chosen request."""
+    user_id = rng.choice(user_ids)
+    kind = rng.random()
+    if kind < 0.5:
+        return 'POST /health-metrics', 'POST', '/health-metrics', {
+            'user_id': user_id,
+            'heart_rate': rng.gauss(72, 8),
+            'systolic_pressure': round(rng.gauss(120, 10)),
+            'diastolic_pressure': round(rng.gauss(80, 6)),
+            'exercise_minutes': rng.randint(0, 90),
+        }
+    if kind < 0.8:
+        return 'GET /health-metrics', 'GET', f'/health-metrics/{user_id}', None
+    return 'POST /chat', 'POST', '/chat', {'user_id': user_id, 'message': rng.choice(QUESTIONS) + f" ({rng.random()})"}
+
+
+async def sign_in(client, users, password):
+    """Log every load user in; return {user_id: request headers carrying its session token}."""
+    headers = {}
+    for i in range(users):
+        response = await client.post('/login', json={'username': f"load-user-{i}", 'password': password})
+        response.raise_for_status()
+        session = response.json()
+        headers[session['user_id']] = {'Authorization': f"Bearer {session['session_token']}"}
+    return headers
+
+
+async def run(client, total, concurrency, users, seed, password=LOAD_PASSWORD):
+    rng = random.Random(seed)
+    headers = await sign_in(client, users, password)
+    user_ids = list(headers)
+    requests = [make_request(rng, user_ids) for _ in range(total)]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+
+    async def worker():
+        while not queue.empty():
+            label, method, path, body = queue.get_nowait()
+            user_id = body['user_id'] if body else path.rsplit('/', 1)[1]
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body, headers=headers[user_id])
+            latencies[label].append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors[label] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def report(latencies, errors, elapsed):
+    print(f"{'endpoint':<22} {'count':>7} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    all_latencies = []
+    for label in sorted(latencies):
+        samples = np.array(latencies[label]) * 1000
+        all_latencies.extend(samples)
+        print(f"{label:<22} {len(samples):>7} {errors[label]:>7} "
+              f"{np.percentile(samples, 50):>8.2f} {np.percentile(samples, 99):>8.2f}")
+    total = len(all_latencies)
+    print(f"\n{total} requests in {elapsed:.2f}s = {total / elapsed:,.0f} req/s "
+          f"(p50 {np.percentile(all_latencies, 50):.2f} ms, p99 {np.percentile(all_latencies, 99):.2f} ms)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--model-latency', type=float, default=0.05,
+                        help='Seconds the stub model takes to reply')
+    parser.add_argument('--url', help='Base URL of a running server; defaults to in-process ASGI')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--password', default=LOAD_PASSWORD, help='Password of the load-user accounts')
+    args = parser.parse_args()
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+    else:
+        # Keep the benchmark's databases out of the working tree
+        os.chdir(tempfile.mkdtemp(prefix='cardio-load-'))
+        import logging
+        logging.disable(logging.INFO)
+        import server
+        server.app.state.chat_model = FakeGenerativeModel(first_chunk_latency=args.model_latency)
+        auth_manager = server.get_auth_manager()
+        for i in range(args.users):
+            await auth_manager.register_user_async(f"load-user-{i}", f"load-user-{i}@example.com", args.password)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app),
+                                   base_url='http://testserver', timeout=30)
+
+    async with client:
+        latencies, errors, elapsed = await run(client, args.requests, args.concurrency, args.users, args.seed,
+                                               args.password)
+    report(latencies, errors, elapsed)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,451 @@
+# benchmarks/run_suite.py
+"""
+Reproducible benchmark suite over the tracker, summaries, reports, auth and reminders.
+
+Each case runs at one or more preset scales (see synthetic.SCALES) on
+seeded synthetic data, in a scratch directory so no real database is
+touched. The Gemini model is replaced by benchmarks/fake_model.py, and
+email and SMS go to an in-process SMTP sink and Twilio stub, so the
+suite needs no network or credentials.
+
+Results are written as JSON, tagged with the git commit, and two result
+files can be compared to spot regressions between commits.
+
+Usage:
+    python benchmarks/run_suite.py [--scales small medium large] [--cases tracker auth] [--output results.json]
+    python benchmarks/run_suite.py --compare base.json [head.json] [--threshold 0.10]
+"""
+
+import argparse
+import functools
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_sms import StubHandler  # noqa: E402
+from bench_smtp import SinkHandler, SinkServer  # noqa: E402
+from fake_model import FakeGenerativeModel  # noqa: E402
+from synthetic import SCALES, Scale, generate_readings, generate_reminders, generate_stream, user_ids  # noqa: E402
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, 'benchmarks', 'results')
+
+# Bumped when cases change meaning, so incomparable result files are not compared
+SUITE_VERSION = 1
+
+PASSWORD = 'correct horse battery staple'
+
+CASES = []
+
+
+def case(name, ops):
+    """
+    Register a benchmark case.
+
+    The decorated function receives a Workload and returns a callable that
+    performs ``ops`` operations per call; setup done before returning is
+    not timed. ``ops`` may be a function of the Scale.
+    """
+    def register(setup):
+        CASES.append((name, ops, setup))
+        return setup
+    return register
+
+
+def start_stubs():
+    """Start the SMTP sink and Twilio stub and point the app's environment at them."""
+    smtp = SinkServer(('127.0.0.1', 0), SinkHandler)
+    sms = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    for server in (smtp, sms):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ.update({
+        'EMAIL_SENDER': 'reminders@example.com',
+        'EMAIL_PASSWORD': '',
+        'EMAIL_SMTP_SERVER': '127.0.0.1',
+        'EMAIL_SMTP_PORT': str(smtp.server_address[1]),
+        'EMAIL_SMTP_SECURITY': 'none',
+        'EMAIL_SMTP_RATE_LIMIT': '0',
+        'TWILIO_ACCOUNT_SID': 'ACbenchmark',
+        'TWILIO_AUTH_TOKEN': 'benchmark',
+        'TWILIO_PHONE_NUMBER': '+15550000000',
+        'TWILIO_RATE_LIMIT': '100000',
+        'TWILIO_API_URL': f"http://127.0.0.1:{sms.server_address[1]}",
+    })
+    return smtp, sms
+
+
+class Workload:
+    def __init__(self, scale, workdir, hash_iterations, seed=0):
+        """
+        Lazily built data and services for one scale; only what the selected cases use is set up.
+
+        :param scale: Scale to generate data for
+        :param workdir: Scratch directory for this scale's databases
+        :param hash_iterations: PBKDF2 iterations for benchmark accounts
+        :param seed: Random seed for data generation and sampling
+        """
+        self.scale = scale
+        self.workdir = workdir
+        self.hash_iterations = hash_iterations
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.user_id = f"bench-{scale.name}"
+
+    @functools.cached_property
+    def metrics_db(self):
+        """Shared metrics database holding this scale's user history."""
+        import chat
+        database = chat.get_metrics_db()
+        database.add_frame(self.user_id, generate_readings(self.scale.readings, seed=self.seed))
+        return database
+
+    @functools.cached_property
+    def tracker(self):
+        """The chat module's tracker for this scale's user, loaded from the seeded history."""
+        import chat
+        self.metrics_db.flush()
+        return chat.get_health_metrics_tracker(self.user_id)
+
+    @functools.cached_property
+    def auth(self):
+        from auth import UserAuthentication
+        from password_hashing import PasswordHasher
+        manager = UserAuthentication(os.path.join(self.workdir, 'users.db'), sweep_interval=None,
+                                     hasher=PasswordHasher(self.hash_iterations))
+        # Every account shares one hash so registering 10k users doesn't take minutes of PBKDF2
+        pwd_hash, salt, iterations = manager.hasher.hash(PASSWORD)
+        for username in user_ids(self.scale.users):
+            manager._insert_user(username, f"{username}@example.com", pwd_hash, salt, iterations)
+        return manager
+
+    @functools.cached_property
+    def sessions(self):
+        return [self.auth.login(username, PASSWORD) for username in self.sample_users(100)]
+
+    @functools.cached_property
+    def notifications(self):
+        from notifications import NotificationManager
+        manager = NotificationManager()
+        manager.db_path = os.path.join(self.workdir, 'reminders.db')
+        for reminder in generate_reminders(self.scale.users, seed=self.seed):
+            manager.add_medication_reminder(**reminder)
+        return manager
+
+    def sample_users(self, count):
+        users = user_ids(self.scale.users)
+        return [self.rng.choice(users) for _ in range(count)]
+
+    def close(self):
+        if 'auth' in self.__dict__:
+            self.auth.close()
+        if 'notifications' in self.__dict__:
+            self.notifications.close_connection()
+
+
+@case('tracker.load_history', ops=lambda scale: scale.readings)
+def bench_load_history(workload):
+    from chat import HISTORY_WINDOW, HealthMetricsTracker
+    database = workload.metrics_db
+    database.flush()
+
+    def run():
+        tracker = HealthMetricsTracker(user_id=workload.user_id, database=database)
+        tracker.load_history(start=datetime.now() - HISTORY_WINDOW)
+    return run
+
+
+@case('tracker.add_metric', ops=1000)
+def bench_add_metric(workload):
+    tracker = workload.tracker
+    readings = generate_readings(1000, seed=workload.seed + 1)
+    entries = [
+        {column: value for column, value in row.items() if value == value}
+        for row in readings.drop(columns='timestamp').to_dict('records')
+    ]
+
+    def run():
+        for entry in entries:
+            tracker.add_metric(**entry)
+    return run
+
+
+@case('tracker.get_metrics_summary', ops=100)
+def bench_metrics_summary(workload):
+    tracker = workload.tracker
+
+    def run():
+        for _ in range(100):
+            tracker.get_metrics_summary()
+    return run
+
+
+@case('tracker.generate_health_report', ops=100)
+def bench_health_report(workload):
+    tracker = workload.tracker
+
+    def run():
+        for _ in range(100):
+            tracker.generate_health_report()
+    return run
+
+
+@case('chat.detect_emergency', ops=1000)
+def bench_detect_emergency(workload):
+    import chat
+    workload.tracker  # load the history outside the timed region
+
+    def run():
+        for _ in range(1000):
+            chat.detect_emergency(workload.user_id)
+    return run
+
+
+@case('emergency.process', ops=lambda scale: scale.readings)
+def bench_emergency_process(workload):
+    from emergency_detection import EmergencyDetector
+    timestamps, columns, keys = generate_stream(workload.scale.readings, workload.scale.users, seed=workload.seed)
+
+    def run():
+        EmergencyDetector().process(timestamps, columns, keys=keys)
+    return run
+
+
+@case('chat.send_message', ops=200)
+def bench_send_message(workload):
+    import chat
+    session = chat.initialize_chat_session(chat_model=FakeGenerativeModel())
+    counter = iter(range(10**9))
+
+    def run():
+        # Distinct questions, so every call goes to the (stub) model rather than the reply cache
+        for _ in range(200):
+            chat.send_message_to_chatbot(session, f"Is a resting heart rate of {next(counter)} normal?")
+    return run
+
+
+@case('auth.login', ops=10)
+def bench_login(workload):
+    auth = workload.auth
+    usernames = workload.sample_users(10)
+
+    def run():
+        for username in usernames:
+            assert auth.login(username, PASSWORD), "login failed"
+    return run
+
+
+@case('auth.validate_session', ops=10_000)
+def bench_validate_session(workload):
+    auth = workload.auth
+    tokens = workload.sessions
+
+    def run():
+        for i in range(10_000):
+            auth.validate_session(tokens[i % len(tokens)])
+    return run
+
+
+@case('notifications.get_upcoming_reminders', ops=1000)
+def bench_upcoming_reminders(workload):
+    manager = workload.notifications
+    users = workload.sample_users(1000)
+
+    def run():
+        for user_id in users:
+            manager.get_upcoming_reminders(user_id)
+    return run
+
+
+@case('notifications.send_reminder', ops=50)
+def bench_send_reminder(workload):
+    manager = workload.notifications
+
+    def run():
+        # The stubs accept any recipient, so one contact serves both channels
+        for _ in range(50):
+            assert manager.send_reminder('Both', '+15551234567', 'Take Lisinopril (10mg)'), "send failed"
+    return run
+
+
+def measure(func, ops, repeat):
+    """Seconds per operation for each of ``repeat`` calls of ``func``."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) / ops)
+    return samples
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def run_suite(scales, patterns, repeat, hash_iterations, seed):
+    start_stubs()
+    workdir = tempfile.mkdtemp(prefix='cardio-suite-')
+    # Module-level databases (metrics.db) and logs open relative to the working directory
+    os.chdir(workdir)
+    logging.disable(logging.CRITICAL)
+
+    selected = [c for c in CASES if not patterns or any(c[0].startswith(p) for p in patterns)]
+    results = []
+    print(f"{'case':<40} {'scale':<8} {'ops':>9} {'median':>12} {'min':>12} {'ops/s':>14}")
+    for scale in scales:
+        scale_dir = os.path.join(workdir, scale.name)
+        os.makedirs(scale_dir)
+        workload = Workload(scale, scale_dir, hash_iterations, seed)
+        try:
+            for name, ops, setup in selected:
+                ops = ops(scale) if callable(ops) else ops
+                samples = measure(setup(workload), ops, repeat)
+                median = statistics.median(samples)
+                results.append({
+                    'name': name,
+                    'scale': scale.name,
+                    'users': scale.users,
+                    'readings': scale.readings,
+                    'ops': ops,
+                    'repeat': repeat,
+                    'median': median,
+                    'min': min(samples),
+                    'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+                    'samples': samples,
+                })
+                print(f"{name:<40} {scale.name:<8} {ops:>9,} {format_seconds(median):>12} "
+                      f"{format_seconds(min(samples)):>12} {1 / median:>14,.0f}")
+        finally:
+            workload.close()
+    return results
+
+
+def format_seconds(seconds):
+    for unit, factor in (('s', 1), ('ms', 1e3), ('us', 1e6)):
+        if seconds * factor >= 1:
+            return f"{seconds * factor:.2f} {unit}"
+    return f"{seconds * 1e9:.0f} ns"
+
+
+def load_results(path):
+    with open(path) as f:
+        document = json.load(f)
+    if document.get('suite_version') != SUITE_VERSION:
+        raise SystemExit(f"{path} was written by suite version {document.get('suite_version')}, "
+                         f"expected {SUITE_VERSION}")
+    return document
+
+
+def compare(base, head, threshold):
+    """
+    Print the median change per case and scale between two result documents.
+
+    :return: Number of cases slower than ``threshold`` (a fraction, e.g. 0.1 for 10%)
+    """
+    base_results = {(r['name'], r['scale']): r for r in base['results']}
+    print(f"base {(base.get('commit') or '?')[:10]}  ->  head {(head.get('commit') or '?')[:10]}")
+    print(f"{'case':<40} {'scale':<8} {'base':>12} {'head':>12} {'change':>9}")
+    regressions = 0
+    for result in head['results']:
+        previous = base_results.get((result['name'], result['scale']))
+        if previous is None:
+            continue
+        change = result['median'] / previous['median'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        elif change < -threshold:
+            flag = '  improved'
+        print(f"{result['name']:<40} {result['scale']:<8} {format_seconds(previous['median']):>12} "
+              f"{format_seconds(result['median']):>12} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'], choices=list(SCALES) + ['custom'])
+    parser.add_argument('--users', type=int, help='Users for the custom scale')
+    parser.add_argument('--readings', type=int, help='Readings for the custom scale')
+    parser.add_argument('--cases', nargs='+', default=[], help='Only run cases whose name starts with one of these')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--hash-iterations', type=int, default=None,
+                        help='PBKDF2 iterations for benchmark accounts (default: the app default)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', nargs='+', metavar='RESULTS',
+                        help='Compare against a base result file; with two files, compare them without running')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Median slowdown reported as a regression')
+    parser.add_argument('--list', action='store_true', help='List cases and scales, then exit')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, ops, _ in CASES:
+            print(name)
+        for scale in SCALES.values():
+            print(f"{scale.name}: {scale.users:,} users, {scale.readings:,} readings")
+        return
+
+    if args.compare and len(args.compare) == 2:
+        regressions = compare(load_results(args.compare[0]), load_results(args.compare[1]), args.threshold)
+        sys.exit(1 if regressions else 0)
+    base = load_results(args.compare[0]) if args.compare else None
+
+    scales = []
+    for name in args.scales:
+        if name == 'custom':
+            if not (args.users and args.readings):
+                parser.error('--scales custom needs --users and --readings')
+            scales.append(Scale('custom', args.users, args.readings))
+        else:
+            scales.append(SCALES[name])
+
+    from password_hashing import DEFAULT_ITERATIONS
+    hash_iterations = args.hash_iterations or DEFAULT_ITERATIONS
+    commit, dirty = git_commit()
+    output = os.path.abspath(args.output or os.path.join(
+        RESULTS_DIR, f"{(commit or 'unknown')[:12]}{'-dirty' if dirty else ''}.json"))
+
+    results = run_suite(scales, args.cases, args.repeat, hash_iterations, args.seed)
+    document = {
+        'suite_version': SUITE_VERSION,
+        'commit': commit,
+        'dirty': dirty,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'hash_iterations': hash_iterations,
+        'seed': args.seed,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if base is not None:
+        print()
+        sys.exit(1 if compare(base, document, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/stress_sqlite.py
+"""
+Concurrency stress test for the pooled users.db and reminders.db access.
+
+Runs N threads that register, log in, validate sessions, add and complete
+reminders, and log out, all against the shared UserAuthentication and
+NotificationManager instances. Reports operations/sec and every error,
+and exits non-zero if any "database is locked" error occurred.
+
+Usage:
+    python benchmarks/stress_sqlite.py [--threads 32] [--rounds 20]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def worker(thread_id, rounds, auth_manager, notification_manager, ops, errors, lock):
+    for i in range(rounds):
+        username = f"stress-{thread_id}-{i}"
+        try:
+            user_id = auth_manager.register_user(username, f"{username}@example.com", 'correct horse')
+            token = auth_manager.login(username, 'correct horse')
+            assert user_id and token, "register/login failed"
+            for _ in range(5):
+                assert auth_manager.validate_session(token) == user_id
+            reminder_id = notification_manager.add_medication_reminder(user_id, 'Aspirin', '81mg', 24)
+            notification_manager.mark_reminder_completed(reminder_id)
+            notification_manager.get_upcoming_reminders(user_id)
+            auth_manager.logout(token)
+            with lock:
+                ops['ok'] += 11
+        except Exception as e:
+            with lock:
+                errors[f"{type(e).__name__}: {e}"] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=20, help='Register/login/.../logout cycles per thread')
+    args = parser.parse_args()
+
+    # Keep the benchmark's databases out of the working tree
+    os.chdir(tempfile.mkdtemp(prefix='cardio-stress-'))
+    logging.disable(logging.WARNING)
+    from auth import auth_manager
+    from notifications import notification_manager
+
+    ops, errors, lock = Counter(), Counter(), threading.Lock()
+    threads = [
+        threading.Thread(target=worker, args=(n, args.rounds, auth_manager, notification_manager, ops, errors, lock))
+        for n in range(args.threads)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.threads} threads x {args.rounds} rounds: {ops['ok']:,} operations in {elapsed:.2f}s "
+          f"= {ops['ok'] / elapsed:,.0f} ops/s")
+    for error, count in errors.most_common():
+        print(f"  {count:>5}  {error}")
+    locked = sum(count for error, count in errors.items() if 'database is locked' in error)
+    print(f"'database is locked' errors: {locked}")
+    sys.exit(1 if locked else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/synthetic.py
+"""
+Deterministic synthetic data for benchmarks.
+
+Generates users, reminders and health readings with plausible
+distributions at a chosen scale. The same seed always produces the same
+data, so results from different commits measure the same workload.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from metrics_store import METRIC_COLUMNS
+
+# Medications cycled through when generating reminders
+MEDICATIONS = [('Lisinopril', '10mg'), ('Atorvastatin', '20mg'), ('Metoprolol', '50mg'),
+               ('Aspirin', '81mg'), ('Amlodipine', '5mg')]
+
+
+@dataclass(frozen=True)
+class Scale:
+    name: str
+    users: int
+    readings: int
+
+
+# Preset scales: readings are one user's history; users sizes the account,
+# reminder and multi-user emergency workloads
+SCALES = {
+    'small': Scale('small', users=1, readings=1_000),
+    'medium': Scale('medium', users=100, readings=100_000),
+    'large': Scale('large', users=10_000, readings=1_000_000),
+}
+
+
+def user_ids(count):
+    return [f"bench-user-{i}" for i in range(count)]
+
+
+def generate_readings(count, seed=0, end=None, span=timedelta(days=29)):
+    """
+    Readings evenly spread over ``span`` up to ``end``, as a DataFrame.
+
+    Vitals are present on every reading; lab values, weight and exercise
+    are sparse (NaN) as they are in real exports. About 1% of readings are
+    tachycardia or hypertensive spikes so emergency rules have work to do.
+
+    :param count: Number of readings
+    :param seed: Random seed
+    :param end: Timestamp of the newest reading; defaults to now
+    :param span: Time covered by the readings
+    :return: DataFrame with ``timestamp`` and every METRIC_COLUMNS column
+    """
+    rng = np.random.default_rng(seed)
+    end = np.datetime64(end or datetime.now(), 'ns')
+    offsets = np.linspace(span / timedelta(microseconds=1), 0, count).astype('timedelta64[us]')
+    frame = pd.DataFrame({'timestamp': end - offsets.astype('timedelta64[ns]')})
+
+    frame['heart_rate'] = rng.normal(74, 10, count)
+    frame['bp_systolic'] = rng.normal(122, 12, count)
+    frame['bp_diastolic'] = rng.normal(80, 8, count)
+    spikes = rng.random(count) < 0.01
+    frame.loc[spikes, 'heart_rate'] += 70
+    frame.loc[spikes, 'bp_systolic'] += 60
+    frame.loc[spikes, 'bp_diastolic'] += 40
+
+    sparse = {
+        'cholesterol_total': (195, 30),
+        'cholesterol_ldl': (115, 25),
+        'cholesterol_hdl': (52, 10),
+        'blood_sugar': (100, 18),
+        'weight': (80, 12),
+        'exercise_minutes': (30, 15),
+    }
+    for column, (mean, std) in sparse.items():
+        values = rng.normal(mean, std, count)
+        values[rng.random(count) > 0.05] = np.nan
+        frame[column] = values
+    frame['height'] = np.where(np.isnan(frame['weight']), np.nan, 1.75)
+    frame['bmi'] = frame['weight'] / frame['height'] ** 2
+    return frame[['timestamp'] + METRIC_COLUMNS]
+
+
+def generate_stream(count, users, seed=0):
+    """
+    Interleaved multi-user vitals for EmergencyDetector.process.
+
+    :return: (datetime64[ns] timestamps, {column: values}, per-reading user keys)
+    """
+    rng = np.random.default_rng(seed)
+    keys = np.array(user_ids(users), dtype=object)[rng.integers(0, users, count)]
+    start = np.datetime64('2024-01-01T00:00:00', 'ns')
+    timestamps = start + np.sort(rng.integers(0, max(count // users, 1) * 60 * 10**9, count)).astype('timedelta64[ns]')
+    columns = {
+        'heart_rate': rng.normal(85, 20, count),
+        'bp_systolic': rng.normal(130, 20, count),
+        'bp_diastolic': rng.normal(85, 12, count),
+    }
+    return timestamps, columns, keys
+
+
+def generate_reminders(users, per_user=5, seed=0):
+    """
+    Medication reminders as keyword arguments for add_medication_reminder.
+
+    Frequencies of 4 to 48 hours put roughly half the reminders inside the
+    next day, the window get_upcoming_reminders looks at.
+    """
+    rng = np.random.default_rng(seed)
+    reminders = []
+    for user_id in user_ids(users):
+        for i in range(per_user):
+            medication, dosage = MEDICATIONS[i % len(MEDICATIONS)]
+            reminders.append({
+                'user_id': user_id,
+                'medication_name': medication,
+                'dosage': dosage,
+                'frequency': int(rng.integers(4, 49)),
+                'contact_method': 'Email',
+                'contact_info': f"{user_id}@example.com",
+            })
+    return reminders
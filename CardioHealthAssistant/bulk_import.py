@@ -0,0 +1,216 @@
+# bulk_import.py
+"""
+Streaming bulk importer for device exports (CSV or NDJSON).
+
+Usage:
+    python bulk_import.py export.csv --user-id USER_ID [--format csv|ndjson] [--chunksize 100000]
+"""
+
+import argparse
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+
+from metrics_store import METRIC_COLUMNS, calculate_bmi, split_blood_pressure
+
+# Rows parsed and written per chunk; bounds memory regardless of file size
+DEFAULT_CHUNKSIZE = 100_000
+
+# Columns holding a full reading date and time, in order of preference
+TIMESTAMP_COLUMNS = ['timestamp', 'datetime', 'start_date', 'startdate']
+
+# Device-export column names mapped onto tracker metric names
+COLUMN_ALIASES = {
+    'heart_rate_bpm': 'heart_rate',
+    'heartrate': 'heart_rate',
+    'bpm': 'heart_rate',
+    'resting_heart_rate': 'heart_rate',
+    'systolic': 'bp_systolic',
+    'systolic_pressure': 'bp_systolic',
+    'blood_pressure_systolic': 'bp_systolic',
+    'diastolic': 'bp_diastolic',
+    'diastolic_pressure': 'bp_diastolic',
+    'blood_pressure_diastolic': 'bp_diastolic',
+    'glucose': 'blood_sugar',
+    'blood_glucose': 'blood_sugar',
+    'weight_kg': 'weight',
+    'body_mass': 'weight',
+    'height_m': 'height',
+    'active_minutes': 'exercise_minutes',
+    'exercise_time': 'exercise_minutes',
+    'total_cholesterol': 'cholesterol_total',
+    'ldl': 'cholesterol_ldl',
+    'hdl': 'cholesterol_hdl',
+}
+
+# Plausible ranges; values outside them are treated as missing
+VALID_RANGES = {
+    'heart_rate': (20, 300),
+    'bp_systolic': (40, 300),
+    'bp_diastolic': (20, 200),
+    'cholesterol_total': (50, 500),
+    'cholesterol_ldl': (10, 500),
+    'cholesterol_hdl': (5, 200),
+    'blood_sugar': (10, 1000),
+    'weight': (1, 500),
+    'height': (0.3, 3.0),
+    'exercise_minutes': (0, 1440),
+}
+
+
+@dataclass
+class ImportResult:
+    rows_read: int = 0
+    rows_imported: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_rejected(self):
+        return self.rows_read - self.rows_imported
+
+    @property
+    def rows_per_sec(self):
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+
+def _detect_format(source, fmt):
+    if fmt:
+        return fmt
+    name = source if isinstance(source, str) else getattr(source, 'name', '')
+    return 'ndjson' if os.path.splitext(name)[1].lower() in ('.ndjson', '.jsonl', '.json') else 'csv'
+
+
+def iter_chunks(source, fmt=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Stream a CSV or NDJSON export as DataFrame chunks.
+
+    :param source: File path or file-like object
+    :param fmt: 'csv' or 'ndjson'; inferred from the file name if omitted
+    :param chunksize: Rows per chunk
+    """
+    if _detect_format(source, fmt) == 'ndjson':
+        reader = pd.read_json(source, lines=True, chunksize=chunksize, dtype=False, convert_dates=False)
+    else:
+        reader = pd.read_csv(source, chunksize=chunksize)
+    with reader:
+        yield from reader
+
+
+def prepare_chunk(chunk):
+    """
+    Normalize, validate and enrich one chunk, fully vectorized.
+
+    Renames known aliases, parses timestamps to naive UTC, coerces
+    metrics to numbers, blanks out implausible values, computes BMI, and
+    drops rows without a valid timestamp or any metric.
+
+    :return: DataFrame with a ``timestamp`` column and the recognized METRIC_COLUMNS
+    """
+    chunk = chunk.rename(columns=lambda name: str(name).strip().lower().replace(' ', '_'))
+    # An alias only applies when its metric has no column of its own, so renames never duplicate a column
+    renames = {}
+    for column in chunk.columns:
+        target = COLUMN_ALIASES.get(column)
+        if target is not None and target not in chunk and target not in renames.values():
+            renames[column] = target
+    chunk = chunk.rename(columns=renames)
+
+    prepared = pd.DataFrame({'timestamp': _parse_timestamps(chunk)})
+
+    # Exports with a combined "sys/dia" column are split into the numeric columns
+    if 'blood_pressure' in chunk and 'bp_systolic' not in chunk and 'bp_diastolic' not in chunk:
+        bp_systolic, bp_diastolic = split_blood_pressure(chunk['blood_pressure'])
+        chunk = chunk.assign(bp_systolic=bp_systolic, bp_diastolic=bp_diastolic)
+
+    for column, (low, high) in VALID_RANGES.items():
+        if column in chunk:
+            values = pd.to_numeric(chunk[column], errors='coerce')
+            prepared[column] = values.where(values.between(low, high))
+
+    if 'weight' in prepared and 'height' in prepared:
+        prepared['bmi'] = calculate_bmi(prepared['weight'].to_numpy(), prepared['height'].to_numpy())
+
+    metrics = [column for column in METRIC_COLUMNS if column in prepared]
+    has_metric = prepared[metrics].notna().any(axis=1) if metrics else False
+    return prepared[prepared['timestamp'].notna() & has_metric][['timestamp'] + metrics]
+
+
+def _parse_timestamps(chunk):
+    """
+    Parse a chunk's reading times as naive UTC.
+
+    Offsets may differ from row to row; times without an offset are
+    taken to be UTC. Exports with separate ``date`` and ``time``
+    columns have the two combined.
+    """
+    column = next((name for name in TIMESTAMP_COLUMNS if name in chunk), None)
+    if column is not None:
+        raw = chunk[column]
+    elif 'date' in chunk and 'time' in chunk:
+        raw = chunk['date'].astype(str).str.strip() + ' ' + chunk['time'].astype(str).str.strip()
+    elif 'date' in chunk or 'time' in chunk:
+        raw = chunk['date' if 'date' in chunk else 'time']
+    else:
+        raise ValueError("Import file has no timestamp/date column")
+    return pd.to_datetime(raw, errors='coerce', utc=True).dt.tz_convert(None)
+
+
+def import_metrics(source, user_id, database, fmt=None, chunksize=DEFAULT_CHUNKSIZE, progress=None):
+    """
+    Import a device export into the metrics database in large batches.
+
+    :param source: File path or file-like object
+    :param user_id: Owner of the imported readings
+    :param database: MetricsDatabase to write into
+    :param fmt: 'csv' or 'ndjson'; inferred from the file name if omitted
+    :param chunksize: Rows parsed and written per transaction
+    :param progress: Optional callable(ImportResult) invoked after each chunk
+    :return: ImportResult with row counts and throughput
+    """
+    result = ImportResult()
+    start = time.perf_counter()
+    for chunk in iter_chunks(source, fmt, chunksize):
+        result.rows_read += len(chunk)
+        prepared = prepare_chunk(chunk)
+        if len(prepared):
+            result.rows_imported += database.add_frame(user_id, prepared)
+        result.seconds = time.perf_counter() - start
+        if progress is not None:
+            progress(result)
+
+    result.seconds = time.perf_counter() - start
+    logging.info(
+        f"Imported {result.rows_imported}/{result.rows_read} readings for user {user_id} "
+        f"at {result.rows_per_sec:,.0f} rows/sec"
+    )
+    return result
+
+
+def main():
+    from metrics_db import MetricsDatabase
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('source', help='CSV or NDJSON export file')
+    parser.add_argument('--user-id', required=True)
+    parser.add_argument('--format', choices=['csv', 'ndjson'])
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--db', default='metrics.db', help='Metrics database path')
+    args = parser.parse_args()
+
+    database = MetricsDatabase(args.db)
+    try:
+        result = import_metrics(
+            args.source, args.user_id, database, args.format, args.chunksize,
+            progress=lambda r: print(f"\r{r.rows_read:,} rows read, {r.rows_per_sec:,.0f} rows/sec", end='')
+        )
+    finally:
+        database.close()
+    print(f"\nImported {result.rows_imported:,} rows ({result.rows_rejected:,} rejected) "
+          f"in {result.seconds:.1f}s: {result.rows_per_sec:,.0f} rows/sec")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+# caching.py
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with optional entry TTL and memory cap.
+
+    Entries are evicted least-recently-used first whenever the entry count
+    exceeds ``max_entries`` or the summed ``sizeof`` of all values exceeds
+    ``max_bytes``.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=None, ttl=None, sizeof=sys.getsizeof):
+        """
+        :param max_entries: Maximum number of cached entries
+        :param max_bytes: Optional cap on the summed size of cached values
+        :param ttl: Optional time-to-live in seconds for each entry
+        :param sizeof: Callable estimating the size of a value in bytes
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING, record=False) is not _MISSING
+
+    def get(self, key, default=None, record=True):
+        """Return a cached value and mark it recently used, or ``default``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                if record:
+                    self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            if record:
+                self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """Insert or replace a value, evicting old entries as needed."""
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, expires_at)
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.current_bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_set(self, key, factory):
+        """Return the cached value for ``key``, computing it with ``factory()`` on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def pop(self, key, default=None):
+        """Remove an entry and return its value."""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            return self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key):
+        value, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+        return value
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current usage."""
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+_MISSING = object()
+
+
+class LazySingleton:
+    """
+    Thread-safe holder that builds a shared object on first use.
+
+    Calling the holder returns the object, running ``factory`` exactly once
+    even when several threads ask for it at the same time.
+    """
+
+    def __init__(self, factory):
+        """
+        :param factory: Zero-argument callable that builds the object
+        """
+        self._factory = factory
+        self._instance = _MISSING
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        if self._instance is _MISSING:
+            with self._lock:
+                if self._instance is _MISSING:
+                    self._instance = self._factory()
+        return self._instance
+
+    @property
+    def initialized(self):
+        """Whether the object has been built yet."""
+        return self._instance is not _MISSING
@@ -1,22 +1,37 @@
 # chat.py
 
 import os
+import time
+import itertools
+import atexit
+import threading
 import logging
-import google.generativeai as genai
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-import pandas as pd
 import numpy as np
+from metrics_store import (ColumnarMetricsStore, METRIC_COLUMNS, RunningStats, calculate_bmi, normalize_reading,
+                           utc_now)
+from emergency_detection import EmergencyDetector
+from metrics_db import MetricsDatabase
+from bulk_import import import_metrics
+from metrics_rollup import MetricRollups, downsample_time_series, MAX_CHART_POINTS
+from response_cache import ResponseCache
+from caching import LazySingleton
+from tracker_registry import TrackerEvictedError, TrackerRegistry
+from instrumentation import registry, timed
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure API and logging
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-# Set up logging to capture interactions and errors
-logging.basicConfig(filename='chatbot.log', level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+# Hot-path metrics, exported by the server's /metrics endpoint
+MODEL_REQUEST_SECONDS = registry.histogram(
+    'model_request_seconds', 'Seconds from sending a message to the full model reply', ['mode']
+)
+MODEL_FIRST_CHUNK_SECONDS = registry.histogram(
+    'model_first_chunk_seconds', 'Seconds from sending a message to the first streamed chunk', ['mode']
+)
+CHAT_REPLIES = registry.counter('chat_replies_total', 'Chat replies by source (model or cache)', ['source'])
+ADD_METRIC_SECONDS = registry.histogram('add_metric_seconds', 'Seconds to record one health metric reading')
 
 # Model generation configuration
 generation_config = {
@@ -35,12 +50,8 @@ SAFETY_SETTINGS = [
     {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
 ]
 
-# Initialize the model with specialized cardiovascular instructions
-model = genai.GenerativeModel(
-    model_name="gemini-1.5-pro",
-    generation_config=generation_config,
-    system_instruction=(
-        """You are a specialized Cardiovascular Health Assistant, designed to help manage and monitor cardiovascular health. Your responses should be:
+# Specialized cardiovascular instructions for the model
+SYSTEM_INSTRUCTION = """You are a specialized Cardiovascular Health Assistant, designed to help manage and monitor cardiovascular health. Your responses should be:
 1. Medically informed but easily understandable
 2. Always emphasize consulting healthcare providers for medical decisions
 3. Focus on evidence-based lifestyle modifications and adherence
@@ -56,58 +67,157 @@ Key areas of focus:
 - Stress management
 - Risk factor identification
 - Symptom monitoring"""
-    ),
-)
+
+def _create_model():
+    """Configure the Gemini SDK and build the model; the SDK is imported here because it is slow to load."""
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(
+        model_name="gemini-1.5-pro",
+        generation_config=generation_config,
+        system_instruction=SYSTEM_INSTRUCTION,
+    )
+
+# Shared Gemini model, created on the first chat
+get_model = LazySingleton(_create_model)
+
+# Process-wide source of data versions; a rebuilt tracker never repeats a version an earlier one had
+_data_versions = itertools.count()
 
 # Global health metrics storage
 class HealthMetricsTracker:
-    def __init__(self):
-        self.metrics_df = pd.DataFrame(columns=[
-            'timestamp', 
-            'heart_rate', 
-            'blood_pressure', 
-            'cholesterol_total', 
-            'cholesterol_ldl', 
-            'cholesterol_hdl', 
-            'blood_sugar', 
-            'weight', 
-            'height', 
-            'bmi',
-            'exercise_minutes'
-        ])
+    def __init__(self, user_id=None, database=None):
+        """
+        Track health metrics for a single user.
 
+        :param user_id: Owner of the metrics, used as the persistence key
+        :param database: Optional MetricsDatabase that readings are written through to
+        """
+        self.user_id = user_id
+        self.database = database
+        # Drawn afresh from _data_versions on every change to the readings; caches key on it
+        self.data_version = next(_data_versions)
+        # Serializes writes with snapshots; once the TrackerRegistry sets evicted, writes are refused
+        self._lock = threading.Lock()
+        self.evicted = False
+        self._metrics_df = None
+        self._metrics_df_version = -1
+        self._reset()
+
+    def _reset(self):
+        self.store = ColumnarMetricsStore(METRIC_COLUMNS)
+        self.stats = {column: RunningStats() for column in METRIC_COLUMNS}
+        self.rollups = MetricRollups(self.store.numeric_columns)
+        self.emergency_detector = EmergencyDetector()
+
+    @property
+    def nbytes(self):
+        """Approximate bytes held by this tracker's readings and rollups."""
+        return self.store.nbytes + self.rollups.nbytes
+
+    @property
+    def metrics_df(self):
+        """DataFrame view of all readings, materialized only when requested."""
+        if self._metrics_df_version != self.data_version:
+            self._metrics_df = self.store.to_dataframe()
+            self._metrics_df_version = self.data_version
+        return self._metrics_df
+
+    @timed(ADD_METRIC_SECONDS)
     def add_metric(self, **kwargs):
-        timestamp = datetime.now()
-        new_entry = {'timestamp': timestamp}
-        
-        # Add all provided metrics
-        for key, value in kwargs.items():
-            new_entry[key] = value
+        # Readings default to now (naive UTC); clients syncing earlier readings pass their own timestamp
+        timestamp = kwargs.pop('timestamp', None) or utc_now()
+        # Add all provided metrics, splitting a legacy "sys/dia" string into numeric columns
+        new_entry = normalize_reading(kwargs)
         
         # Calculate BMI if weight and height are provided
         if 'weight' in kwargs and 'height' in kwargs:
             new_entry['bmi'] = self._calculate_bmi(kwargs['weight'], kwargs['height'])
         
-        # Convert DataFrame to use _append method
-        self.metrics_df = pd.concat([self.metrics_df, pd.DataFrame([new_entry])], ignore_index=True)
-        logging.info(f"Added health metric: {new_entry}")
+        with self._lock:
+            # An evicted tracker's spill file would miss this reading
+            if self.evicted:
+                raise TrackerEvictedError(f"Tracker for user {self.user_id} was evicted; look it up again")
+            # Append to the columnar store (amortized O(1))
+            self.store.append(timestamp, new_entry)
+            self.data_version = next(_data_versions)
+            self._update_stats(new_entry)
+            self.rollups.add(timestamp, new_entry)
+            if self.database is not None:
+                self.database.add_reading(self.user_id, timestamp, new_entry)
+            alerts = self.emergency_detector.update(self.user_id, timestamp, new_entry)
+        logging.info("Added health metric reading for user %s", self.user_id,
+                     extra={'reading_time': timestamp, 'metrics': new_entry})
+        
+        for alert in alerts:
+            logging.warning("Emergency alert %s for user %s: %s", alert.rule, self.user_id, alert.value)
+        return alerts
+
+    def load_history(self, start=None, end=None):
+        """
+        Replace the in-memory readings with the persisted readings in a time window.
+
+        :param start: Optional inclusive lower bound
+        :param end: Optional exclusive upper bound
+        """
+        if self.database is None:
+            return
+        history = self.database.load_range(self.user_id, start, end)
+        columns = {column: history[column].to_numpy() for column in METRIC_COLUMNS}
+        self._replace_readings(history['timestamp'].to_numpy(), columns)
+        logging.info(f"Loaded {len(history)} readings for user {self.user_id}")
+
+    def to_records(self):
+        """All in-memory readings as one structured array, e.g. for spilling to disk."""
+        with self._lock:
+            return self.store.to_records()
+
+    def load_records(self, records):
+        """Replace the in-memory readings with ``to_records`` output."""
+        # Back-dated readings may have been appended out of order; rollups and alert replay need time order
+        records = records[np.argsort(records['timestamp'], kind='stable')]
+        columns = {name: records[name] for name in records.dtype.names if name != 'timestamp'}
+        self._replace_readings(records['timestamp'].view('datetime64[ns]'), columns)
+
+    def _replace_readings(self, timestamps, columns):
+        """Reset to the given readings, rebuilding statistics, rollups and alert state."""
+        with self._lock:
+            self._reset()
+            self.store.extend(timestamps, columns)
+            self.data_version = next(_data_versions)
+            for column, values in columns.items():
+                self.stats.setdefault(column, RunningStats()).update_many(values)
+            self.rollups.extend(self.store.timestamps, columns)
+            
+            # Replay history so sustained-condition rules pick up where the data left off
+            self.emergency_detector.process(self.store.timestamps, columns, key=self.user_id)
+
+    def get_time_series(self, metric, start=None, end=None, max_points=MAX_CHART_POINTS):
+        """
+        Return a bounded number of chart points for a metric over a time window.
+
+        :return: Tuple of (DataFrame with timestamp/value/min/max, resolution name)
+        """
+        return downsample_time_series(self.store, self.rollups, metric, start, end, max_points)
+
+    def get_active_alerts(self):
+        """Emergency rules currently triggered by this user's readings, most severe first."""
+        return self.emergency_detector.active_alerts(self.user_id)
+
+    def _update_stats(self, entry):
+        """Fold a new reading into the running statistics."""
+        for key, value in entry.items():
+            if key not in self.stats:
+                self.stats[key] = RunningStats()
+            self.stats[key].update(value)
 
     def _calculate_bmi(self, weight, height):
         """Calculate BMI. Assumes weight in kg and height in meters."""
-        return weight / (height ** 2)
+        return calculate_bmi(weight, height)
 
     def get_metrics_summary(self):
-        """Generate a summary of health metrics."""
-        summary = {}
-        for column in self.metrics_df.columns:
-            if column != 'timestamp':
-                summary[column] = {
-                    'average': self.metrics_df[column].mean(),
-                    'min': self.metrics_df[column].min(),
-                    'max': self.metrics_df[column].max(),
-                    'last': self.metrics_df[column].iloc[-1] if not self.metrics_df.empty else None
-                }
-        return summary
+        """Generate a summary of health metrics from the running statistics."""
+        return {column: stats.as_summary() for column, stats in self.stats.items()}
 
     def generate_health_report(self):
         """Generate a comprehensive health report with personalized recommendations."""
@@ -194,65 +304,208 @@ def generate_personalized_recommendations(metrics_summary):
     else:
         return "No specific health recommendations at this time. Keep tracking your metrics!"
 
-# Initialize global health metrics tracker
-health_metrics_tracker = HealthMetricsTracker()
+def _open_metrics_db():
+    database = MetricsDatabase()
+    atexit.register(database.close)
+    return database
+
+# Persistent per-user metrics storage, opened on first use
+get_metrics_db = LazySingleton(_open_metrics_db)
+
+# Per-user trackers, keyed by user ID
+DEFAULT_USER_ID = 'default'
+HISTORY_WINDOW = timedelta(days=30)
+
+def _new_tracker(user_id):
+    return HealthMetricsTracker(user_id=user_id, database=get_metrics_db())
+
+def _load_recent_history(tracker):
+    tracker.load_history(start=utc_now() - HISTORY_WINDOW)
+
+def _open_tracker_registry():
+    tracker_registry = TrackerRegistry(_new_tracker, _load_recent_history)
+    atexit.register(tracker_registry.close)
+    return tracker_registry
+
+# Hot users stay in memory within TRACKER_MEMORY_BUDGET_MB; cold users are spilled to disk
+get_tracker_registry = LazySingleton(_open_tracker_registry)
+
+def get_health_metrics_tracker(user_id=None):
+    """Return the tracker for a user, loading their recent history on first use."""
+    return get_tracker_registry().get(user_id or DEFAULT_USER_ID)
 
 # User data storage structures
 user_preferences = {}  # Stores user-specific preferences and goals
 user_data = {}  # Stores user health data like age, gender, etc.
 reminder_schedule = {}  # Schedule for reminders
 
-def update_health_metrics(metric, value, **additional_metrics):
+def add_health_metric(user_id=None, **values):
+    """
+    Record one reading for a user, keeping their tracker resident while it is written.
+
+    :return: Emergency alerts newly triggered by the reading
+    """
+    registry = get_tracker_registry()
+    while True:
+        try:
+            with registry.pinned(user_id or DEFAULT_USER_ID) as tracker:
+                return tracker.add_metric(**values)
+        except TrackerEvictedError:
+            # Discarded (e.g. by an import) before the reading was stored; write it to the rebuilt tracker
+            continue
+
+def update_health_metrics(metric, value, user_id=None, **additional_metrics):
     """Update health metrics with additional context."""
     try:
-        health_metrics_tracker.add_metric(**{metric: value, **additional_metrics})
-        logging.info(f"Updated health metric: {metric} = {value}")
+        add_health_metric(user_id, **{metric: value, **additional_metrics})
+        logging.info("Updated health metric %s for user %s", metric, user_id)
     except Exception as e:
         logging.error(f"Error updating health metrics: {e}")
 
-def get_health_metrics_summary():
+def import_health_metrics(source, user_id=None, **import_options):
+    """Bulk import a CSV/NDJSON device export for a user and refresh their loaded history."""
+    user_id = user_id or DEFAULT_USER_ID
+    result = import_metrics(source, user_id, get_metrics_db(), **import_options)
+    # In-memory and spilled copies predate the import; the next lookup reads the database
+    get_tracker_registry().discard(user_id)
+    return result
+
+def get_health_metrics_summary(user_id=None):
     """Retrieve health metrics summary."""
-    return health_metrics_tracker.get_metrics_summary()
+    return get_health_metrics_tracker(user_id).get_metrics_summary()
 
-def get_health_report():
+def get_health_report(user_id=None):
     """Retrieve generated health report."""
-    return health_metrics_tracker.generate_health_report()
+    return get_health_metrics_tracker(user_id).generate_health_report()
+
+# Cache of model replies to repeated opening questions (exact matches only)
+response_cache = ResponseCache()
 
-def initialize_chat_session(history=None):
-    """Initialize a chat session with the specialized cardiovascular instructions."""
-    return model.start_chat(history=history or [])
+def initialize_chat_session(history=None, chat_model=None):
+    """
+    Initialize a chat session with the specialized cardiovascular instructions.
+
+    :param history: Optional prior conversation turns
+    :param chat_model: Optional model to chat with instead of the configured Gemini model
+    """
+    return (chat_model or get_model()).start_chat(history=history or [])
+
+def _response_text(response):
+    """Extract the text of a (possibly partial) model response, or '' if it has none."""
+    if not response.candidates or not response.candidates[0].content.parts:
+        return ""
+    return response.candidates[0].content.parts[0].text
+
+def _log_exchange(source, user_input, bot_response):
+    # Full text only at DEBUG, so each turn doesn't copy the whole reply into the log
+    logging.info("Chat reply from %s", source,
+                 extra={'prompt_chars': len(user_input), 'reply_chars': len(bot_response)})
+    logging.debug("User: %s", user_input)
+    logging.debug("Bot: %s", bot_response)
+
+def _cached_response(chat_session, user_input, follow_up):
+    """Return a cached reply for the message and record the exchange in the session, or None."""
+    bot_response = response_cache.get(user_input, follow_up)
+    if bot_response is not None:
+        CHAT_REPLIES.labels('cache').inc()
+        chat_session.history = list(chat_session.history) + [
+            {'role': 'user', 'parts': [user_input]},
+            {'role': 'model', 'parts': [bot_response]},
+        ]
+        _log_exchange('cache', user_input, bot_response)
+    return bot_response
 
 def send_message_to_chatbot(chat_session, user_input):
     """Send a user message to the chatbot and return the response."""
-    response = chat_session.send_message(user_input)
-    bot_response = response.candidates[0].content.parts[0].text.strip()  # Keep text with formatting
-    logging.info(f"User: {user_input}")
-    logging.info(f"Bot: {bot_response}")
+    # Only a conversation's first message can be answered from the cache; later replies depend on history
+    follow_up = bool(chat_session.history)
+    cached = _cached_response(chat_session, user_input, follow_up)
+    if cached is not None:
+        return cached
+    with MODEL_REQUEST_SECONDS.labels('sync').time():
+        response = chat_session.send_message(user_input)
+    bot_response = _response_text(response).strip()  # Keep text with formatting
+    response_cache.put(user_input, bot_response, follow_up)
+    CHAT_REPLIES.labels('model').inc()
+    _log_exchange('model', user_input, bot_response)
+    return bot_response
+
+def stream_message_to_chatbot(chat_session, user_input):
+    """Send a user message to the chatbot and yield response text chunks as they arrive."""
+    # Only a conversation's first message can be answered from the cache; later replies depend on history
+    follow_up = bool(chat_session.history)
+    cached = _cached_response(chat_session, user_input, follow_up)
+    if cached is not None:
+        yield cached
+        return
+    start = time.perf_counter()
+    response = chat_session.send_message(user_input, stream=True)
+    chunks = []
+    for chunk in response:
+        text = _response_text(chunk)
+        if text:
+            if not chunks:
+                MODEL_FIRST_CHUNK_SECONDS.labels('sync').observe(time.perf_counter() - start)
+            chunks.append(text)
+            yield text
+    bot_response = ''.join(chunks).strip()
+    response_cache.put(user_input, bot_response, follow_up)
+    CHAT_REPLIES.labels('model').inc()
+    _log_exchange('model', user_input, bot_response)
+
+async def send_message_to_chatbot_async(chat_session, user_input):
+    """Send a user message to the chatbot without blocking the event loop and return the response."""
+    # Only a conversation's first message can be answered from the cache; later replies depend on history
+    follow_up = bool(chat_session.history)
+    cached = _cached_response(chat_session, user_input, follow_up)
+    if cached is not None:
+        return cached
+    with MODEL_REQUEST_SECONDS.labels('async').time():
+        response = await chat_session.send_message_async(user_input)
+    bot_response = _response_text(response).strip()
+    response_cache.put(user_input, bot_response, follow_up)
+    CHAT_REPLIES.labels('model').inc()
+    _log_exchange('model', user_input, bot_response)
     return bot_response
 
+async def stream_message_to_chatbot_async(chat_session, user_input):
+    """Send a user message to the chatbot and asynchronously yield response text chunks."""
+    # Only a conversation's first message can be answered from the cache; later replies depend on history
+    follow_up = bool(chat_session.history)
+    cached = _cached_response(chat_session, user_input, follow_up)
+    if cached is not None:
+        yield cached
+        return
+    start = time.perf_counter()
+    response = await chat_session.send_message_async(user_input, stream=True)
+    chunks = []
+    async for chunk in response:
+        text = _response_text(chunk)
+        if text:
+            if not chunks:
+                MODEL_FIRST_CHUNK_SECONDS.labels('async').observe(time.perf_counter() - start)
+            chunks.append(text)
+            yield text
+    bot_response = ''.join(chunks).strip()
+    response_cache.put(user_input, bot_response, follow_up)
+    CHAT_REPLIES.labels('model').inc()
+    _log_exchange('model', user_input, bot_response)
+
 def update_user_data(data):
     """Update user data (e.g., age, gender) based on input."""
     user_data.update(data)
-    logging.info(f"Updated user data: {user_data}")
+    logging.info("Updated user data fields: %s", sorted(data))
 
 def set_reminder(event, interval_minutes):
     """Set a reminder for a specified event with a recurring interval in minutes."""
     next_reminder = datetime.now() + timedelta(minutes=interval_minutes)
     reminder_schedule[event] = next_reminder
-    logging.info(f"Reminder set for '{event}' at {next_reminder}")
-
-def detect_emergency():
-    """Check for critical conditions in health metrics and return emergency alerts."""
-    emergency_alert = None
-    if "blood_pressure" in user_data:
-        systolic, diastolic = map(int, user_data["blood_pressure"].split("/"))
-        if systolic >= 180 or diastolic >= 120:
-            emergency_alert = "Your blood pressure is critically high. Please seek immediate medical attention!"
-            logging.warning("Critical blood pressure detected.")
-    if "heart_rate" in user_data and int(user_data["heart_rate"]) > 120:
-        emergency_alert = "Your heart rate is unusually high. Consider seeing a healthcare provider if this persists."
-        logging.warning("High heart rate detected.")
-    return emergency_alert
+    logging.info("Reminder set for '%s' at %s", event, next_reminder)
+
+def detect_emergency(user_id=None):
+    """Check for critical conditions in a user's health metrics and return the most severe alert."""
+    active = get_health_metrics_tracker(user_id).get_active_alerts()
+    return active[0].message if active else None
 
 def personalize_response(response):
     """Personalize the bot's response based on stored user preferences and data."""
@@ -261,3 +514,15 @@ def personalize_response(response):
     if "age" in user_data:
         response += f" Based on your age of {user_data['age']}, consider consulting your doctor for age-specific advice."
     return response
+
+# Shared objects built on first access, so importing this module stays cheap
+_LAZY_ATTRIBUTES = {
+    'model': get_model,
+    'metrics_db': get_metrics_db,
+    'health_metrics_tracker': get_health_metrics_tracker,
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,120 @@
+# chat_context.py
+
+import logging
+import re
+
+# Rough characters-per-token ratio used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Cheap, offline token estimate for budgeting purposes."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def extractive_summary(previous_summary, turns, max_tokens):
+    """
+    Fold conversation turns into a compact rolling summary without a model call.
+
+    Keeps the first sentence of each turn, newest last, and drops the oldest
+    material once the summary exceeds ``max_tokens``.
+
+    :param previous_summary: Existing summary text ('' if none)
+    :param turns: List of (role, text) tuples being folded in
+    :param max_tokens: Token budget for the summary
+    :return: New summary text
+    """
+    lines = [line for line in previous_summary.splitlines() if line]
+    for role, text in turns:
+        first_sentence = re.split(r'(?<=[.!?])\s', text.strip(), maxsplit=1)[0]
+        speaker = 'User' if role == 'user' else 'Assistant'
+        lines.append(f"- {speaker}: {first_sentence[:300]}")
+
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+class ChatContextManager:
+    def __init__(self, max_context_tokens=4000, keep_turns=6, summary_max_tokens=400,
+                 summarizer=extractive_summary, count_tokens=estimate_tokens, max_transcript=500):
+        """
+        Keep the model-facing chat history within a token budget.
+
+        The most recent ``keep_turns`` exchanges are sent verbatim; older
+        exchanges are folded into a rolling summary. The full transcript is
+        kept separately (up to ``max_transcript`` messages) for display.
+
+        :param max_context_tokens: Token budget for summary plus verbatim turns
+        :param keep_turns: Maximum number of user/model exchanges kept verbatim
+        :param summary_max_tokens: Token budget for the rolling summary
+        :param summarizer: Callable(previous_summary, turns, max_tokens) -> summary
+        :param count_tokens: Callable(text) -> token count
+        :param max_transcript: Maximum number of messages kept for display
+        """
+        self.max_context_tokens = max_context_tokens
+        self.keep_turns = keep_turns
+        self.summary_max_tokens = summary_max_tokens
+        self.summarizer = summarizer
+        self.count_tokens = count_tokens
+        self.max_transcript = max_transcript
+
+        self.summary = ''
+        self.recent = []  # [(user_text, model_text)]
+        self.transcript = []  # [(role, text)], newest last
+
+    def record_exchange(self, chat_session, user_text, model_text):
+        """
+        Record a completed exchange and rewrite the session history to the budgeted context.
+
+        :param chat_session: Chat session whose ``history`` is replaced
+        :param user_text: The user's message
+        :param model_text: The model's full reply
+        """
+        self.transcript.append(('user', user_text))
+        self.transcript.append(('model', model_text))
+        if len(self.transcript) > self.max_transcript:
+            del self.transcript[:len(self.transcript) - self.max_transcript]
+
+        self.recent.append((user_text, model_text))
+        self._fold_old_turns()
+        chat_session.history = self.context_history()
+
+    def _recent_tokens(self):
+        return sum(self.count_tokens(u) + self.count_tokens(m) for u, m in self.recent)
+
+    def _fold_old_turns(self):
+        folded = []
+        while len(self.recent) > 1 and (
+            len(self.recent) > self.keep_turns
+            or self._recent_tokens() + self.count_tokens(self.summary) > self.max_context_tokens
+        ):
+            user_text, model_text = self.recent.pop(0)
+            folded.extend([('user', user_text), ('model', model_text)])
+
+        if folded:
+            self.summary = self.summarizer(self.summary, folded, self.summary_max_tokens)
+            logging.info(f"Folded {len(folded) // 2} chat turns into the rolling summary")
+
+    def context_history(self):
+        """Return the budgeted history as content dicts: summary preamble plus recent turns."""
+        history = []
+        if self.summary:
+            history.append({'role': 'user', 'parts': [f"Summary of our earlier conversation:\n{self.summary}"]})
+            history.append({'role': 'model', 'parts': ["Understood. I'll keep that context in mind."]})
+        for user_text, model_text in self.recent:
+            history.append({'role': 'user', 'parts': [user_text]})
+            history.append({'role': 'model', 'parts': [model_text]})
+        return history
+
+    def page_count(self, page_size):
+        return max(1, -(-len(self.transcript) // page_size))
+
+    def page(self, pages, page_size):
+        """
+        Return the newest ``pages * page_size`` transcript messages, oldest first.
+
+        :param pages: Number of pages to show, counting back from the newest message
+        :param page_size: Messages per page
+        """
+        return self.transcript[-pages * page_size:]
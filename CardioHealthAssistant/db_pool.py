@@ -0,0 +1,92 @@
+# db_pool.py
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from instrumentation import registry
+
+# Applied to every pooled connection unless overridden. WAL lets readers run
+# alongside the single writer; NORMAL sync skips the per-commit fsync, which
+# WAL makes safe against corruption (only the last commits can be lost on power loss).
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+}
+
+# Prepared statements kept per connection; queries are reused verbatim, so
+# each distinct SQL string is parsed once per thread
+DEFAULT_CACHED_STATEMENTS = 256
+
+# Shared by every module that talks to SQLite, labelled by the operation performed
+SQLITE_QUERY_SECONDS = registry.histogram(
+    'sqlite_query_seconds', 'Seconds spent in SQLite operations', ['operation']
+)
+
+
+class SQLiteConnectionPool:
+    def __init__(self, db_path, timeout=5.0, pragmas=None, cached_statements=DEFAULT_CACHED_STATEMENTS):
+        """
+        Hand out one SQLite connection per thread for a database file.
+
+        sqlite3 connections must not be shared across threads, so each
+        thread lazily opens its own and reuses it for later queries.
+        Connections owned by threads that have exited are closed the next
+        time a connection is opened.
+
+        :param db_path: Path to SQLite database file
+        :param timeout: Seconds to wait on a locked database (busy timeout)
+        :param pragmas: {name: value} PRAGMAs applied to each new connection, on top of DEFAULT_PRAGMAS
+        :param cached_statements: Prepared statements cached per connection
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False,
+                                   cached_statements=self.cached_statements)
+            for name, value in self.pragmas.items():
+                conn.execute(f'PRAGMA {name}={value}')
+            self._local.conn = conn
+            with self._lock:
+                self._close_orphans()
+                self._connections[threading.current_thread()] = conn
+        return conn
+
+    def _close_orphans(self):
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            self._connections.pop(thread).close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run a write transaction on the calling thread's connection.
+
+        BEGIN IMMEDIATE takes the write lock up front, so concurrent writers
+        queue on the busy timeout instead of failing with "database is
+        locked" when a read transaction tries to upgrade.
+        """
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def close_all(self):
+        """Close every connection opened by the pool."""
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
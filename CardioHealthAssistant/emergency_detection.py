@@ -0,0 +1,232 @@
+# emergency_detection.py
+
+import math
+import operator
+from dataclasses import dataclass
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+BLOOD_PRESSURE_CRISIS_MESSAGE = "Your blood pressure is critically high. Please seek immediate medical attention!"
+
+# Severity order used to pick the alert shown to the user
+SEVERITY_RANK = {'warning': 1, 'critical': 2}
+
+_OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+
+class ThresholdRule:
+    def __init__(self, name, metric, op, threshold, message, duration=None, max_gap=None, severity='warning'):
+        """
+        Alert when a metric crosses a threshold, optionally for a sustained period.
+
+        A rule fires once per run of consecutive matching readings: as soon
+        as the run has lasted ``duration``, or on its first reading when no
+        duration is set. A non-matching reading, or a gap longer than
+        ``max_gap`` between readings, ends the run.
+
+        :param name: Rule identifier
+        :param metric: Metric the rule applies to
+        :param op: Comparison, one of '>', '>=', '<', '<='
+        :param threshold: Value compared against
+        :param message: Alert text shown to the user
+        :param duration: timedelta the condition must hold; None fires on a single reading
+        :param max_gap: Largest gap between readings that keeps a run going; defaults to ``duration``
+        :param severity: 'warning' or 'critical'
+        """
+        if op not in _OPERATORS:
+            raise ValueError(f"Unknown comparison: {op}")
+        self.name = name
+        self.metric = metric
+        self.op = op
+        self.threshold = threshold
+        self.message = message
+        self.severity = severity
+        self.compare = _OPERATORS[op]
+        self.duration_ns = int((duration or timedelta(0)).total_seconds() * 1e9)
+        gap = max_gap if max_gap is not None else duration
+        self.max_gap_ns = int(gap.total_seconds() * 1e9) if gap else None
+
+
+DEFAULT_RULES = [
+    ThresholdRule('hypertensive_crisis_systolic', 'bp_systolic', '>=', 180,
+                  BLOOD_PRESSURE_CRISIS_MESSAGE, severity='critical'),
+    ThresholdRule('hypertensive_crisis_diastolic', 'bp_diastolic', '>=', 120,
+                  BLOOD_PRESSURE_CRISIS_MESSAGE, severity='critical'),
+    ThresholdRule('high_heart_rate', 'heart_rate', '>', 120,
+                  "Your heart rate is unusually high. Consider seeing a healthcare provider if this persists."),
+    ThresholdRule('sustained_high_heart_rate', 'heart_rate', '>', 120,
+                  "Your heart rate has stayed above 120 bpm for over 5 minutes. "
+                  "Please seek medical attention if you feel unwell.",
+                  duration=timedelta(minutes=5), severity='critical'),
+]
+
+
+@dataclass
+class EmergencyAlert:
+    key: object
+    rule: str
+    timestamp: pd.Timestamp
+    value: float
+    severity: str
+    message: str
+
+
+class _RunState:
+    """Where one key's current run of matching readings stands for one rule."""
+
+    __slots__ = ('matching', 'start', 'last', 'fired')
+
+    def __init__(self, matching, start, last, fired):
+        self.matching = matching
+        self.start = start
+        self.last = last
+        self.fired = fired
+
+
+class EmergencyDetector:
+    def __init__(self, rules=None):
+        """
+        Evaluate threshold rules over streams of readings for many keys (e.g. users).
+
+        ``process`` evaluates whole batches with NumPy; ``update`` handles
+        one reading. Both carry run state between calls, so readings can be
+        fed incrementally as they arrive and sustained rules span batches.
+
+        :param rules: ThresholdRules to evaluate; defaults to DEFAULT_RULES
+        """
+        self.rules = list(rules if rules is not None else DEFAULT_RULES)
+        self._state = {rule.name: {} for rule in self.rules}
+
+    def update(self, key, timestamp, values):
+        """
+        Evaluate one reading.
+
+        :param key: Whose reading this is
+        :param timestamp: Reading time
+        :param values: {metric: value}; missing or NaN metrics are skipped
+        :return: List of EmergencyAlert fired by this reading
+        """
+        t = pd.Timestamp(timestamp).value
+        alerts = []
+        for rule in self.rules:
+            value = values.get(rule.metric)
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            matching = bool(rule.compare(value, rule.threshold))
+            states = self._state[rule.name]
+            state = states.get(key)
+            continues = (
+                state is not None and state.matching and matching
+                and (rule.max_gap_ns is None or t - state.last <= rule.max_gap_ns)
+            )
+            if not continues:
+                state = states[key] = _RunState(matching, t, t, False)
+            state.last = t
+            if matching and not state.fired and t - state.start >= rule.duration_ns:
+                state.fired = True
+                alerts.append(EmergencyAlert(key, rule.name, pd.Timestamp(t), float(value),
+                                             rule.severity, rule.message))
+        return alerts
+
+    def process(self, timestamps, columns, keys=None, key=None):
+        """
+        Evaluate a batch of readings, vectorized per rule.
+
+        :param timestamps: Array-like of reading times
+        :param columns: {metric: array-like of floats}; NaN marks a missing value
+        :param keys: Optional array-like of keys, one per reading
+        :param key: Key shared by every reading when ``keys`` is omitted
+        :return: List of EmergencyAlert in time order per key
+        """
+        t = np.asarray(pd.to_datetime(np.asarray(timestamps)), dtype='datetime64[ns]').astype(np.int64)
+        n = len(t)
+        if keys is None:
+            unique_keys, codes = np.array([key], dtype=object), np.zeros(n, dtype=np.int64)
+        else:
+            codes, unique_keys = pd.factorize(np.asarray(keys, dtype=object))
+
+        # Order by key, then time, so each key's readings are contiguous
+        order = np.lexsort((t, codes))
+        t, codes = t[order], codes[order]
+
+        alerts = []
+        for rule in self.rules:
+            if rule.metric not in columns:
+                continue
+            values = np.asarray(columns[rule.metric], dtype=np.float64)[order]
+            present = ~np.isnan(values)
+            alerts.extend(self._process_rule(rule, t[present], codes[present], values[present], unique_keys))
+        alerts.sort(key=lambda alert: (str(alert.key), alert.timestamp))
+        return alerts
+
+    def _process_rule(self, rule, t, codes, values, unique_keys):
+        n = len(t)
+        if n == 0:
+            return []
+        states = self._state[rule.name]
+        matching = rule.compare(values, rule.threshold)
+        index = np.arange(n)
+
+        key_start = np.ones(n, dtype=bool)
+        key_start[1:] = codes[1:] != codes[:-1]
+        run_start = key_start.copy()
+        run_start[1:] |= matching[1:] != matching[:-1]
+        if rule.max_gap_ns is not None:
+            run_start[1:] |= (t[1:] - t[:-1]) > rule.max_gap_ns
+
+        start_index = np.maximum.accumulate(np.where(run_start, index, 0))
+        start_t = t[start_index]
+
+        # Runs still open from the previous batch continue into each key's first run
+        first_rows = np.flatnonzero(key_start)
+        run_bounds = np.append(np.flatnonzero(run_start), n)
+        carried_fired = np.zeros(n, dtype=bool)
+        for row in first_rows:
+            state = states.get(unique_keys[codes[row]])
+            if (state is not None and state.matching and matching[row]
+                    and (rule.max_gap_ns is None or t[row] - state.last <= rule.max_gap_ns)):
+                in_run = slice(row, run_bounds[np.searchsorted(run_bounds, row) + 1])
+                start_t[in_run] = state.start
+                carried_fired[in_run] = state.fired
+
+        sustained = matching & (t - start_t >= rule.duration_ns)
+        first_sustained = sustained.copy()
+        first_sustained[1:] &= run_start[1:] | ~sustained[:-1]
+        fire = first_sustained & ~carried_fired
+
+        # Remember where each key's last run stands for the next batch
+        last_rows = np.append(first_rows[1:] - 1, n - 1)
+        for row in last_rows:
+            in_run = slice(start_index[row], row + 1)
+            states[unique_keys[codes[row]]] = _RunState(
+                bool(matching[row]), int(start_t[row]), int(t[row]),
+                bool(carried_fired[row] or sustained[in_run].any())
+            )
+
+        return [
+            EmergencyAlert(unique_keys[codes[row]], rule.name, pd.Timestamp(t[row]), float(values[row]),
+                           rule.severity, rule.message)
+            for row in np.flatnonzero(fire)
+        ]
+
+    def active_alerts(self, key=None):
+        """
+        Rules whose condition currently holds for a key and has fired.
+
+        :return: List of ThresholdRule, most severe first
+        """
+        active = [
+            rule for rule in self.rules
+            if (state := self._state[rule.name].get(key)) is not None and state.matching and state.fired
+        ]
+        return sorted(active, key=lambda rule: SEVERITY_RANK.get(rule.severity, 0), reverse=True)
+
+    def reset(self, key=None):
+        """Forget run state for one key, or for every key if omitted."""
+        for states in self._state.values():
+            if key is None:
+                states.clear()
+            else:
+                states.pop(key, None)
@@ -0,0 +1,413 @@
+# instrumentation.py
+"""
+Counters, gauges, histograms and timers for hot paths, with Prometheus and JSON export.
+
+Modules declare their metrics once on the shared ``registry`` and record
+into them inline or through ``timed``. Setting INSTRUMENTATION_ENABLED=0
+(or ``registry.enabled = False``) turns recording off, leaving one
+attribute check per instrumented call.
+"""
+
+import bisect
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as _StackCounter, deque
+
+# Histogram upper bounds in seconds, from sub-millisecond cache hits to slow model replies
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Per-request sampling profiles are only taken when this is set, and only when a request asks
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '0') == '1'
+
+# Seconds between stack samples and number of finished profiles kept for inspection
+PROFILE_INTERVAL = 0.005
+PROFILE_HISTORY = 20
+
+
+class _CounterChild:
+    __slots__ = ('_registry', '_lock', 'value')
+
+    def __init__(self, registry):
+        self._registry = registry
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        if not self._registry.enabled:
+            return
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ('_registry', 'value')
+
+    def __init__(self, registry):
+        self._registry = registry
+        self.value = 0
+
+    def set(self, value):
+        if self._registry.enabled:
+            self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ('_registry', '_lock', 'buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, registry, buckets):
+        self._registry = registry
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        if not self._registry.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager that observes the seconds spent inside it."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('_histogram', '_start')
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, description, labelnames=()):
+        self._registry = registry
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        # Unlabelled metrics record straight into a single child
+        self._default = self.labels() if not self.labelnames else None
+
+    def labels(self, *values):
+        """Return the child metric for one combination of label values, creating it on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        """Snapshot of (label values, child) pairs."""
+        with self._lock:
+            return list(self._children.items())
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild(self._registry)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild(self._registry)
+
+    def set(self, value):
+        self._default.set(value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(registry, name, description, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self._registry, self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+class MetricsRegistry:
+    def __init__(self, enabled=True):
+        """
+        Named metrics shared by every module in the process.
+
+        :param enabled: Whether metrics record; can be flipped at runtime
+        """
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class, name, *args, **kwargs):
+        # Streamlit reruns scripts, so declaring an existing metric again returns it
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(self, name, *args, **kwargs)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, description, labelnames=()):
+        return self._get_or_create(Counter, name, description, labelnames)
+
+    def gauge(self, name, description, labelnames=()):
+        return self._get_or_create(Gauge, name, description, labelnames)
+
+    def histogram(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, description, labelnames, buckets)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def to_prometheus(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for values, child in metric.samples():
+                labels = dict(zip(metric.labelnames, values))
+                if metric.kind in ('counter', 'gauge'):
+                    lines.append(f"{metric.name}{_format_labels(labels)} {child.value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), child.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{metric.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+                lines.append(f"{metric.name}_sum{_format_labels(labels)} {child.sum}")
+                lines.append(f"{metric.name}_count{_format_labels(labels)} {child.count}")
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self):
+        """Every metric as plain data, with approximate p50/p99 for histograms."""
+        result = {}
+        for metric in self.metrics():
+            samples = []
+            for values, child in metric.samples():
+                sample = {'labels': dict(zip(metric.labelnames, values))}
+                if metric.kind in ('counter', 'gauge'):
+                    sample['value'] = child.value
+                else:
+                    sample.update({
+                        'count': child.count,
+                        'sum': child.sum,
+                        'mean': child.sum / child.count if child.count else None,
+                        'p50': _bucket_quantile(metric.buckets, child.counts, 0.5),
+                        'p99': _bucket_quantile(metric.buckets, child.counts, 0.99),
+                    })
+                samples.append(sample)
+            result[metric.name] = {'type': metric.kind, 'help': metric.description, 'samples': samples}
+        return result
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{name}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _bucket_quantile(buckets, counts, quantile):
+    """
+    Upper bound of the bucket holding the quantile.
+
+    :return: Seconds, or None without observations or when the quantile is past the largest bucket
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = quantile * total
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        if cumulative >= rank:
+            return bound
+    return None
+
+
+def timed(histogram, *label_values, errors=None):
+    """
+    Decorator recording a function's duration in ``histogram``.
+
+    Works for plain and async functions. Generators should time their body
+    with ``histogram.time()`` instead, since calling one returns immediately.
+
+    :param histogram: Histogram to observe into
+    :param label_values: Label values selecting the histogram child
+    :param errors: Optional Counter (same labels) incremented when the call raises
+    """
+    child = histogram.labels(*label_values)
+    error_child = errors.labels(*label_values) if errors is not None else None
+    registry = histogram._registry
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not registry.enabled:
+                    return await func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException:
+                    if error_child is not None:
+                        error_child.inc()
+                    raise
+                finally:
+                    child.observe(time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                if error_child is not None:
+                    error_child.inc()
+                raise
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+
+    return decorator
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL, max_depth=64):
+        """
+        Statistical profiler that samples one thread's Python stack on a timer.
+
+        A background thread reads the target's current frame every
+        ``interval`` seconds and counts collapsed stacks, so the profiled
+        code runs unmodified and pays only for the periodic sampling.
+
+        :param thread_id: Thread to sample; defaults to the calling thread
+        :param interval: Seconds between samples
+        :param max_depth: Deepest frames kept per stack
+        """
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = _StackCounter()
+        self.samples = 0
+        self.started_at = None
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.seconds = time.perf_counter() - self.started_at
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, limit=20):
+        """Most frequently sampled stacks as (stack, samples) pairs."""
+        return self.stacks.most_common(limit)
+
+    def collapsed(self):
+        """Samples in the collapsed-stack format read by flamegraph tools."""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+# Finished per-request profiles, newest last
+recent_profiles = deque(maxlen=PROFILE_HISTORY)
+
+
+def new_profile_id():
+    return uuid.uuid4().hex[:12]
+
+
+def record_profile(label, profiler, profile_id=None):
+    """Keep a finished profile for later inspection and return its id."""
+    profile_id = profile_id or new_profile_id()
+    recent_profiles.append({
+        'id': profile_id,
+        'label': label,
+        'seconds': profiler.seconds,
+        'samples': profiler.samples,
+        'top': profiler.top(),
+        'collapsed': profiler.collapsed(),
+    })
+    return profile_id
+
+
+# Process-wide registry every module records into
+registry = MetricsRegistry(enabled=os.getenv('INSTRUMENTATION_ENABLED', '1') == '1')
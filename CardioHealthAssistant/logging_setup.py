@@ -0,0 +1,227 @@
+# logging_setup.py
+"""
+Process-wide logging that keeps file I/O off request threads.
+
+Callers log as usual through ``logging``. Records are put on a bounded
+queue and a QueueListener thread formats them (JSON by default) and
+writes them to a size-rotated file. High-volume INFO/DEBUG messages are
+rate limited per message template, so hot paths should log with lazy
+%-style arguments rather than f-strings: the template stays constant and
+suppressed records are never formatted.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from instrumentation import registry
+
+LOG_FILE = os.getenv('LOG_FILE', 'app.log')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# 'json' writes one structured object per line; 'text' keeps the classic single-line format
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+
+# Records per second allowed per message template at INFO and below, after an initial burst; 0 disables sampling
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '10'))
+LOG_SAMPLE_BURST = int(os.getenv('LOG_SAMPLE_BURST', '100'))
+
+# Records waiting for the writer thread; when full, new records are dropped rather than blocking the caller
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Distinct templates tracked by the sampler before its state is reset (bounds memory if callers use f-strings)
+MAX_SAMPLED_TEMPLATES = 4096
+
+LOG_RECORDS_DROPPED = registry.counter(
+    'log_records_dropped_total', 'Log records not written, by reason (sampled or queue_full)', ['reason']
+)
+
+# Attributes every LogRecord has; anything else on a record came from ``extra`` and is emitted as a field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, including any fields passed through ``extra``."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=_json_default)
+
+
+def _json_default(value):
+    # NumPy scalars expose item(); timestamps and everything else fall back to str
+    item = getattr(value, 'item', None)
+    return item() if callable(item) else str(value)
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate=LOG_SAMPLE_RATE, burst=LOG_SAMPLE_BURST, max_level=logging.INFO):
+        """
+        Token-bucket rate limit per (logger, message template).
+
+        Records above ``max_level`` always pass. When records resume after
+        being suppressed, the first one carries a ``suppressed`` count.
+
+        :param rate: Records per second allowed per template
+        :param burst: Records allowed back-to-back before the rate applies
+        :param max_level: Highest level that is subject to sampling
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        self._buckets = {}  # (logger, template) -> [tokens, last refill, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_SAMPLED_TEMPLATES:
+                    self._buckets.clear()
+                bucket = self._buckets[key] = [self.burst, now, 0]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                bucket[2] += 1
+                suppressed = None
+            else:
+                bucket[0] = tokens - 1
+                suppressed, bucket[2] = bucket[2], 0
+        if suppressed is None:
+            LOG_RECORDS_DROPPED.labels('sampled').inc()
+            return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records when the queue is full and defers formatting to the listener."""
+
+    def prepare(self, record):
+        # Only interpolate the message here, which snapshots mutable arguments;
+        # timestamps, JSON encoding and file writes happen on the listener thread
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels('queue_full').inc()
+
+
+class _LogWriter(QueueListener):
+    def enqueue_sentinel(self):
+        # The queue may be full when stopping; wait for the writer to make room
+        self.queue.put(self._sentinel)
+
+
+_listener = None
+_queue_handler = None
+_lock = threading.Lock()
+
+
+def configure_logging(filename=LOG_FILE, level=LOG_LEVEL, json_format=None, max_bytes=LOG_MAX_BYTES,
+                      backup_count=LOG_BACKUP_COUNT, sample_rate=LOG_SAMPLE_RATE,
+                      sample_burst=LOG_SAMPLE_BURST, queue_size=LOG_QUEUE_SIZE, force=False):
+    """
+    Route the root logger through a queue to a rotating file written by a background thread.
+
+    Safe to call repeatedly (Streamlit reruns the app script): once
+    configured, later calls keep the running pipeline unless ``force``.
+
+    :param filename: Log file path
+    :param level: Root logger level
+    :param json_format: Write JSON lines; defaults to LOG_FORMAT
+    :param max_bytes: Size at which the file is rotated
+    :param backup_count: Rotated files kept
+    :param sample_rate: Records per second per message template at INFO and below; 0 disables sampling
+    :param sample_burst: Records per template allowed back-to-back
+    :param queue_size: Records buffered for the writer thread before new ones are dropped
+    :param force: Replace an existing pipeline
+    :return: The running QueueListener
+    """
+    global _listener, _queue_handler
+    with _lock:
+        if _listener is not None:
+            if not force:
+                return _listener
+            _shutdown()
+
+        if json_format is None:
+            json_format = LOG_FORMAT == 'json'
+        file_handler = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count,
+                                           encoding='utf-8', delay=True)
+        file_handler.setFormatter(JSONFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+
+        log_queue = queue.Queue(maxsize=queue_size)
+        _queue_handler = NonBlockingQueueHandler(log_queue)
+        if sample_rate:
+            _queue_handler.addFilter(SamplingFilter(sample_rate, sample_burst))
+
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+            handler.close()
+        root.addHandler(_queue_handler)
+        root.setLevel(level)
+
+        _listener = _LogWriter(log_queue, file_handler, respect_handler_level=True)
+        _listener.start()
+        return _listener
+
+
+def shutdown_logging():
+    """Write out queued records and detach the pipeline from the root logger."""
+    with _lock:
+        _shutdown()
+
+
+def _shutdown():
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    _queue_handler = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,311 @@
+# metrics_db.py
+
+import sqlite3
+import threading
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+
+from db_pool import SQLITE_QUERY_SECONDS, SQLiteConnectionPool
+from instrumentation import timed
+from metrics_store import METRIC_COLUMNS
+
+# Seconds the writer waits before retrying a failed commit
+RETRY_DELAY = 1.0
+
+# PRAGMA user_version of the current health_metrics layout; 1 split blood_pressure into numeric columns,
+# 2 made (user_id, timestamp) unique
+SCHEMA_VERSION = 2
+
+
+class MetricsDatabase:
+    def __init__(self, db_path='metrics.db', batch_size=200, flush_interval=2.0):
+        """
+        Initialize the persistent per-user health metrics store.
+
+        Writes are buffered and committed by a background writer thread in
+        groups of ``batch_size`` readings, or every ``flush_interval``
+        seconds, whichever comes first. Callers never wait on a commit
+        unless they ask to via ``flush``.
+
+        :param db_path: Path to SQLite database file
+        :param batch_size: Number of buffered readings that triggers a commit
+        :param flush_interval: Maximum seconds a reading stays buffered (0 waits for a full batch)
+        """
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.lock = threading.RLock()
+
+        # Range queries read on per-thread connections so they don't wait on the writer
+        self.read_pool = SQLiteConnectionPool(db_path)
+        self.create_tables()
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._queued = 0
+        self._committed = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._writer = threading.Thread(target=self._write_loop, name='metrics-db-writer', daemon=True)
+        self._writer.start()
+
+    def create_tables(self):
+        """Create the metrics table and its unique (user_id, timestamp) index, migrating older layouts."""
+        metric_columns = ',\n'.join(f"                {column} REAL" for column in METRIC_COLUMNS)
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS health_metrics (
+                    id INTEGER PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    timestamp DATETIME NOT NULL,
+{metric_columns}
+                )
+            ''')
+            self._migrate(cursor)
+            self.conn.commit()
+
+    def _migrate(self, cursor):
+        """Bring the table up to SCHEMA_VERSION, one layout step at a time."""
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        if version < 1:
+            self._migrate_metric_columns(cursor)
+        if version < 2:
+            self._migrate_unique_readings(cursor)
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _migrate_metric_columns(self, cursor):
+        """Add missing metric columns and backfill numeric blood pressure from legacy "sys/dia" text."""
+        existing = {row[1] for row in cursor.execute('PRAGMA table_info(health_metrics)')}
+        for column in METRIC_COLUMNS:
+            if column not in existing:
+                cursor.execute(f'ALTER TABLE health_metrics ADD COLUMN {column} REAL')
+
+        if 'blood_pressure' in existing:
+            # The legacy column is kept for older readers but no longer written
+            cursor.execute('''
+                UPDATE health_metrics
+                SET bp_systolic = CAST(substr(blood_pressure, 1, instr(blood_pressure, '/') - 1) AS REAL),
+                    bp_diastolic = CAST(substr(blood_pressure, instr(blood_pressure, '/') + 1) AS REAL)
+                WHERE bp_systolic IS NULL AND instr(blood_pressure, '/') > 1
+            ''')
+            logging.info(f"Migrated {cursor.rowcount} blood pressure readings to numeric columns")
+
+    def _migrate_unique_readings(self, cursor):
+        """Drop repeated readings (e.g. from an import run twice) and make (user_id, timestamp) unique."""
+        cursor.execute('''
+            DELETE FROM health_metrics WHERE id NOT IN (
+                SELECT MIN(id) FROM health_metrics GROUP BY user_id, timestamp
+            )
+        ''')
+        if cursor.rowcount:
+            logging.info(f"Removed {cursor.rowcount} duplicate health metric readings")
+        cursor.execute('DROP INDEX IF EXISTS idx_health_metrics_user_timestamp')
+        cursor.execute('''
+            CREATE UNIQUE INDEX idx_health_metrics_user_timestamp
+            ON health_metrics (user_id, timestamp)
+        ''')
+
+    def add_reading(self, user_id, timestamp, values):
+        """
+        Buffer a reading for the next batched commit.
+
+        :param user_id: Owner of the reading
+        :param timestamp: Reading timestamp
+        :param values: Mapping of metric name to value; unknown metrics are not persisted
+        """
+        row = _to_row(user_id, timestamp, values)
+        with self._cond:
+            self._pending.append(row)
+            self._queued += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def add_readings(self, rows):
+        """
+        Insert many readings in a single transaction, bypassing the buffer.
+
+        :param rows: Iterable of (user_id, timestamp, values) tuples
+        """
+        self._write([_to_row(user_id, timestamp, values) for user_id, timestamp, values in rows])
+
+    def add_frame(self, user_id, frame):
+        """
+        Insert a DataFrame of readings in a single transaction, bypassing the buffer.
+
+        Readings the user already has at the same timestamp are skipped, so
+        re-running an import that failed partway, or importing the same
+        export twice, adds nothing twice.
+
+        :param user_id: Owner of the readings
+        :param frame: DataFrame with a datetime ``timestamp`` column and any METRIC_COLUMNS
+        :return: Number of rows inserted
+        """
+        columns = [
+            frame['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S.%f').tolist()
+        ]
+        for column in METRIC_COLUMNS:
+            if column not in frame:
+                columns.append([None] * len(frame))
+            else:
+                values = frame[column].astype(np.float64)
+                columns.append(values.astype(object).where(values.notna(), None).tolist())
+        rows = [(user_id,) + row for row in zip(*columns)]
+        inserted = self._write(rows, skip_existing=True)
+        if inserted is None:
+            raise sqlite3.OperationalError("Failed to commit imported health metrics")
+        return inserted
+
+    def flush(self, timeout=10.0):
+        """
+        Wait until every reading buffered so far is committed.
+
+        :param timeout: Maximum seconds to wait
+        :return: True if all readings were committed in time
+        """
+        with self._cond:
+            target = self._queued
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(
+                lambda: self._committed >= target or not self._writer.is_alive(), timeout
+            ) and self._committed >= target
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or self._flush_requested or len(self._pending) >= self.batch_size,
+                    self.flush_interval or None
+                )
+                self._flush_requested = False
+                pending, self._pending = self._pending, []
+                closed = self._closed
+
+            if pending and self._write(pending) is None:
+                # Keep the readings so the next commit can retry them
+                with self._cond:
+                    self._pending = pending + self._pending
+                    self._cond.notify_all()
+                if closed:
+                    return
+                time.sleep(RETRY_DELAY)
+                continue
+
+            with self._cond:
+                self._committed += len(pending)
+                self._cond.notify_all()
+            if closed:
+                return
+
+    @timed(SQLITE_QUERY_SECONDS, 'metrics.write')
+    def _write(self, rows, skip_existing=False):
+        """
+        Insert rows in one transaction.
+
+        A row whose user already has a reading at its timestamp is dropped
+        if ``skip_existing``; otherwise its metrics are merged into that
+        reading, so metrics recorded separately at one instant all persist.
+
+        :return: Number of rows inserted or merged, or None if the commit failed
+        """
+        if not rows:
+            return 0
+        placeholders = ', '.join('?' for _ in range(len(METRIC_COLUMNS) + 2))
+        query = (
+            f"INSERT{' OR IGNORE' if skip_existing else ''} INTO health_metrics "
+            f"(user_id, timestamp, {', '.join(METRIC_COLUMNS)}) VALUES ({placeholders})"
+        )
+        if not skip_existing:
+            query += ' ON CONFLICT (user_id, timestamp) DO UPDATE SET ' + ', '.join(
+                f"{column} = COALESCE(excluded.{column}, {column})" for column in METRIC_COLUMNS
+            )
+        try:
+            with self.lock, self.conn:
+                before = self.conn.total_changes
+                self.conn.executemany(query, rows)
+                written = self.conn.total_changes - before
+            logging.info("Committed %d health metric readings", written)
+            return written
+        except sqlite3.Error as e:
+            logging.error(f"Failed to commit health metrics: {e}")
+            return None
+
+    @timed(SQLITE_QUERY_SECONDS, 'metrics.fetch_range')
+    def fetch_range(self, user_id, start=None, end=None):
+        """
+        Fetch a user's raw reading rows within a time window, oldest first.
+
+        :param user_id: Owner of the readings
+        :param start: Optional inclusive lower bound
+        :param end: Optional exclusive upper bound
+        :return: List of (timestamp, *METRIC_COLUMNS) tuples with ISO-8601 timestamps
+        """
+        query = f"SELECT timestamp, {', '.join(METRIC_COLUMNS)} FROM health_metrics WHERE user_id = ?"
+        params = [user_id]
+        if start is not None:
+            query += ' AND timestamp >= ?'
+            params.append(_format_timestamp(start))
+        if end is not None:
+            query += ' AND timestamp < ?'
+            params.append(_format_timestamp(end))
+        query += ' ORDER BY timestamp'
+
+        # Commit buffered readings first so callers see their own writes
+        self.flush()
+        return self.read_pool.connection().execute(query, params).fetchall()
+
+    def load_range(self, user_id, start=None, end=None):
+        """
+        Load a user's readings within a time window, oldest first.
+
+        :return: DataFrame with a timestamp column followed by METRIC_COLUMNS
+        """
+        rows = self.fetch_range(user_id, start, end)
+        df = pd.DataFrame(rows, columns=['timestamp'] + METRIC_COLUMNS)
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        for column in METRIC_COLUMNS:
+            df[column] = df[column].astype(np.float64)
+        return df
+
+    def close(self):
+        """Flush buffered readings and close the database connection."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        with self.lock:
+            self.conn.close()
+        self.read_pool.close_all()
+
+
+def _to_row(user_id, timestamp, values):
+    """Build an INSERT parameter tuple for one reading."""
+    return (user_id, _format_timestamp(timestamp)) + tuple(
+        _to_sql_value(values.get(column)) for column in METRIC_COLUMNS
+    )
+
+
+def _format_timestamp(timestamp):
+    """Format a timestamp as sortable ISO-8601 text."""
+    if isinstance(timestamp, str):
+        return timestamp
+    return pd.Timestamp(timestamp).isoformat(sep=' ', timespec='microseconds')
+
+
+def _to_sql_value(value):
+    """Convert NumPy scalars and NaN to SQLite-compatible values."""
+    if value is None:
+        return None
+    if isinstance(value, (np.floating, float)):
+        return None if value != value else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
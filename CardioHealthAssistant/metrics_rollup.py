@@ -0,0 +1,284 @@
+# metrics_rollup.py
+
+import numpy as np
+import pandas as pd
+
+# Rollup tiers, finest first: (name, bucket width)
+ROLLUP_TIERS = [
+    ('minute', np.timedelta64(1, 'm')),
+    ('hour', np.timedelta64(1, 'h')),
+    ('day', np.timedelta64(1, 'D')),
+]
+
+# Default upper bound on points sent to the browser per chart trace
+MAX_CHART_POINTS = 1000
+
+
+class RollupTier:
+    """
+    Fixed-width time buckets holding count/sum/min/max per metric.
+
+    Buckets are kept sorted by start time in growable arrays, so readings
+    arriving in time order update the last bucket or append a new one in
+    amortized O(1). Sums are float64 for accuracy; counts and extremes use
+    32-bit types to keep the per-minute tier small.
+    """
+
+    def __init__(self, name, width, metrics, initial_capacity=256):
+        self.name = name
+        self.width = np.timedelta64(width, 'ns').astype(np.int64)
+        self.metrics = list(metrics)
+        self._index = {metric: i for i, metric in enumerate(self.metrics)}
+        self._size = 0
+        self._allocate(max(int(initial_capacity), 1))
+
+    def __len__(self):
+        return self._size
+
+    def _allocate(self, capacity):
+        shape = (capacity, len(self.metrics))
+        self._starts = np.empty(capacity, dtype=np.int64)
+        self._count = np.zeros(shape, dtype=np.int32)
+        self._sum = np.zeros(shape, dtype=np.float64)
+        self._min = np.full(shape, np.inf, dtype=np.float32)
+        self._max = np.full(shape, -np.inf, dtype=np.float32)
+        self._capacity = capacity
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self._starts, self._count, self._sum, self._min, self._max))
+
+    def _grow(self, min_capacity):
+        old = (self._starts, self._count, self._sum, self._min, self._max)
+        capacity = self._capacity
+        while capacity < min_capacity:
+            capacity *= 2
+        self._allocate(capacity)
+        for new, previous in zip((self._starts, self._count, self._sum, self._min, self._max), old):
+            new[:self._size] = previous[:self._size]
+
+    def _bucket_row(self, bucket):
+        """Return the row for a bucket start, creating it if needed."""
+        if self._size and self._starts[self._size - 1] == bucket:
+            return self._size - 1
+
+        if self._size == self._capacity:
+            self._grow(self._size + 1)
+
+        row = self._size
+        if self._size and bucket < self._starts[self._size - 1]:
+            # Out-of-order reading: find or insert its bucket
+            row = int(np.searchsorted(self._starts[:self._size], bucket))
+            if self._starts[row] == bucket:
+                return row
+            for array in (self._starts, self._count, self._sum, self._min, self._max):
+                array[row + 1:self._size + 1] = array[row:self._size].copy()
+            self._count[row] = 0
+            self._sum[row] = 0.0
+            self._min[row] = np.inf
+            self._max[row] = -np.inf
+
+        self._starts[row] = bucket
+        self._size += 1
+        return row
+
+    def add(self, timestamp_ns, values):
+        """
+        Fold one reading into its bucket.
+
+        :param timestamp_ns: Reading timestamp as int64 nanoseconds since the epoch
+        :param values: Mapping of metric name to value; missing and NaN values are skipped
+        """
+        row = self._bucket_row(timestamp_ns - timestamp_ns % self.width)
+        for metric, value in values.items():
+            column = self._index.get(metric)
+            if column is None or value is None:
+                continue
+            value = float(value)
+            if value != value:
+                continue
+            self._count[row, column] += 1
+            self._sum[row, column] += value
+            if value < self._min[row, column]:
+                self._min[row, column] = value
+            if value > self._max[row, column]:
+                self._max[row, column] = value
+
+    def extend(self, timestamps_ns, columns):
+        """
+        Fold many time-ordered readings into the tier in one vectorized pass.
+
+        :param timestamps_ns: Sorted int64 nanosecond timestamps
+        :param columns: Mapping of metric name to float arrays aligned with timestamps
+        """
+        if len(timestamps_ns) == 0:
+            return
+
+        buckets = timestamps_ns - timestamps_ns % self.width
+        starts, first = np.unique(buckets, return_index=True)
+        if self._size and starts[0] < self._starts[self._size - 1]:
+            # Older than existing buckets; fall back to per-reading inserts
+            for i, timestamp in enumerate(timestamps_ns):
+                self.add(int(timestamp), {m: values[i] for m, values in columns.items()})
+            return
+
+        values = np.full((len(buckets), len(self.metrics)), np.nan)
+        for metric, column_values in columns.items():
+            if metric in self._index:
+                values[:, self._index[metric]] = column_values
+        present = ~np.isnan(values)
+
+        count = np.add.reduceat(present.astype(np.int32), first, axis=0)
+        total = np.add.reduceat(np.where(present, values, 0.0), first, axis=0)
+        low = np.minimum.reduceat(np.where(present, values, np.inf), first, axis=0)
+        high = np.maximum.reduceat(np.where(present, values, -np.inf), first, axis=0)
+
+        if self._size and starts[0] == self._starts[self._size - 1]:
+            # Merge the first new bucket into the current last bucket
+            last = self._size - 1
+            self._count[last] += count[0]
+            self._sum[last] += total[0]
+            self._min[last] = np.minimum(self._min[last], low[0])
+            self._max[last] = np.maximum(self._max[last], high[0])
+            starts, count, total, low, high = starts[1:], count[1:], total[1:], low[1:], high[1:]
+
+        new = len(starts)
+        if self._size + new > self._capacity:
+            self._grow(self._size + new)
+        end = self._size + new
+        self._starts[self._size:end] = starts
+        self._count[self._size:end] = count
+        self._sum[self._size:end] = total
+        self._min[self._size:end] = low
+        self._max[self._size:end] = high
+        self._size = end
+
+    def bucket_range(self, start_ns=None, end_ns=None):
+        """Return the [lo, hi) row slice covering buckets in a time window."""
+        starts = self._starts[:self._size]
+        lo = 0 if start_ns is None else int(np.searchsorted(starts, start_ns - start_ns % self.width))
+        hi = self._size if end_ns is None else int(np.searchsorted(starts, end_ns))
+        return lo, hi
+
+    def query(self, metric, start_ns=None, end_ns=None):
+        """
+        Return per-bucket statistics for a metric within a time window.
+
+        :return: DataFrame with timestamp, value (mean), min and max columns
+        """
+        lo, hi = self.bucket_range(start_ns, end_ns)
+        column = self._index[metric]
+        count = self._count[lo:hi, column]
+        filled = count > 0
+        return pd.DataFrame({
+            'timestamp': self._starts[lo:hi][filled].astype('datetime64[ns]'),
+            'value': self._sum[lo:hi, column][filled] / count[filled],
+            'min': self._min[lo:hi, column][filled],
+            'max': self._max[lo:hi, column][filled],
+        })
+
+
+class MetricRollups:
+    """Per-minute, per-hour and per-day rollups maintained as readings arrive."""
+
+    def __init__(self, metrics, tiers=ROLLUP_TIERS):
+        self.metrics = list(metrics)
+        self.tiers = [RollupTier(name, width, self.metrics) for name, width in tiers]
+
+    @property
+    def nbytes(self):
+        return sum(tier.nbytes for tier in self.tiers)
+
+    def add(self, timestamp, values):
+        timestamp_ns = int(np.datetime64(timestamp, 'ns').astype(np.int64))
+        for tier in self.tiers:
+            tier.add(timestamp_ns, values)
+
+    def extend(self, timestamps, columns):
+        timestamps_ns = np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64)
+        columns = {m: np.asarray(v, dtype=np.float64) for m, v in columns.items() if m in self.metrics}
+        for tier in self.tiers:
+            tier.extend(timestamps_ns, columns)
+
+    def select_tier(self, start_ns=None, end_ns=None, max_points=MAX_CHART_POINTS):
+        """Return the finest tier with at most ``max_points`` buckets in the window, else the coarsest."""
+        for tier in self.tiers:
+            lo, hi = tier.bucket_range(start_ns, end_ns)
+            if hi - lo <= max_points:
+                return tier
+        return self.tiers[-1]
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    :param x: Monotonic x values (numeric)
+    :param y: y values aligned with x
+    :param threshold: Number of points to keep
+    :return: Indices of the selected points
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    previous = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+
+        area = np.abs(
+            (x[previous] - avg_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (avg_y - y[previous])
+        )
+        previous = lo + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample_time_series(store, rollups, metric, start=None, end=None, max_points=MAX_CHART_POINTS):
+    """
+    Return at most ``max_points`` points for a metric over a time window.
+
+    Raw readings are used when they fit; otherwise the finest rollup tier
+    that fits is used, and LTTB thins the coarsest tier if even that is too
+    dense.
+
+    :param store: ColumnarMetricsStore holding the raw readings
+    :param rollups: MetricRollups maintained alongside the store
+    :return: Tuple of (DataFrame with timestamp/value/min/max, resolution name)
+    """
+    start_ns = None if start is None else int(np.datetime64(start, 'ns').astype(np.int64))
+    end_ns = None if end is None else int(np.datetime64(end, 'ns').astype(np.int64))
+
+    timestamps = store.timestamps.astype(np.int64)
+    values = store.column(metric)
+    in_range = ~np.isnan(values)
+    if start_ns is not None:
+        in_range &= timestamps >= start_ns
+    if end_ns is not None:
+        in_range &= timestamps < end_ns
+
+    if np.count_nonzero(in_range) <= max_points:
+        raw = values[in_range]
+        return pd.DataFrame({
+            'timestamp': timestamps[in_range].astype('datetime64[ns]'),
+            'value': raw,
+            'min': raw,
+            'max': raw,
+        }), 'raw'
+
+    tier = rollups.select_tier(start_ns, end_ns, max_points)
+    series = tier.query(metric, start_ns, end_ns)
+    if len(series) > max_points:
+        keep = lttb(series['timestamp'].astype(np.int64).to_numpy(), series['value'].to_numpy(), max_points)
+        series = series.iloc[keep].reset_index(drop=True)
+    return series, tier.name
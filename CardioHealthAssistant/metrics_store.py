@@ -0,0 +1,333 @@
+# metrics_store.py
+
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# Metric columns tracked for every reading, in display order
+METRIC_COLUMNS = [
+    'heart_rate',
+    'bp_systolic',
+    'bp_diastolic',
+    'cholesterol_total',
+    'cholesterol_ldl',
+    'cholesterol_hdl',
+    'blood_sugar',
+    'weight',
+    'height',
+    'bmi',
+    'exercise_minutes'
+]
+
+# Storage dtype for metric values; float32 keeps ~7 significant digits, ample for readings, at half the memory
+METRIC_DTYPE = np.float32
+
+
+class ColumnarMetricsStore:
+    """
+    Append-optimized columnar storage for health metric readings.
+
+    Each metric lives in its own preallocated NumPy buffer. Buffers grow
+    geometrically, so appends are amortized O(1) instead of copying the
+    whole history like ``pd.concat`` does. A reading costs 8 bytes of
+    timestamp plus 4 bytes per float32 metric; DataFrames are only built
+    on request.
+    """
+
+    def __init__(self, columns=None, initial_capacity=1024, dtype=METRIC_DTYPE):
+        """
+        Initialize empty column buffers.
+
+        :param columns: Metric column names, defaults to METRIC_COLUMNS
+        :param initial_capacity: Number of rows preallocated per column
+        :param dtype: Floating-point dtype of the metric buffers
+        """
+        self._capacity = max(int(initial_capacity), 1)
+        self._dtype = np.dtype(dtype)
+        self._size = 0
+        self._timestamps = np.empty(self._capacity, dtype='datetime64[ns]')
+        self._columns = {}
+
+        for column in (columns if columns is not None else METRIC_COLUMNS):
+            self._add_column(column)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def columns(self):
+        """Metric column names in insertion order."""
+        return list(self._columns)
+
+    @property
+    def timestamps(self):
+        """Read-only view of the stored timestamps (no copy)."""
+        view = self._timestamps[:self._size]
+        view.flags.writeable = False
+        return view
+
+    def column(self, name):
+        """Read-only view of one metric column (no copy)."""
+        view = self._columns[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def nbytes(self):
+        """Bytes held by the timestamp and metric buffers, including unused capacity."""
+        return self._timestamps.nbytes + sum(buffer.nbytes for buffer in self._columns.values())
+
+    @property
+    def numeric_columns(self):
+        """Names of the float-valued metric columns."""
+        return [name for name, buffer in self._columns.items() if buffer.dtype != object]
+
+    def _add_column(self, name, object_dtype=False):
+        """Allocate a buffer for a new column, backfilling missing values."""
+        if object_dtype:
+            buffer = np.full(self._capacity, None, dtype=object)
+        else:
+            buffer = np.full(self._capacity, np.nan, dtype=self._dtype)
+        self._columns[name] = buffer
+
+    def _grow(self, min_capacity):
+        """Double buffer capacity until at least ``min_capacity`` rows fit."""
+        new_capacity = self._capacity
+        while new_capacity < min_capacity:
+            new_capacity *= 2
+
+        timestamps = np.empty(new_capacity, dtype='datetime64[ns]')
+        timestamps[:self._size] = self._timestamps[:self._size]
+        self._timestamps = timestamps
+
+        for name, old in self._columns.items():
+            fill = None if old.dtype == object else np.nan
+            buffer = np.full(new_capacity, fill, dtype=old.dtype)
+            buffer[:self._size] = old[:self._size]
+            self._columns[name] = buffer
+
+        self._capacity = new_capacity
+
+    def append(self, timestamp, values):
+        """
+        Append a single reading.
+
+        :param timestamp: Reading timestamp
+        :param values: Mapping of metric name to value; missing metrics become NaN
+        """
+        if self._size == self._capacity:
+            self._grow(self._size + 1)
+
+        for name, value in values.items():
+            if name not in self._columns:
+                self._add_column(name, object_dtype=isinstance(value, str))
+
+        row = self._size
+        self._timestamps[row] = np.datetime64(timestamp, 'ns')
+        for name, buffer in self._columns.items():
+            value = values.get(name)
+            if buffer.dtype == object:
+                buffer[row] = value
+            else:
+                buffer[row] = np.nan if value is None else value
+
+        self._size += 1
+
+    def extend(self, timestamps, columns):
+        """
+        Append many readings at once.
+
+        :param timestamps: Array-like of reading timestamps
+        :param columns: Mapping of metric name to array-like of values, same length as timestamps
+        """
+        timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+        count = len(timestamps)
+        if count == 0:
+            return
+        if self._size + count > self._capacity:
+            self._grow(self._size + count)
+
+        for name, values in columns.items():
+            if name not in self._columns:
+                values = np.asarray(values)
+                self._add_column(name, object_dtype=values.dtype == object)
+
+        start, end = self._size, self._size + count
+        self._timestamps[start:end] = timestamps
+        for name, buffer in self._columns.items():
+            if name in columns:
+                buffer[start:end] = columns[name]
+            else:
+                buffer[start:end] = None if buffer.dtype == object else np.nan
+
+        self._size = end
+
+    def to_records(self):
+        """
+        Pack the stored readings into one structured array (copies the data).
+
+        :return: Array with an int64 ``timestamp`` field (nanoseconds since the epoch) and one field per column
+        """
+        dtype = np.dtype([('timestamp', np.int64)] + [(name, buffer.dtype) for name, buffer in self._columns.items()])
+        records = np.empty(self._size, dtype=dtype)
+        records['timestamp'] = self._timestamps[:self._size].view(np.int64)
+        for name, buffer in self._columns.items():
+            records[name] = buffer[:self._size]
+        return records
+
+    def to_dataframe(self):
+        """Materialize the stored readings as a DataFrame (copies the data)."""
+        data = {'timestamp': pd.Series(self._timestamps[:self._size].copy())}
+        for name, buffer in self._columns.items():
+            data[name] = buffer[:self._size].copy()
+        return pd.DataFrame(data, columns=['timestamp'] + self.columns)
+
+
+def utc_now():
+    """Current time as a naive UTC datetime, the convention for every stored reading timestamp."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def to_naive_utc(timestamp):
+    """
+    Convert a timezone-aware datetime to naive UTC.
+
+    :param timestamp: datetime or None; naive values are taken to be UTC already and returned unchanged
+    """
+    if timestamp is not None and timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def calculate_bmi(weight, height):
+    """
+    Calculate BMI for scalars or arrays. Assumes weight in kg and height in meters.
+
+    Non-positive or missing heights yield NaN instead of raising.
+    """
+    weight = np.asarray(weight, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bmi = np.where(height > 0, weight / height ** 2, np.nan)
+    return bmi if bmi.ndim else float(bmi)
+
+
+def parse_blood_pressure(value):
+    """
+    Parse a "systolic/diastolic" reading.
+
+    :param value: Blood pressure string such as "120/80"
+    :return: Tuple of (systolic, diastolic) floats, or None if unparseable
+    """
+    if not isinstance(value, str) or '/' not in value:
+        return None
+    systolic, _, diastolic = value.partition('/')
+    try:
+        return float(systolic), float(diastolic)
+    except ValueError:
+        return None
+
+
+def split_blood_pressure(values):
+    """
+    Vectorized ``parse_blood_pressure`` over an array of "systolic/diastolic" strings.
+
+    :return: Tuple of (systolic, diastolic) float arrays, NaN where unparseable
+    """
+    parts = pd.Series(values, dtype=object).astype(str).str.extract(r'^\s*(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)\s*$')
+    return parts[0].astype(float).to_numpy(), parts[1].astype(float).to_numpy()
+
+
+def normalize_reading(values):
+    """
+    Split a legacy "systolic/diastolic" ``blood_pressure`` string into numeric metrics.
+
+    :param values: Mapping of metric name to value
+    :return: Copy of ``values`` with ``bp_systolic``/``bp_diastolic`` in place of ``blood_pressure``
+    """
+    values = dict(values)
+    blood_pressure = parse_blood_pressure(values.pop('blood_pressure', None))
+    if blood_pressure is not None:
+        values.setdefault('bp_systolic', blood_pressure[0])
+        values.setdefault('bp_diastolic', blood_pressure[1])
+    return values
+
+
+class RunningStats:
+    """Online count/sum/min/max/last and Welford variance for one metric."""
+
+    __slots__ = ('count', 'total', 'min', 'max', 'last', '_mean', '_m2')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value):
+        """Fold a value into the statistics; None and NaN are ignored."""
+        if value is None:
+            return
+        value = float(value)
+        if value != value:  # NaN from a partial submission
+            return
+
+        self.count += 1
+        self.total += value
+        self.last = value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+
+    def update_many(self, values):
+        """Fold an array of values into the statistics; NaN values are ignored."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        count = len(values)
+        if count == 0:
+            return
+
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+
+        # Chan et al. parallel combination of two Welford states
+        total_count = self.count + count
+        delta = batch_mean - self._mean
+        self._m2 += batch_m2 + delta * delta * self.count * count / total_count
+        self._mean += delta * count / total_count
+
+        self.count = total_count
+        self.total += float(values.sum())
+        self.last = float(values[-1])
+        batch_min, batch_max = float(values.min()), float(values.max())
+        self.min = batch_min if self.min is None else min(self.min, batch_min)
+        self.max = batch_max if self.max is None else max(self.max, batch_max)
+
+    @property
+    def mean(self):
+        return self._mean if self.count else None
+
+    @property
+    def variance(self):
+        """Sample variance, or None with fewer than two values."""
+        return self._m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def std(self):
+        variance = self.variance
+        return variance ** 0.5 if variance is not None else None
+
+    def as_summary(self):
+        return {
+            'average': self.mean,
+            'min': self.min,
+            'max': self.max,
+            'last': self.last
+        }
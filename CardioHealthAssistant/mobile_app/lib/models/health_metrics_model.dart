@@ -65,7 +65,7 @@ class HealthMetrics {
       'systolic_pressure': systolicPressure,
       'diastolic_pressure': diastolicPressure,
       'exercise_minutes': exerciseMinutes,
-      'timestamp': timestamp.toIso8601String(),
+      'timestamp': timestamp.toUtc().toIso8601String(),
       'blood_pressure': bloodPressure,
       'notes': notes,
     };
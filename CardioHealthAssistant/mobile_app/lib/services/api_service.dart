@@ -6,9 +6,32 @@ import '../models/health_metrics_model.dart';
 class ApiService {
   static const String baseUrl = 'http://localhost:8000'; // Change this to your backend URL
 
+  // Session token from [login]; the backend rejects user requests without it
+  String? sessionToken;
+
+  Map<String, String> get _headers => {
+        'Content-Type': 'application/json',
+        if (sessionToken != null) 'Authorization': 'Bearer $sessionToken',
+      };
+
+  // Auth endpoints
+  Future<String> login(String username, String password) async {
+    final response = await http.post(
+      Uri.parse('$baseUrl/login'),
+      headers: {'Content-Type': 'application/json'},
+      body: jsonEncode({'username': username, 'password': password}),
+    );
+    if (response.statusCode == 200) {
+      final session = jsonDecode(response.body);
+      sessionToken = session['session_token'];
+      return session['user_id'];
+    }
+    throw Exception('Invalid username or password');
+  }
+
   // User endpoints
   Future<User> getUserProfile(String userId) async {
-    final response = await http.get(Uri.parse('$baseUrl/users/$userId'));
+    final response = await http.get(Uri.parse('$baseUrl/users/$userId'), headers: _headers);
     if (response.statusCode == 200) {
       return User.fromJson(jsonDecode(response.body));
     }
@@ -18,7 +41,7 @@ class ApiService {
   Future<void> updateUserProfile(User user) async {
     final response = await http.put(
       Uri.parse('$baseUrl/users/${user.id}'),
-      headers: {'Content-Type': 'application/json'},
+      headers: _headers,
       body: jsonEncode(user.toJson()),
     );
     if (response.statusCode != 200) {
@@ -30,6 +53,7 @@ class ApiService {
   Future<List<HealthMetrics>> getHealthMetrics(String userId) async {
     final response = await http.get(
       Uri.parse('$baseUrl/health-metrics/$userId'),
+      headers: _headers,
     );
     if (response.statusCode == 200) {
       List<dynamic> data = jsonDecode(response.body);
@@ -41,7 +65,7 @@ class ApiService {
   Future<void> addHealthMetric(HealthMetrics metric) async {
     final response = await http.post(
       Uri.parse('$baseUrl/health-metrics'),
-      headers: {'Content-Type': 'application/json'},
+      headers: _headers,
       body: jsonEncode(metric.toJson()),
     );
     if (response.statusCode != 201) {
@@ -53,7 +77,7 @@ class ApiService {
   Future<String> sendMessage(String userId, String message) async {
     final response = await http.post(
       Uri.parse('$baseUrl/chat'),
-      headers: {'Content-Type': 'application/json'},
+      headers: _headers,
       body: jsonEncode({
         'user_id': userId,
         'message': message,
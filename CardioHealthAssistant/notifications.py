@@ -1,71 +1,79 @@
 import os
-import smtplib
-import ssl
+import pickle
+import importlib.util
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import requests
-import sqlite3
 from datetime import datetime, timedelta
 import logging
 from dotenv import load_dotenv
 
-# Optional imports
-try:
-    from twilio.rest import Client
-    TWILIO_AVAILABLE = True
-except ImportError:
-    TWILIO_AVAILABLE = False
-    logging.warning("Twilio module not installed. SMS notifications will be disabled.")
-
-try:
-    from google.oauth2.credentials import Credentials
-    from google_auth_oauthlib.flow import InstalledAppFlow
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
-    import pickle
-    GOOGLE_CALENDAR_AVAILABLE = True
-except ImportError:
-    GOOGLE_CALENDAR_AVAILABLE = False
+from caching import LazySingleton
+from db_pool import SQLITE_QUERY_SECONDS, SQLiteConnectionPool
+from instrumentation import timed
+from outbox import contact_channels
+from smtp_pool import SMTPConnectionPool
+
+def _module_available(name):
+    """Whether a module can be imported, without importing it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ModuleNotFoundError:
+        return False
+
+# Optional Google Calendar libraries; imported only when the calendar is first used
+GOOGLE_CALENDAR_AVAILABLE = all(
+    _module_available(name) for name in ('google.oauth2', 'google_auth_oauthlib', 'googleapiclient')
+)
+if not GOOGLE_CALENDAR_AVAILABLE:
     logging.warning("Google Calendar libraries not installed. Calendar integration will be disabled.")
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    filename='notifications.log')
+# SMS goes straight to Twilio's REST API, so it only needs account credentials
+TWILIO_AVAILABLE = all(os.getenv(name) for name in ('TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_PHONE_NUMBER'))
+if not TWILIO_AVAILABLE:
+    logging.warning("Twilio credentials not configured. SMS notifications will be disabled.")
 
 class CalendarIntegration:
     def __init__(self):
         """
         Initialize Google Calendar integration with optional configuration.
-        """
-        # Check if Google Calendar integration is possible
-        if not GOOGLE_CALENDAR_AVAILABLE:
-            logging.warning("Google Calendar libraries not available.")
-            self.service = None
-            return
 
+        The service is authenticated on first use rather than here, since
+        that may load large client libraries or start an interactive OAuth flow.
+        """
         # Paths for credentials and token
         self.SCOPES = ['https://www.googleapis.com/auth/calendar']
         self.CREDENTIALS_PATH = os.getenv('GOOGLE_CALENDAR_CREDENTIALS', 'credentials.json')
         self.TOKEN_PATH = 'token.pickle'
+        self._service = LazySingleton(self._load_calendar_service)
+
+    @property
+    def service(self):
+        """Authenticated Calendar API client, or None if the integration is unavailable."""
+        return self._service()
+
+    def _load_calendar_service(self):
+        # Check if Google Calendar integration is possible
+        if not GOOGLE_CALENDAR_AVAILABLE:
+            logging.warning("Google Calendar libraries not available.")
+            return None
 
         # Try to get calendar service, but handle potential errors
         try:
-            self.service = self._get_calendar_service()
+            return self._get_calendar_service()
         except Exception as e:
             logging.error(f"Failed to initialize Google Calendar service: {e}")
-            self.service = None
+            return None
 
     def _get_calendar_service(self):
         """
         Authenticate and create Google Calendar service with error handling.
         """
-        # If Google Calendar libraries are not available, return None
-        if not GOOGLE_CALENDAR_AVAILABLE:
-            return None
+        from google.auth.transport.requests import Request
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from googleapiclient.discovery import build
 
         # Check if credentials file exists
         if not os.path.exists(self.CREDENTIALS_PATH):
@@ -172,31 +180,85 @@ class CalendarIntegration:
             logging.error(f"Error listing calendar events: {e}")
             return []
 
+# Frequency used when a stored reminder frequency is missing or invalid
+DEFAULT_REMINDER_FREQUENCY_HOURS = 24
+
+# Columns added to the reminders table after its first release.
+# delivery_attempts and retry_occurrence track a due reminder whose delivery is being retried;
+# last_error keeps the most recent delivery failure.
+REMINDER_MIGRATED_COLUMNS = {
+    'contact_method': 'TEXT',
+    'contact_info': 'TEXT',
+    'delivery_attempts': 'INTEGER DEFAULT 0',
+    'retry_occurrence': 'DATETIME',
+    'last_error': 'TEXT',
+}
+
+def reminder_frequency_hours(frequency):
+    """Parse a stored reminder frequency (hours), falling back to the daily default."""
+    try:
+        hours = float(frequency)
+    except (TypeError, ValueError):
+        return DEFAULT_REMINDER_FREQUENCY_HOURS
+    return hours if hours > 0 else DEFAULT_REMINDER_FREQUENCY_HOURS
+
 class NotificationManager:
     def __init__(self):
         # Email configuration
         self.email_sender = os.getenv('EMAIL_SENDER')
         self.email_password = os.getenv('EMAIL_PASSWORD')
+        self.smtp_server = os.getenv('EMAIL_SMTP_SERVER', 'smtp.gmail.com')
+        self.smtp_port = int(os.getenv('EMAIL_SMTP_PORT', '465'))
+        self.smtp_security = os.getenv('EMAIL_SMTP_SECURITY', 'ssl')
+        self.smtp_pool_size = int(os.getenv('EMAIL_SMTP_POOL_SIZE', '4'))
+        self.smtp_rate_limit = float(os.getenv('EMAIL_SMTP_RATE_LIMIT', '0')) or None
+        self._smtp_pool = LazySingleton(self._open_smtp_pool)
         
         # SMS configuration (Twilio)
         self.twilio_account_sid = os.getenv('TWILIO_ACCOUNT_SID')
         self.twilio_auth_token = os.getenv('TWILIO_AUTH_TOKEN')
         self.twilio_phone_number = os.getenv('TWILIO_PHONE_NUMBER')
+        self.twilio_rate_limit = float(os.getenv('TWILIO_RATE_LIMIT', '1'))
+        self.twilio_api_url = os.getenv('TWILIO_API_URL')
+        self._sms_client = LazySingleton(self._create_sms_client)
+        
+        # SQLite database for tracking reminders, opened on first use
+        self.db_path = 'reminders.db'
+        self._pool = LazySingleton(self._open_pool)
         
-        # SQLite database for tracking reminders
-        self.conn = sqlite3.connect('reminders.db')
-        self.create_tables()
+        # Callbacks notified when a reminder is added (e.g. to wake the dispatcher)
+        self.reminder_listeners = []
         
-        # Optional Calendar Integration
+        # Optional Calendar Integration, connected on first use
+        self._calendar = LazySingleton(self._create_calendar)
+
+    @property
+    def pool(self):
+        """Per-thread connections to the reminders database."""
+        return self._pool()
+
+    def _open_pool(self):
+        pool = SQLiteConnectionPool(self.db_path)
+        self.create_tables(pool)
+        return pool
+
+    @property
+    def calendar(self):
+        """CalendarIntegration, or None if it could not be set up."""
+        return self._calendar()
+
+    @staticmethod
+    def _create_calendar():
         try:
-            self.calendar = CalendarIntegration()
+            return CalendarIntegration()
         except Exception as e:
             logging.warning(f"Failed to initialize Calendar Integration: {e}")
-            self.calendar = None
+            return None
 
-    def create_tables(self):
+    def create_tables(self, pool=None):
         """Create necessary database tables for reminder tracking."""
-        cursor = self.conn.cursor()
+        conn = (pool or self.pool).connection()
+        cursor = conn.cursor()
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS reminders (
                 id INTEGER PRIMARY KEY,
@@ -207,76 +269,143 @@ class NotificationManager:
                 frequency TEXT,
                 last_taken DATETIME,
                 next_reminder DATETIME,
-                is_active BOOLEAN DEFAULT 1
+                is_active BOOLEAN DEFAULT 1,
+                contact_method TEXT,
+                contact_info TEXT
             )
         ''')
-        self.conn.commit()
+        
+        # Add contact and delivery-retry columns to databases created before they existed
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(reminders)')}
+        for column, column_type in REMINDER_MIGRATED_COLUMNS.items():
+            if column not in columns:
+                cursor.execute(f'ALTER TABLE reminders ADD COLUMN {column} {column_type}')
+        
+        # Lets the dispatcher find due reminders without scanning the table
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_reminders_due
+            ON reminders (is_active, next_reminder)
+        ''')
+        conn.commit()
 
-    def add_medication_reminder(self, user_id, medication_name, dosage, frequency):
-        """Add a new medication reminder."""
-        cursor = self.conn.cursor()
+    @timed(SQLITE_QUERY_SECONDS, 'reminders.add_medication_reminder')
+    def add_medication_reminder(self, user_id, medication_name, dosage, frequency,
+                                contact_method=None, contact_info=None):
+        """Add a new medication reminder, repeating every ``frequency`` hours."""
         next_reminder = datetime.now() + timedelta(hours=frequency)
         
-        cursor.execute('''
-            INSERT INTO reminders 
-            (user_id, reminder_type, medication_name, dosage, frequency, last_taken, next_reminder) 
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, 'medication', medication_name, dosage, frequency, None, next_reminder))
+        with self.pool.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO reminders 
+                (user_id, reminder_type, medication_name, dosage, frequency, last_taken, next_reminder,
+                 contact_method, contact_info) 
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, 'medication', medication_name, dosage, frequency, None, next_reminder,
+                  contact_method, contact_info))
         
-        self.conn.commit()
-        logging.info(f"Added medication reminder for {medication_name}")
+        logging.info("Added medication reminder for %s", medication_name)
+        for listener in self.reminder_listeners:
+            listener()
         return cursor.lastrowid
 
+    @property
+    def smtp_pool(self):
+        """Shared pool of authenticated SMTP connections, opened on first use."""
+        return self._smtp_pool()
+
+    def _open_smtp_pool(self):
+        return SMTPConnectionPool(
+            self.smtp_server, self.smtp_port,
+            username=self.email_sender, password=self.email_password,
+            security=self.smtp_security, pool_size=self.smtp_pool_size,
+            rate_limit=self.smtp_rate_limit
+        )
+
+    def _build_email(self, recipient_email, subject, message):
+        email_message = MIMEMultipart()
+        email_message['From'] = self.email_sender
+        email_message['To'] = recipient_email
+        email_message['Subject'] = subject
+        email_message.attach(MIMEText(message, 'plain'))
+        return email_message
+
+    def deliver_email(self, recipient_email, subject, message):
+        """Send one email over a pooled SMTP connection, raising if it could not be sent."""
+        self.smtp_pool.send(self._build_email(recipient_email, subject, message))
+        logging.info("Email reminder sent to %s", recipient_email)
+
     def send_email_reminder(self, recipient_email, subject, message):
-        """Send email reminder."""
+        """Send email reminder over a pooled SMTP connection."""
         try:
-            # Create a secure SSL context
-            context = ssl.create_default_context()
-
-            # Create the email message
-            email_message = MIMEMultipart()
-            email_message['From'] = self.email_sender
-            email_message['To'] = recipient_email
-            email_message['Subject'] = subject
-
-            # Attach the message body
-            email_message.attach(MIMEText(message, 'plain'))
-
-            # Send the email
-            with smtplib.SMTP_SSL('smtp.gmail.com', 465, context=context) as server:
-                server.login(self.email_sender, self.email_password)
-                server.sendmail(self.email_sender, recipient_email, email_message.as_string())
-            
-            logging.info(f"Email reminder sent to {recipient_email}")
+            self.deliver_email(recipient_email, subject, message)
             return True
         except Exception as e:
             logging.error(f"Failed to send email: {e}")
             return False
 
+    @property
+    def sms_client(self):
+        """Shared Twilio client with a keep-alive session, created on first use."""
+        return self._sms_client()
+
+    def _create_sms_client(self):
+        # Imported here so processes that never send SMS don't load requests
+        from sms_client import TWILIO_API_URL, TwilioSMSClient
+        return TwilioSMSClient(
+            self.twilio_account_sid, self.twilio_auth_token, self.twilio_phone_number,
+            rate_limit=self.twilio_rate_limit, base_url=self.twilio_api_url or TWILIO_API_URL
+        )
+
+    def deliver_sms(self, phone_number, message):
+        """
+        Send one SMS through Twilio.
+
+        :raises RuntimeError: If Twilio is not configured
+        :raises SMSSendError: If the message could not be sent
+        """
+        if not TWILIO_AVAILABLE:
+            raise RuntimeError("Twilio credentials not configured")
+        self.sms_client.send(phone_number, message)
+        logging.info("SMS reminder sent to %s", phone_number)
+
     def send_sms_reminder(self, phone_number, message):
         """Send SMS reminder using Twilio."""
         if not TWILIO_AVAILABLE:
-            logging.warning("Twilio module not installed. SMS notifications will be disabled.")
+            logging.warning("Twilio credentials not configured. SMS notifications will be disabled.")
             return False
         
+        from sms_client import SMSSendError
+        
         try:
-            client = Client(self.twilio_account_sid, self.twilio_auth_token)
-            
-            message = client.messages.create(
-                body=message,
-                from_=self.twilio_phone_number,
-                to=phone_number
-            )
-            
-            logging.info(f"SMS reminder sent to {phone_number}")
+            self.deliver_sms(phone_number, message)
             return True
-        except Exception as e:
+        except SMSSendError as e:
             logging.error(f"Failed to send SMS: {e}")
             return False
 
+    def send_reminder(self, contact_method, contact_info, message, subject="Medication Reminder"):
+        """
+        Send a reminder over its chosen contact method.
+
+        :param contact_method: "Email", "SMS" or "Both"
+        :param contact_info: Email address or phone number
+        :param message: Reminder text
+        :param subject: Email subject line
+        :return: True if every channel succeeded
+        :raises ValueError: If the contact method or address is missing or unknown
+        """
+        sent = True
+        for channel in contact_channels(contact_method, contact_info):
+            if channel == 'email':
+                sent = self.send_email_reminder(contact_info, subject, message) and sent
+            else:
+                sent = self.send_sms_reminder(contact_info, message) and sent
+        return sent
+
+    @timed(SQLITE_QUERY_SECONDS, 'reminders.get_upcoming_reminders')
     def get_upcoming_reminders(self, user_id):
         """Retrieve upcoming reminders for a user."""
-        cursor = self.conn.cursor()
+        cursor = self.pool.connection().cursor()
         cursor.execute('''
             SELECT * FROM reminders 
             WHERE user_id = ? AND is_active = 1 AND next_reminder <= ?
@@ -284,17 +413,21 @@ class NotificationManager:
         
         return cursor.fetchall()
 
+    @timed(SQLITE_QUERY_SECONDS, 'reminders.mark_reminder_completed')
     def mark_reminder_completed(self, reminder_id):
-        """Mark a reminder as completed and update next reminder time."""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            UPDATE reminders 
-            SET last_taken = ?, next_reminder = ? 
-            WHERE id = ?
-        ''', (datetime.now(), datetime.now() + timedelta(hours=24), reminder_id))
+        """Mark a reminder as completed and schedule the next one after its stored frequency."""
+        with self.pool.transaction() as conn:
+            row = conn.execute('SELECT frequency FROM reminders WHERE id = ?', (reminder_id,)).fetchone()
+            frequency_hours = reminder_frequency_hours(row[0] if row else None)
+            
+            now = datetime.now()
+            conn.execute('''
+                UPDATE reminders 
+                SET last_taken = ?, next_reminder = ? 
+                WHERE id = ?
+            ''', (now, now + timedelta(hours=frequency_hours), reminder_id))
         
-        self.conn.commit()
-        logging.info(f"Marked reminder {reminder_id} as completed")
+        logging.info("Marked reminder %s as completed", reminder_id)
 
     def schedule_health_reminder(self, title, description, start_time, end_time=None):
         """
@@ -319,8 +452,18 @@ class NotificationManager:
         return calendar_event
 
     def close_connection(self):
-        """Close database connection."""
-        self.conn.close()
+        """Close database, SMTP and SMS connections that were opened."""
+        if self._pool.initialized:
+            self.pool.close_all()
+        if self._smtp_pool.initialized:
+            self.smtp_pool.close()
+        if self._sms_client.initialized:
+            self.sms_client.close()
+
+# Global notification manager, created on first use
+get_notification_manager = LazySingleton(NotificationManager)
 
-# Global notification manager instance
-notification_manager = NotificationManager()
+def __getattr__(name):
+    if name == 'notification_manager':
+        return get_notification_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,401 @@
+# outbox.py
+"""
+Durable outbox for email and SMS notifications.
+
+Callers enqueue messages into reminders.db and return immediately; a
+background worker pool delivers them with at-least-once semantics.
+
+Usage:
+    python outbox.py [--db reminders.db] [--workers 4]
+"""
+
+import argparse
+import logging
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from db_pool import SQLiteConnectionPool
+from logging_setup import configure_logging
+
+CHANNELS = ('email', 'sms')
+
+# Reminder contact methods and the channels each one sends on
+CONTACT_METHOD_CHANNELS = {'Email': ('email',), 'SMS': ('sms',), 'Both': ('email', 'sms')}
+
+# Longest the worker sleeps before re-checking for messages enqueued by other processes
+MAX_IDLE_SECONDS = 5.0
+
+# Drain latencies kept for the latency percentiles in stats()
+LATENCY_SAMPLES = 1000
+
+# How often, and after how long, delivered messages are purged
+PURGE_INTERVAL = 3600
+SENT_RETENTION = 7 * 24 * 3600
+
+
+def contact_channels(contact_method, contact_info):
+    """
+    Channels a reminder is sent on.
+
+    :raises ValueError: If the contact method is missing or unknown, or there is no address/number
+    """
+    channels = CONTACT_METHOD_CHANNELS.get(contact_method)
+    if channels is None:
+        raise ValueError(f"Unknown reminder contact method: {contact_method!r}")
+    if not contact_info:
+        raise ValueError(f"Reminder has no {contact_method} address/number")
+    return channels
+
+
+def create_outbox_tables(conn):
+    """Create the outbox and dead-letter tables if they don't exist."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            channel TEXT NOT NULL,
+            recipient TEXT NOT NULL,
+            subject TEXT,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            next_attempt_at REAL NOT NULL,
+            sent_at REAL,
+            last_error TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_outbox_ready
+        ON outbox (status, next_attempt_at)
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS outbox_dead_letter (
+            id INTEGER PRIMARY KEY,
+            idempotency_key TEXT NOT NULL,
+            channel TEXT NOT NULL,
+            recipient TEXT NOT NULL,
+            subject TEXT,
+            body TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            failed_at REAL NOT NULL,
+            last_error TEXT
+        )
+    ''')
+    conn.commit()
+
+
+def default_deliver(message):
+    """Deliver an outbox message through the shared NotificationManager, raising on failure."""
+    from notifications import get_notification_manager
+    notification_manager = get_notification_manager()
+
+    if message['channel'] == 'email':
+        notification_manager.deliver_email(message['recipient'], message['subject'], message['body'])
+    else:
+        notification_manager.deliver_sms(message['recipient'], message['body'])
+    return True
+
+
+class NotificationOutbox:
+    def __init__(self, db_path='reminders.db', deliver=default_deliver, workers=4, batch_size=50,
+                 max_attempts=5, backoff_base=2.0, backoff_max=300.0, lease_seconds=120.0,
+                 max_idle=MAX_IDLE_SECONDS):
+        """
+        Persistent queue of outbound notifications with a delivery worker pool.
+
+        ``enqueue`` is a single indexed INSERT, so the UI never waits on the
+        network. Workers claim ready messages under a lease; messages whose
+        lease expires (e.g. after a crash) are claimed again, so delivery is
+        at-least-once. Failed deliveries are retried with exponential
+        backoff and moved to ``outbox_dead_letter`` after ``max_attempts``.
+
+        :param db_path: Path to the reminders SQLite database
+        :param deliver: Callable(message dict) -> bool that sends one message; exceptions it raises are
+            recorded as the message's last_error
+        :param workers: Concurrent deliveries
+        :param batch_size: Messages claimed per round
+        :param max_attempts: Attempts before a message is dead-lettered
+        :param backoff_base: Seconds before the first retry; doubles per attempt
+        :param backoff_max: Largest retry delay in seconds
+        :param lease_seconds: Seconds a claimed message stays invisible to other workers
+        :param max_idle: Maximum seconds to sleep between checks
+        """
+        self.db_path = db_path
+        self.deliver = deliver
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.max_idle = max_idle
+
+        self.pool = SQLiteConnectionPool(db_path)
+        create_outbox_tables(self.pool.connection())
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.enqueued = 0
+        self.duplicates = 0
+        self.sent = 0
+        self.failed_attempts = 0
+        self.dead_lettered = 0
+
+    def enqueue(self, channel, recipient, body, subject=None, idempotency_key=None):
+        """
+        Queue one message for delivery.
+
+        :param channel: 'email' or 'sms'
+        :param recipient: Email address or phone number
+        :param body: Message text
+        :param subject: Email subject line
+        :param idempotency_key: Messages with an already queued key are ignored; random if omitted
+        :return: Outbox row id, or None if the key was already queued
+        """
+        if channel not in CHANNELS:
+            raise ValueError(f"Unknown notification channel: {channel}")
+        now = time.time()
+        conn = self.pool.connection()
+        with conn:
+            cursor = conn.execute('''
+                INSERT OR IGNORE INTO outbox
+                (idempotency_key, channel, recipient, subject, body, created_at, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (idempotency_key or uuid.uuid4().hex, channel, recipient, subject, body, now, now))
+        with self._stats_lock:
+            if cursor.rowcount:
+                self.enqueued += 1
+            else:
+                self.duplicates += 1
+        self._wakeup.set()
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def enqueue_for_contact(self, contact_method, contact_info, body, subject="Medication Reminder",
+                            idempotency_key=None):
+        """
+        Queue a message over a reminder's contact method ("Email", "SMS" or "Both").
+
+        :return: List of outbox row ids that were newly queued
+        :raises ValueError: If the contact method or address is missing or unknown
+        """
+        ids = []
+        for channel in contact_channels(contact_method, contact_info):
+            key = f"{idempotency_key}:{channel}" if idempotency_key else None
+            row_id = self.enqueue(channel, contact_info, body, subject, key)
+            if row_id is not None:
+                ids.append(row_id)
+        return ids
+
+    def enqueue_reminder(self, reminder):
+        """
+        ReminderDispatcher sender: queue a due reminder, once per occurrence.
+
+        :return: True once every channel's message is in the outbox, including messages
+            queued by an earlier dispatch of the same occurrence
+        :raises ValueError: If the reminder has no usable contact method or address
+        :raises sqlite3.Error: If the messages could not be queued
+        """
+        # A retried occurrence keeps its original key, so it is never queued twice
+        occurrence = reminder.get('retry_occurrence') or reminder['next_reminder']
+        ids = self.enqueue_for_contact(
+            reminder['contact_method'], reminder['contact_info'],
+            f"Reminder: Take {reminder['medication_name']} ({reminder['dosage']})",
+            idempotency_key=f"reminder:{reminder['id']}:{occurrence}"
+        )
+        logging.debug("Queued %d outbox messages for reminder %s", len(ids), reminder['id'])
+        return True
+
+    def start(self):
+        """Start the delivery thread if it is not already running."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='outbox-worker', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA synchronous=NORMAL')
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='outbox-deliver')
+        last_purge = 0.0
+        try:
+            while not self._stopping.is_set():
+                try:
+                    processed = self.drain_once(conn, executor)
+                    if time.time() - last_purge > PURGE_INTERVAL:
+                        self.purge_sent(conn)
+                        last_purge = time.time()
+                except sqlite3.Error as e:
+                    logging.error(f"Outbox delivery round failed: {e}")
+                    processed = 0
+                if processed >= self.batch_size:
+                    continue  # More messages are probably ready; keep draining
+
+                self._wakeup.clear()
+                self._wakeup.wait(self._seconds_until_next_ready(conn))
+        finally:
+            executor.shutdown(wait=True)
+            conn.close()
+
+    def _seconds_until_next_ready(self, conn):
+        row = conn.execute("SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'").fetchone()
+        if row[0] is None:
+            return self.max_idle
+        return min(max(row[0] - time.time(), 0.0), self.max_idle)
+
+    def _claim(self, conn, now):
+        """Lease a batch of ready messages, including ones whose previous lease expired."""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            messages = [dict(row) for row in conn.execute('''
+                SELECT * FROM outbox
+                WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+                ORDER BY next_attempt_at
+                LIMIT ?
+            ''', (now, self.batch_size))]
+            conn.executemany('''
+                UPDATE outbox SET status = 'sending', attempts = attempts + 1, next_attempt_at = ?
+                WHERE id = ?
+            ''', [(now + self.lease_seconds, m['id']) for m in messages])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        for message in messages:
+            message['attempts'] += 1
+        return messages
+
+    def _retry_delay(self, attempts):
+        return min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+    def drain_once(self, conn, executor, now=None):
+        """
+        Claim and deliver one batch of ready messages.
+
+        :return: Number of messages processed
+        """
+        now = now or time.time()
+        messages = self._claim(conn, now)
+        if not messages:
+            return 0
+
+        outcomes = list(executor.map(self._attempt, messages))
+        finished = time.time()
+
+        sent, retries, dead = [], [], []
+        for message, error in zip(messages, outcomes):
+            if error is None:
+                sent.append((finished, message['id']))
+            elif message['attempts'] >= self.max_attempts:
+                dead.append((message, error))
+            else:
+                retries.append((finished + self._retry_delay(message['attempts']), error, message['id']))
+
+        conn.execute('BEGIN')
+        try:
+            conn.executemany("UPDATE outbox SET status = 'sent', sent_at = ? WHERE id = ?", sent)
+            conn.executemany('''
+                UPDATE outbox SET status = 'pending', next_attempt_at = ?, last_error = ?
+                WHERE id = ?
+            ''', retries)
+            conn.executemany('''
+                INSERT OR REPLACE INTO outbox_dead_letter
+                (id, idempotency_key, channel, recipient, subject, body, attempts, created_at, failed_at, last_error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(m['id'], m['idempotency_key'], m['channel'], m['recipient'], m['subject'], m['body'],
+                   m['attempts'], m['created_at'], finished, error) for m, error in dead])
+            conn.executemany('DELETE FROM outbox WHERE id = ?', [(m['id'],) for m, _ in dead])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+        with self._stats_lock:
+            self.sent += len(sent)
+            self.failed_attempts += len(retries) + len(dead)
+            self.dead_lettered += len(dead)
+            self._latencies.extend(finished - m['created_at'] for m, error in zip(messages, outcomes) if error is None)
+        for message, error in dead:
+            logging.error(f"Dead-lettered {message['channel']} to {message['recipient']} "
+                          f"after {message['attempts']} attempts: {error}")
+        return len(messages)
+
+    def _attempt(self, message):
+        """Deliver one message; return None on success or an error description."""
+        try:
+            if self.deliver(message):
+                return None
+            return f"{getattr(self.deliver, '__name__', 'deliver')} returned False"
+        except Exception as e:
+            return str(e) or type(e).__name__
+
+    def purge_sent(self, conn, older_than=SENT_RETENTION):
+        """Delete delivered messages older than ``older_than`` seconds."""
+        conn.execute('BEGIN')
+        conn.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (time.time() - older_than,))
+        conn.execute('COMMIT')
+
+    def stats(self):
+        """Queue depth, delivery counters and drain latency (enqueue to delivery) in seconds."""
+        conn = self.pool.connection()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        dead_letters = conn.execute('SELECT COUNT(*) FROM outbox_dead_letter').fetchone()[0]
+        oldest = conn.execute("SELECT MIN(created_at) FROM outbox WHERE status != 'sent'").fetchone()[0]
+        with self._stats_lock:
+            latencies = np.array(self._latencies)
+            return {
+                'depth': counts.get('pending', 0) + counts.get('sending', 0),
+                'in_flight': counts.get('sending', 0),
+                'dead_letters': dead_letters,
+                'oldest_pending_age': time.time() - oldest if oldest is not None else 0.0,
+                'enqueued': self.enqueued,
+                'duplicates': self.duplicates,
+                'sent': self.sent,
+                'failed_attempts': self.failed_attempts,
+                'dead_lettered': self.dead_lettered,
+                'drain_latency_p50': float(np.percentile(latencies, 50)) if len(latencies) else None,
+                'drain_latency_p99': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            }
+
+    def close(self):
+        self.stop()
+        self.pool.close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default='reminders.db')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    configure_logging()
+
+    outbox = NotificationOutbox(args.db, workers=args.workers).start()
+    try:
+        while True:
+            time.sleep(60)
+            logging.info(f"Outbox stats: {outbox.stats()}")
+    except KeyboardInterrupt:
+        outbox.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# password_hashing.py
+
+import asyncio
+import hashlib
+import hmac
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# PBKDF2-SHA256 cost for new and upgraded hashes; raise it as hardware gets faster
+DEFAULT_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', '100000'))
+
+# Cost of hashes stored before iteration counts were recorded per user
+LEGACY_ITERATIONS = 100000
+
+SALT_BYTES = 32
+
+
+def pbkdf2(password, salt, iterations):
+    """PBKDF2-SHA256 of ``password``; a module-level function so process pools can pickle it."""
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+
+
+class PasswordHasher:
+    def __init__(self, iterations=DEFAULT_ITERATIONS, max_workers=None, use_processes=False):
+        """
+        Run PBKDF2 hashing on a bounded worker pool.
+
+        At most ``max_workers`` hashes run at once, so a burst of logins
+        queues instead of consuming every core and thread. hashlib releases
+        the GIL while hashing, so threads scale across cores; processes are
+        available for interpreters where that does not hold.
+
+        :param iterations: PBKDF2 iterations for new hashes
+        :param max_workers: Concurrent hashes; defaults to the CPU count
+        :param use_processes: Hash in a process pool instead of a thread pool
+        """
+        self.iterations = iterations
+        self.max_workers = max_workers or os.cpu_count() or 1
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self._executor = executor_class(max_workers=self.max_workers)
+
+    def _submit(self, password, salt, iterations):
+        return self._executor.submit(pbkdf2, password, salt, iterations)
+
+    def hash(self, password, salt=None, iterations=None):
+        """
+        Hash a password, blocking until a worker is free and the hash is done.
+
+        :return: Tuple of (hash, salt, iterations)
+        """
+        salt = salt if salt is not None else os.urandom(SALT_BYTES)
+        iterations = iterations or self.iterations
+        return self._submit(password, salt, iterations).result(), salt, iterations
+
+    def verify(self, password, salt, expected_hash, iterations):
+        """Check a password against a stored hash in constant time."""
+        return hmac.compare_digest(self._submit(password, salt, iterations).result(), expected_hash)
+
+    async def hash_async(self, password, salt=None, iterations=None):
+        """Async ``hash``: awaits the worker pool without blocking the event loop."""
+        salt = salt if salt is not None else os.urandom(SALT_BYTES)
+        iterations = iterations or self.iterations
+        pwd_hash = await asyncio.wrap_future(self._submit(password, salt, iterations))
+        return pwd_hash, salt, iterations
+
+    async def verify_async(self, password, salt, expected_hash, iterations):
+        """Async ``verify``."""
+        pwd_hash = await asyncio.wrap_future(self._submit(password, salt, iterations))
+        return hmac.compare_digest(pwd_hash, expected_hash)
+
+    def needs_rehash(self, iterations):
+        """Whether a hash stored with ``iterations`` is below the current cost."""
+        return (iterations or LEGACY_ITERATIONS) < self.iterations
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,226 @@
+# reminder_dispatcher.py
+"""
+Background dispatcher that fires due reminders from reminders.db.
+
+Usage:
+    python reminder_dispatcher.py [--db reminders.db] [--workers 16]
+"""
+
+import argparse
+import logging
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from logging_setup import configure_logging
+from notifications import reminder_frequency_hours
+from outbox import NotificationOutbox
+
+# Longest the dispatcher sleeps before re-checking for reminders added elsewhere
+MAX_IDLE_SECONDS = 60.0
+
+
+def _parse_datetime(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def next_occurrence(previous, frequency_hours, now):
+    """Advance ``previous`` by whole periods of ``frequency_hours`` until it is after ``now``."""
+    period = timedelta(hours=frequency_hours)
+    missed = max(0, int((now - previous) / period)) + 1
+    return previous + missed * period
+
+
+def _reminder_message(reminder):
+    return f"Reminder: Take {reminder['medication_name']} ({reminder['dosage']})"
+
+
+def default_sender(reminder):
+    """Deliver a reminder through the shared NotificationManager."""
+    from notifications import get_notification_manager
+
+    return get_notification_manager().send_reminder(
+        reminder['contact_method'], reminder['contact_info'], _reminder_message(reminder)
+    )
+
+
+class ReminderDispatcher:
+    def __init__(self, db_path='reminders.db', send=default_sender, batch_size=500,
+                 max_workers=16, max_idle=MAX_IDLE_SECONDS, max_attempts=5, backoff_base=30.0,
+                 backoff_max=1800.0):
+        """
+        Fire due reminders and reschedule them by their stored frequency.
+
+        Due reminders are found with an indexed query on
+        (is_active, next_reminder), so each wake-up touches only due rows.
+        The dispatcher sleeps until the earliest next_reminder, or until
+        ``wake`` is called when a reminder is added.
+
+        A reminder only moves on to its next period once it has been sent
+        or dead-lettered. A failed send is retried with exponential backoff:
+        next_reminder is pushed forward and the occurrence being retried is
+        kept in retry_occurrence. After ``max_attempts``, or at once for a
+        reminder with no usable contact method (ValueError), the occurrence
+        is dead-lettered: the error is logged and kept in last_error.
+
+        :param db_path: Path to the reminders SQLite database
+        :param send: Callable(reminder dict) -> bool that delivers one reminder; exceptions count as failures
+        :param batch_size: Maximum reminders fetched and dispatched per round
+        :param max_workers: Concurrent deliveries per batch
+        :param max_idle: Maximum seconds to sleep between checks
+        :param max_attempts: Delivery attempts per occurrence before it is dead-lettered
+        :param backoff_base: Seconds before the first retry; doubles per attempt
+        :param backoff_max: Largest retry delay in seconds
+        """
+        self.db_path = db_path
+        self.send = send
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_idle = max_idle
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.dispatched = 0
+        self.failed = 0
+        self.dead_lettered = 0
+
+    def start(self):
+        """Start the dispatcher thread if it is not already running."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='reminder-dispatcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self):
+        """Re-check the schedule now, e.g. after a reminder is added."""
+        self._wakeup.set()
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='reminder-send')
+        try:
+            while not self._stopping.is_set():
+                try:
+                    dispatched = self.dispatch_due(conn, executor)
+                except sqlite3.Error as e:
+                    logging.error(f"Reminder dispatch failed: {e}")
+                    dispatched = 0
+                if dispatched >= self.batch_size:
+                    continue  # More reminders are probably due; keep draining
+
+                self._wakeup.clear()
+                self._wakeup.wait(self._seconds_until_next_due(conn))
+        finally:
+            executor.shutdown(wait=True)
+            conn.close()
+
+    def _seconds_until_next_due(self, conn):
+        row = conn.execute('SELECT MIN(next_reminder) FROM reminders WHERE is_active = 1').fetchone()
+        if row[0] is None:
+            return self.max_idle
+        delay = (_parse_datetime(row[0]) - datetime.now()).total_seconds()
+        return min(max(delay, 0.0), self.max_idle)
+
+    def _retry_delay(self, attempts):
+        seconds = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+        return timedelta(seconds=seconds)
+
+    def dispatch_due(self, conn, executor, now=None):
+        """
+        Dispatch one batch of due reminders concurrently, then reschedule or retry each.
+
+        :return: Number of reminders dispatched
+        """
+        now = now or datetime.now()
+        reminders = [dict(row) for row in conn.execute('''
+            SELECT * FROM reminders
+            WHERE is_active = 1 AND next_reminder <= ?
+            ORDER BY next_reminder
+            LIMIT ?
+        ''', (now, self.batch_size))]
+        if not reminders:
+            return 0
+
+        outcomes = list(executor.map(self._deliver, reminders))
+
+        rescheduled, retries, dead = [], [], []
+        for reminder, (error, permanent) in zip(reminders, outcomes):
+            occurrence = _parse_datetime(reminder.get('retry_occurrence') or reminder['next_reminder'])
+            attempts = (reminder.get('delivery_attempts') or 0) + 1
+            if error is not None and not permanent and attempts < self.max_attempts:
+                retries.append((now + self._retry_delay(attempts), attempts, occurrence, error, reminder['id']))
+                continue
+            following = next_occurrence(occurrence, reminder_frequency_hours(reminder['frequency']), now)
+            rescheduled.append((following, error, reminder['id']))
+            if error is not None:
+                dead.append((reminder, attempts, error))
+
+        with conn:
+            conn.executemany('''
+                UPDATE reminders SET next_reminder = ?, delivery_attempts = 0, retry_occurrence = NULL, last_error = ?
+                WHERE id = ?
+            ''', rescheduled)
+            conn.executemany('''
+                UPDATE reminders SET next_reminder = ?, delivery_attempts = ?, retry_occurrence = ?, last_error = ?
+                WHERE id = ?
+            ''', retries)
+
+        self.dispatched += len(reminders)
+        self.failed += len(retries) + len(dead)
+        self.dead_lettered += len(dead)
+        for reminder, attempts, error in dead:
+            logging.error(f"Dead-lettered reminder {reminder['id']} after {attempts} attempts: {error}")
+        logging.info(f"Dispatched {len(reminders)} reminders ({len(retries)} to retry, {len(dead)} dead-lettered)")
+        return len(reminders)
+
+    def _deliver(self, reminder):
+        """Send one reminder; return (None, False) on success, else (error description, whether retrying is futile)."""
+        try:
+            if self.send(reminder):
+                return None, False
+            return f"{getattr(self.send, '__name__', 'send')} returned False", False
+        except ValueError as e:
+            # Missing or unknown contact details won't fix themselves on retry
+            return str(e) or type(e).__name__, True
+        except Exception as e:
+            return str(e) or type(e).__name__, False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', default='reminders.db')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+    configure_logging()
+
+    # Due reminders go through the durable outbox rather than being sent inline
+    outbox = NotificationOutbox(args.db).start()
+    dispatcher = ReminderDispatcher(args.db, send=outbox.enqueue_reminder, batch_size=args.batch_size,
+                                    max_workers=args.workers).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        dispatcher.stop()
+        outbox.close()
+
+
+if __name__ == '__main__':
+    main()
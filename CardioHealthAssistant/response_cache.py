@@ -0,0 +1,90 @@
+# response_cache.py
+
+import hashlib
+import re
+
+from caching import LRUCache
+
+# Prompts with numbers carry user-specific values (e.g. "my BP is 150/95") and are never cached
+_USER_VALUE_PATTERN = re.compile(r'\d')
+_NON_WORD_PATTERN = re.compile(r'[^a-z ]+')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_prompt(prompt):
+    """Lowercase, strip punctuation and collapse whitespace."""
+    text = _NON_WORD_PATTERN.sub(' ', prompt.lower())
+    return _WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+class ResponseCache:
+    def __init__(self, max_entries=1000, ttl=24 * 3600):
+        """
+        Local cache of model responses for repeated, generic health questions.
+
+        Only exact matches on the normalized prompt are served. Near
+        matches are never reused: for health advice a one-word change
+        ("start" vs "stop", "men" vs "women") can flip the right answer.
+
+        :param max_entries: Maximum number of cached responses (LRU eviction)
+        :param ttl: Seconds before a cached response expires
+        """
+        self._entries = LRUCache(max_entries=max_entries, ttl=ttl)
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def should_bypass(self, prompt, follow_up=False):
+        """
+        Return True for prompts that must go to the model.
+
+        :param prompt: The user's message
+        :param follow_up: Whether the prompt continues a conversation, so its reply depends on earlier turns
+        """
+        return follow_up or not normalize_prompt(prompt) or bool(_USER_VALUE_PATTERN.search(prompt))
+
+    def get(self, prompt, follow_up=False):
+        """
+        Return a cached response for the prompt, or None.
+
+        :param prompt: The user's message
+        :param follow_up: Whether the prompt continues a conversation; follow-ups are never served from the cache
+        """
+        if self.should_bypass(prompt, follow_up):
+            self.bypassed += 1
+            return None
+
+        response = self._entries.get(self._key(prompt))
+        if response is not None:
+            self.hits += 1
+            return response
+
+        self.misses += 1
+        return None
+
+    def put(self, prompt, response, follow_up=False):
+        """
+        Cache a model response for the prompt, unless the prompt must bypass the cache.
+
+        :param prompt: The user's message
+        :param response: The model's reply
+        :param follow_up: Whether the prompt continued a conversation when it was sent
+        """
+        if not response or self.should_bypass(prompt, follow_up):
+            return
+        self._entries.set(self._key(prompt), response)
+
+    @staticmethod
+    def _key(prompt):
+        return hashlib.sha256(normalize_prompt(prompt).encode('utf-8')).hexdigest()
+
+    def stats(self):
+        """Return hit/miss/bypass counters and current size."""
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypassed': self.bypassed,
+            'evictions': self._entries.evictions
+        }
@@ -0,0 +1,277 @@
+# server.py
+"""
+Async HTTP backend for the Flutter mobile app.
+
+Clients sign in with POST /login and send the returned session token as
+``Authorization: Bearer <token>``. User, metric and chat endpoints only
+serve the signed-in user's own data. /metrics and /debug/profiles are
+operational endpoints; keep them off the public network.
+
+Run with:
+    uvicorn server:app --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from auth import get_auth_manager
+from caching import LRUCache
+from chat import (
+    HISTORY_WINDOW,
+    add_health_metric as record_health_metric,
+    get_health_metrics_tracker,
+    get_metrics_db,
+    initialize_chat_session,
+    send_message_to_chatbot_async,
+)
+from chat_context import ChatContextManager
+from instrumentation import (
+    PROFILING_ENABLED,
+    SamplingProfiler,
+    new_profile_id,
+    recent_profiles,
+    record_profile,
+    registry,
+)
+from logging_setup import configure_logging
+from metrics_store import METRIC_COLUMNS, normalize_reading, to_naive_utc, utc_now
+
+# Chat sessions kept in memory per user
+CHAT_SESSION_MAX_USERS = 10000
+CHAT_SESSION_TTL = 3600
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'http_request_seconds', 'Seconds to handle an HTTP request', ['method', 'route', 'status']
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    Time every HTTP request by route template, and profile requests that ask for it.
+
+    With PROFILING_ENABLED set, a request with ``profile=1`` in its query
+    string is sampled on the event-loop thread while it runs. The response
+    carries an ``X-Profile-Id`` header naming the profile in /debug/profiles.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        profiler = profile_id = None
+        if PROFILING_ENABLED and b'profile=1' in scope.get('query_string', b'').split(b'&'):
+            profiler, profile_id = SamplingProfiler().start(), new_profile_id()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if profile_id is not None:
+                    message = {**message, 'headers': [*message.get('headers', []),
+                                                      (b'x-profile-id', profile_id.encode())]}
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Route templates keep label cardinality bounded; raw paths contain user IDs
+            route = scope.get('route')
+            path = getattr(route, 'path', 'unmatched')
+            HTTP_REQUEST_SECONDS.labels(scope['method'], path, str(status)).observe(time.perf_counter() - start)
+            if profiler is not None:
+                record_profile(f"{scope['method']} {path}", profiler.stop(), profile_id)
+
+
+# Log through a background writer thread so handlers never wait on file I/O
+configure_logging()
+
+app = FastAPI(title="Cardio-Health Assistant API")
+app.add_middleware(RequestMetricsMiddleware)
+
+# Model used for chat sessions; None means the configured Gemini model
+app.state.chat_model = None
+
+_chat_sessions = LRUCache(max_entries=CHAT_SESSION_MAX_USERS, ttl=CHAT_SESSION_TTL)
+
+
+class HealthMetricIn(BaseModel):
+    user_id: str
+    heart_rate: Optional[float] = None
+    systolic_pressure: Optional[float] = None
+    diastolic_pressure: Optional[float] = None
+    exercise_minutes: Optional[int] = None
+    timestamp: Optional[datetime] = None
+    blood_pressure: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class ChatRequest(BaseModel):
+    user_id: str
+    message: str
+
+
+class LoginRequest(BaseModel):
+    username: str
+    password: str
+
+
+async def authenticated_user(authorization: Optional[str] = Header(None)):
+    """User ID of the request's bearer session token; 401 if it is missing, unknown or expired."""
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        raise HTTPException(status_code=401, detail="Missing session token", headers={'WWW-Authenticate': 'Bearer'})
+    # Usually a session-cache hit; the threadpool covers the SQLite fallback
+    user_id = await run_in_threadpool(get_auth_manager().validate_session, token.strip())
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired session", headers={'WWW-Authenticate': 'Bearer'})
+    return user_id
+
+
+def require_same_user(current_user, user_id):
+    if str(user_id) != str(current_user):
+        raise HTTPException(status_code=403, detail="Not allowed to access another user's data")
+
+
+@app.post("/login")
+async def login(request: LoginRequest):
+    auth_manager = get_auth_manager()
+    token = await auth_manager.login_async(request.username, request.password)
+    if token is None:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    user_id = await run_in_threadpool(auth_manager.validate_session, token)
+    return {'user_id': user_id, 'session_token': token}
+
+
+@app.get("/users/{user_id}")
+async def get_user(user_id: str, current_user: str = Depends(authenticated_user)):
+    require_same_user(current_user, user_id)
+    row = await run_in_threadpool(get_auth_manager().get_user, user_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    tracker = await run_in_threadpool(get_health_metrics_tracker, user_id)
+    summary = tracker.get_metrics_summary()
+    return {
+        'id': row[0],
+        'name': row[1],
+        'email': row[2],
+        'age': 0,
+        'gender': '',
+        'weight': summary['weight']['last'] or 0.0,
+        'height': summary['height']['last'] or 0.0,
+        'profile_image_url': None,
+    }
+
+
+@app.get("/health-metrics/{user_id}")
+async def get_health_metrics(user_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                             current_user: str = Depends(authenticated_user)):
+    require_same_user(current_user, user_id)
+    start, end = to_naive_utc(start), to_naive_utc(end)
+    if start is None and end is None:
+        start = utc_now() - HISTORY_WINDOW
+    rows = await run_in_threadpool(get_metrics_db().fetch_range, user_id, start, end)
+
+    metrics = []
+    for row in rows:
+        reading = dict(zip(METRIC_COLUMNS, row[1:]))
+        metrics.append({
+            'id': f"{user_id}-{row[0]}",
+            'user_id': user_id,
+            'heart_rate': reading['heart_rate'] or 0.0,
+            'systolic_pressure': reading['bp_systolic'] or 0.0,
+            'diastolic_pressure': reading['bp_diastolic'] or 0.0,
+            'exercise_minutes': int(reading['exercise_minutes'] or 0),
+            'timestamp': row[0].replace(' ', 'T') + 'Z',
+            'notes': None,
+        })
+    return metrics
+
+
+@app.post("/health-metrics", status_code=201)
+async def add_health_metric(metric: HealthMetricIn, current_user: str = Depends(authenticated_user)):
+    require_same_user(current_user, metric.user_id)
+    values = {}
+    if metric.heart_rate is not None:
+        values['heart_rate'] = metric.heart_rate
+    if metric.systolic_pressure is not None and metric.diastolic_pressure is not None:
+        values['bp_systolic'] = metric.systolic_pressure
+        values['bp_diastolic'] = metric.diastolic_pressure
+    elif metric.blood_pressure:
+        values.update(normalize_reading({'blood_pressure': metric.blood_pressure}))
+    if metric.exercise_minutes is not None:
+        values['exercise_minutes'] = metric.exercise_minutes
+    if not values:
+        raise HTTPException(status_code=422, detail="No metric values provided")
+
+    # Stored readings are naive UTC, like bulk imports; naive client timestamps are taken as UTC
+    timestamp = to_naive_utc(metric.timestamp)
+
+    # Off the event loop: a first lookup loads history from SQLite, and the write pins the tracker
+    # under the registry's and the tracker's locks so it can't be spilled mid-write
+    alerts = await run_in_threadpool(record_health_metric, metric.user_id, timestamp=timestamp, **values)
+    return {
+        'status': 'created',
+        'alerts': [{'rule': alert.rule, 'severity': alert.severity, 'message': alert.message} for alert in alerts],
+    }
+
+
+@app.post("/chat")
+async def chat(request: ChatRequest, current_user: str = Depends(authenticated_user)):
+    require_same_user(current_user, request.user_id)
+    entry = _chat_sessions.get(request.user_id)
+    if entry is None:
+        entry = (initialize_chat_session(chat_model=app.state.chat_model), ChatContextManager(), asyncio.Lock())
+        _chat_sessions.set(request.user_id, entry)
+    chat_session, chat_context, lock = entry
+
+    # One in-flight message per user keeps each conversation ordered
+    async with lock:
+        try:
+            response = await send_message_to_chatbot_async(chat_session, request.message)
+        except Exception as e:
+            logging.error(f"Chat request failed for user {request.user_id}: {e}")
+            raise HTTPException(status_code=502, detail="The assistant is unavailable")
+        chat_context.record_exchange(chat_session, request.message, response)
+    return {'response': response}
+
+
+@app.get("/metrics")
+async def metrics(format: str = 'prometheus'):
+    """Hot-path counters and latency histograms, as Prometheus text or JSON (``?format=json``)."""
+    if format == 'json':
+        return registry.to_dict()
+    return PlainTextResponse(registry.to_prometheus(), media_type='text/plain; version=0.0.4')
+
+
+@app.get("/debug/profiles")
+async def list_profiles():
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    return [
+        {key: profile[key] for key in ('id', 'label', 'seconds', 'samples', 'top')}
+        for profile in reversed(recent_profiles)
+    ]
+
+
+@app.get("/debug/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """One profile's samples in collapsed-stack format, ready for flamegraph tools."""
+    for profile in recent_profiles:
+        if PROFILING_ENABLED and profile['id'] == profile_id:
+            return PlainTextResponse(profile['collapsed'])
+    raise HTTPException(status_code=404, detail="Profile not found")
@@ -0,0 +1,155 @@
+# sms_client.py
+
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import registry, timed
+from rate_limit import TokenBucket
+
+SMS_SEND_SECONDS = registry.histogram('sms_send_seconds', 'Seconds to send one SMS, including retries')
+SMS_SEND_ERRORS = registry.counter('sms_send_errors_total', 'SMS messages that could not be sent')
+
+TWILIO_API_URL = 'https://api.twilio.com'
+
+# Responses worth retrying: throttling and transient server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class SMSSendError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TwilioSMSClient:
+    def __init__(self, account_sid, auth_token, from_number, rate_limit=1.0, burst=None,
+                 max_retries=4, backoff_base=0.5, backoff_max=30.0, max_workers=8,
+                 timeout=10.0, base_url=TWILIO_API_URL, session=None):
+        """
+        Shared client for Twilio's Messages REST API.
+
+        Keeps one keep-alive HTTP session for all sends, limits the send rate
+        to the account's messages-per-second allowance with a token bucket,
+        and retries throttled or failed requests with jittered exponential
+        backoff.
+
+        :param account_sid: Twilio account SID
+        :param auth_token: Twilio auth token
+        :param from_number: Sending phone number
+        :param rate_limit: Messages per second allowed for the account
+        :param burst: Messages that may be sent back-to-back; defaults to ``rate_limit``
+        :param max_retries: Retries after the first attempt on 429/5xx or connection errors
+        :param backoff_base: Upper bound in seconds of the first backoff
+        :param backoff_max: Largest backoff in seconds
+        :param max_workers: Concurrent sends in ``send_many``
+        :param timeout: Per-request timeout in seconds
+        :param base_url: API root; point at a local stub for testing
+        :param session: requests.Session-compatible object used for HTTP calls
+        """
+        self.from_number = from_number
+        self.auth = (account_sid, auth_token)
+        self.url = f"{base_url.rstrip('/')}/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate_limit, burst)
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+        self._executor = None
+
+        self.sent = 0
+        self.retries = 0
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before retry ``attempt``, honoring Retry-After when given."""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # Full jitter keeps retrying senders from synchronizing
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @timed(SMS_SEND_SECONDS, errors=SMS_SEND_ERRORS)
+    def send(self, to, body):
+        """
+        Send one SMS, retrying transient failures.
+
+        :param to: Destination phone number
+        :param body: Message text
+        :return: Twilio message SID
+        :raises SMSSendError: If the message could not be sent
+        """
+        data = {'To': to, 'From': self.from_number, 'Body': body}
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            response = None
+            try:
+                response = self.session.post(self.url, data=data, auth=self.auth, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = SMSSendError(f"Request failed: {e}")
+            except (requests.RequestException, OSError, ValueError) as e:
+                # Malformed requests, TLS and other transport errors won't succeed on retry
+                raise SMSSendError(f"Request failed: {e}") from e
+            else:
+                if response.status_code < 300:
+                    self.sent += 1
+                    return self._message_sid(response)
+                error = SMSSendError(f"Twilio returned {response.status_code}: {response.text[:200]}",
+                                     response.status_code)
+                if response.status_code not in RETRY_STATUSES:
+                    raise error
+
+            if attempt == self.max_retries:
+                raise error
+            self.retries += 1
+            time.sleep(self._backoff(attempt, response))
+
+    @staticmethod
+    def _message_sid(response):
+        """SID from a successful send's response body, or None if the body can't be read."""
+        try:
+            payload = response.json()
+        except ValueError as e:
+            # The message was accepted, so an unreadable body must not turn into a failed (and retried) send
+            logging.warning(f"Twilio accepted a message but returned an unreadable body: {e}")
+            return None
+        return payload.get('sid') if isinstance(payload, dict) else None
+
+    def send_many(self, messages):
+        """
+        Send a batch of SMS concurrently.
+
+        :param messages: Iterable of (to, body) tuples
+        :return: List of booleans, one per message, True if it was sent
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sms-send')
+        return list(self._executor.map(lambda message: self._send_logged(*message), messages))
+
+    def _send_logged(self, to, body):
+        try:
+            self.send(to, body)
+            return True
+        except SMSSendError as e:
+            logging.error(f"Failed to send SMS to {to}: {e}")
+            return False
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.session.close()
@@ -0,0 +1,170 @@
+# smtp_pool.py
+
+import logging
+import queue
+import smtplib
+import ssl
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import registry, timed
+from rate_limit import TokenBucket
+
+SMTP_SEND_SECONDS = registry.histogram('smtp_send_seconds', 'Seconds to send one email, including retries')
+SMTP_SEND_ERRORS = registry.counter('smtp_send_errors_total', 'Emails that could not be sent')
+
+# Errors after which a pooled connection is discarded and the send retried once
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+class _PooledConnection:
+    """One pool slot: an SMTP connection plus its own rate limiter."""
+
+    def __init__(self, rate_limit):
+        self.smtp = None
+        self.sent = 0
+        self.last_used = 0.0
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+
+
+class SMTPConnectionPool:
+    def __init__(self, host, port, username=None, password=None, security='ssl', pool_size=4,
+                 rate_limit=None, max_messages_per_connection=100, idle_timeout=60.0, timeout=30.0):
+        """
+        Reuse authenticated SMTP connections across messages.
+
+        Connecting, negotiating TLS and logging in happens once per pooled
+        connection instead of once per email. Broken or stale connections
+        are reopened transparently and the message is retried once.
+
+        :param host: SMTP server host name
+        :param port: SMTP server port
+        :param username: Login user; no login is attempted if omitted
+        :param password: Login password
+        :param security: 'ssl' (implicit TLS), 'starttls' or 'none'
+        :param pool_size: Maximum open connections, and concurrent sends
+        :param rate_limit: Maximum messages per second per connection; None for unlimited
+        :param max_messages_per_connection: Reconnect after this many messages
+        :param idle_timeout: Reconnect connections unused for this many seconds
+        :param timeout: Socket timeout in seconds
+        """
+        if security not in ('ssl', 'starttls', 'none'):
+            raise ValueError(f"Unknown SMTP security mode: {security}")
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.security = security
+        self.pool_size = pool_size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self._ssl_context = ssl.create_default_context()
+        self._slots = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._slots.put(_PooledConnection(rate_limit))
+        self._executor = None
+
+        self.connections_opened = 0
+        self.messages_sent = 0
+
+    def _connect(self):
+        if self.security == 'ssl':
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=self._ssl_context)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == 'starttls':
+                smtp.starttls(context=self._ssl_context)
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        self.connections_opened += 1
+        return smtp
+
+    @staticmethod
+    def _disconnect(slot):
+        if slot.smtp is not None:
+            try:
+                slot.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                slot.smtp.close()
+        slot.smtp = None
+        slot.sent = 0
+
+    def _ensure_connected(self, slot):
+        stale = (
+            slot.sent >= self.max_messages_per_connection
+            or time.monotonic() - slot.last_used > self.idle_timeout
+        )
+        if slot.smtp is not None and stale:
+            self._disconnect(slot)
+        if slot.smtp is None:
+            slot.smtp = self._connect()
+
+    @timed(SMTP_SEND_SECONDS, errors=SMTP_SEND_ERRORS)
+    def send(self, message):
+        """
+        Send one email message over a pooled connection.
+
+        :param message: email.message.Message with From/To headers set
+        :raises smtplib.SMTPException: If the server rejects the message
+        """
+        slot = self._slots.get()
+        try:
+            if slot.bucket is not None:
+                slot.bucket.acquire()
+            for attempt in range(2):
+                try:
+                    self._ensure_connected(slot)
+                    slot.smtp.send_message(message)
+                    break
+                except CONNECTION_ERRORS:
+                    self._disconnect(slot)
+                    if attempt:
+                        raise
+            slot.sent += 1
+            slot.last_used = time.monotonic()
+            self.messages_sent += 1
+        except Exception:
+            # Don't hand a connection in an unknown protocol state to the next sender
+            if slot.smtp is not None and not self._is_healthy(slot.smtp):
+                self._disconnect(slot)
+            raise
+        finally:
+            self._slots.put(slot)
+
+    @staticmethod
+    def _is_healthy(smtp):
+        try:
+            return smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send_many(self, messages):
+        """
+        Send a batch of messages concurrently across the pool.
+
+        :param messages: Iterable of email.message.Message
+        :return: List of booleans, one per message, True if it was sent
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='smtp-send')
+        return list(self._executor.map(self._send_logged, messages))
+
+    def _send_logged(self, message):
+        try:
+            self.send(message)
+            return True
+        except Exception as e:
+            logging.error(f"Failed to send email to {message['To']}: {e}")
+            return False
+
+    def close(self):
+        """Close every pooled connection and the batch worker pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        for _ in range(self.pool_size):
+            slot = self._slots.get()
+            self._disconnect(slot)
+            self._slots.put(slot)
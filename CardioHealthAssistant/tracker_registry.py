@@ -0,0 +1,365 @@
+# tracker_registry.py
+"""
+Per-user trackers kept in memory under an LRU memory budget.
+
+When the resident trackers outgrow the budget, the least recently used
+ones are spilled to one compact .npy file each (the tracker's readings as
+a structured array) and dropped from memory. The next lookup rebuilds the
+tracker from its file, which is much cheaper than querying and parsing
+its history from SQLite again. Spill files are a cache: the metrics
+database stays the source of truth, and files are only read back by the
+registry instance that wrote them.
+
+An evicted tracker refuses further writes (TrackerEvictedError), since
+they would be missing from its spill file. Writers hold the tracker with
+``pinned``, which keeps it resident until they are done.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from instrumentation import registry
+
+# Bytes of tracker data (readings plus rollups) kept in memory before cold users are spilled
+TRACKER_MEMORY_BUDGET = int(float(os.getenv('TRACKER_MEMORY_BUDGET_MB', '512')) * 1024 * 1024)
+
+# Directory for spill files; a private temporary directory when unset
+TRACKER_SPILL_DIR = os.getenv('TRACKER_SPILL_DIR')
+
+TRACKER_LOOKUPS = registry.counter(
+    'tracker_registry_lookups_total', 'Tracker lookups by result (hit, reload from spill, miss)', ['result']
+)
+_HIT, _RELOAD, _MISS = (TRACKER_LOOKUPS.labels(result) for result in ('hit', 'reload', 'miss'))
+TRACKER_EVICTIONS = registry.counter('tracker_registry_evictions_total', 'Trackers evicted from memory to disk')
+TRACKER_RESIDENT_BYTES = registry.gauge('tracker_registry_resident_bytes', 'Bytes held by resident trackers')
+TRACKER_RESIDENT = registry.gauge('tracker_registry_resident_trackers', 'Trackers held in memory')
+TRACKER_SPILLED = registry.gauge('tracker_registry_spilled_trackers', 'Trackers held only in spill files')
+
+
+class TrackerEvictedError(RuntimeError):
+    """A write reached a tracker the registry has evicted; look the user up again."""
+
+
+class _Entry:
+    __slots__ = ('tracker', 'nbytes', 'version')
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.nbytes = tracker.nbytes
+        self.version = tracker.data_version
+
+
+class _Load:
+    __slots__ = ('done', 'stale')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.stale = False
+
+
+class TrackerRegistry:
+    def __init__(self, factory, loader=None, memory_budget=TRACKER_MEMORY_BUDGET, spill_dir=TRACKER_SPILL_DIR):
+        """
+        Hand out one tracker per user, spilling cold users to disk.
+
+        Trackers must provide ``nbytes``, ``data_version``, ``to_records()``
+        and ``load_records(records)``, as HealthMetricsTracker does. They must
+        also have an ``evicted`` attribute: once the registry sets it, the
+        tracker raises TrackerEvictedError on writes, and ``to_records()``
+        waits for writes already in progress.
+
+        :param factory: Callable(user_id) returning a new, empty tracker
+        :param loader: Optional callable(tracker) filling a new tracker from its source of truth on a miss
+        :param memory_budget: Bytes of resident tracker data before the least recently used are spilled
+        :param spill_dir: Directory for spill files; a temporary directory is created on first spill if None
+        """
+        self.factory = factory
+        self.loader = loader
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self._owns_spill_dir = False
+        self._resident = OrderedDict()  # user_id -> _Entry, least recently used first
+        self._spilling = {}  # user_id -> _Entry evicted but not yet written to disk; a new one per eviction
+        self._spilled = set()  # users whose current state is only in a spill file
+        self._pins = {}  # user_id -> callers inside ``pinned``; pinned trackers are never evicted
+        self._loading = {}  # user_id -> _Load for the thread currently building that user's tracker
+        self._lock = threading.Lock()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.reloads = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._resident)
+
+    def __contains__(self, user_id):
+        with self._lock:
+            return user_id in self._resident or user_id in self._spilling or user_id in self._spilled
+
+    def get(self, user_id):
+        """
+        Return the user's tracker, reloading it from its spill file or creating it as needed.
+
+        The tracker may be evicted at any time afterwards; use ``pinned`` to write to it.
+        """
+        return self._get(user_id, pin=False)
+
+    @contextmanager
+    def pinned(self, user_id):
+        """Context manager yielding the user's tracker, kept resident (and writable) until the block exits."""
+        tracker = self._get(user_id, pin=True)
+        try:
+            yield tracker
+        finally:
+            with self._lock:
+                count = self._pins.pop(user_id) - 1
+                if count:
+                    self._pins[user_id] = count
+                victims = self._collect_victims()
+            self._spill(victims)
+
+    def _get(self, user_id, pin):
+        while True:
+            with self._lock:
+                entry = self._resident.get(user_id)
+                if entry is None:
+                    # Evicted but not written out yet: take it straight back, writable again
+                    evicted = self._spilling.pop(user_id, None)
+                    if evicted is not None:
+                        evicted.tracker.evicted = False
+                        entry = self._insert(user_id, evicted.tracker)
+                        grew = True
+                else:
+                    self._resident.move_to_end(user_id)
+                    # Only a tracker that grew since its last lookup can push the registry over budget
+                    grew = self._refresh(entry)
+                if entry is not None:
+                    self.hits += 1
+                    if pin:
+                        self._pins[user_id] = self._pins.get(user_id, 0) + 1
+                    victims = self._collect_victims() if grew else ()
+                else:
+                    # One load per user at a time: a second loader could insert a copy
+                    # older than what the first one's callers have since written
+                    load = self._loading.get(user_id)
+                    owner = load is None
+                    if owner:
+                        load = self._loading[user_id] = _Load()
+                        spilled = user_id in self._spilled
+            if entry is not None:
+                _HIT.inc()
+                self._spill(victims)
+                return entry.tracker
+            if not owner:
+                load.done.wait()
+                continue
+
+            try:
+                # Build outside the lock so different users load concurrently
+                tracker = self._reload(user_id) if spilled else None
+                result = 'reload' if tracker is not None else 'miss'
+                if tracker is None:
+                    tracker = self.factory(user_id)
+                    if self.loader is not None:
+                        self.loader(tracker)
+            except BaseException:
+                with self._lock:
+                    del self._loading[user_id]
+                load.done.set()
+                raise
+
+            with self._lock:
+                del self._loading[user_id]
+                if load.stale:
+                    # Discarded while loading; what was loaded may predate the discard
+                    entry = None
+                else:
+                    if result == 'reload':
+                        self.reloads += 1
+                    else:
+                        self.misses += 1
+                    entry = self._insert(user_id, tracker)
+                    self._spilled.discard(user_id)
+                    if pin:
+                        self._pins[user_id] = self._pins.get(user_id, 0) + 1
+                    victims = self._collect_victims()
+            load.done.set()
+            if entry is None:
+                continue
+            (_RELOAD if result == 'reload' else _MISS).inc()
+            self._spill(victims)
+            return entry.tracker
+
+    def discard(self, user_id):
+        """Forget a user's tracker, in memory and on disk; the next lookup starts from the loader."""
+        with self._lock:
+            entry = self._resident.pop(user_id, None)
+            if entry is not None:
+                self.resident_bytes -= entry.nbytes
+                # Writes to the old instance would be missing from the one the loader builds
+                entry.tracker.evicted = True
+            evicted = self._spilling.pop(user_id, None)
+            if evicted is not None:
+                evicted.tracker.evicted = True
+            load = self._loading.get(user_id)
+            if load is not None:
+                load.stale = True
+            was_spilled = user_id in self._spilled
+            self._spilled.discard(user_id)
+            self._publish()
+        if was_spilled:
+            self._remove_file(user_id)
+
+    def stats(self):
+        """Return hit/reload/miss/eviction counters and current memory use."""
+        with self._lock:
+            return {
+                'resident': len(self._resident),
+                'resident_bytes': self.resident_bytes,
+                'memory_budget': self.memory_budget,
+                'spilled': len(self._spilled) + len(self._spilling),
+                'hits': self.hits,
+                'reloads': self.reloads,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def close(self):
+        """Drop every tracker and delete spill files."""
+        with self._lock:
+            spilled = list(self._spilled)
+            self._resident.clear()
+            self._spilling.clear()
+            self._spilled.clear()
+            self.resident_bytes = 0
+            self._publish()
+        if self._owns_spill_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+        else:
+            for user_id in spilled:
+                self._remove_file(user_id)
+
+    def _insert(self, user_id, tracker):
+        entry = _Entry(tracker)
+        self._resident[user_id] = entry
+        self.resident_bytes += entry.nbytes
+        return entry
+
+    def _refresh(self, entry):
+        """Re-measure a tracker whose data changed since it was last measured; return True if its size changed."""
+        version = entry.tracker.data_version
+        if version == entry.version:
+            return False
+        entry.version = version
+        nbytes = entry.tracker.nbytes
+        if nbytes == entry.nbytes:
+            return False
+        self.resident_bytes += nbytes - entry.nbytes
+        entry.nbytes = nbytes
+        return True
+
+    def _collect_victims(self):
+        """Pop least recently used, unpinned trackers until within budget, always keeping the most recent one."""
+        excess = self.resident_bytes - self.memory_budget
+        chosen = []
+        if excess > 0 and len(self._resident) > 1:
+            newest = next(reversed(self._resident))
+            for user_id, entry in self._resident.items():
+                if excess <= 0:
+                    break
+                if user_id != newest and user_id not in self._pins:
+                    chosen.append(user_id)
+                    excess -= entry.nbytes
+        victims = []
+        for user_id in chosen:
+            entry = self._resident.pop(user_id)
+            self.resident_bytes -= entry.nbytes
+            self._spilling[user_id] = entry
+            victims.append((user_id, entry))
+        if victims:
+            self.evictions += len(victims)
+            TRACKER_EVICTIONS.inc(len(victims))
+        self._publish()
+        return victims
+
+    def _spill(self, victims):
+        """Write evicted trackers to disk outside the lock, then mark them spilled."""
+        for user_id, entry in victims:
+            tracker = entry.tracker
+            with self._lock:
+                if self._spilling.get(user_id) is not entry:
+                    continue  # Looked up again or discarded since it was chosen
+                # Refuse new writes; to_records() below waits for any still in progress, so the file has them all
+                tracker.evicted = True
+            partial = None
+            try:
+                path = self._path(user_id)
+                partial = f"{path}.{threading.get_ident()}.tmp"
+                with open(partial, 'wb') as f:
+                    np.save(f, tracker.to_records(), allow_pickle=False)
+                with self._lock:
+                    # Only the current eviction may publish its file; an older snapshot of a
+                    # tracker that was taken back and evicted again must not replace a newer one
+                    current = self._spilling.get(user_id) is entry
+                    if current:
+                        os.replace(partial, path)
+                        del self._spilling[user_id]
+                        self._spilled.add(user_id)
+                        self._publish()
+            except (OSError, ValueError) as e:
+                # The database still has the readings, so the next lookup reloads from it
+                logging.error("Failed to spill tracker for user %s: %s", user_id, e)
+                with self._lock:
+                    if self._spilling.get(user_id) is entry:
+                        del self._spilling[user_id]
+                        self._publish()
+                current = False
+            if not current and partial is not None:
+                try:
+                    os.remove(partial)
+                except FileNotFoundError:
+                    pass
+
+    def _reload(self, user_id):
+        """Rebuild a tracker from its spill file, or return None if the file can't be read."""
+        path = self._path(user_id)
+        try:
+            records = np.load(path, allow_pickle=False)
+        except (OSError, ValueError) as e:
+            logging.warning("Failed to reload spilled tracker for user %s: %s", user_id, e)
+            return None
+        tracker = self.factory(user_id)
+        tracker.load_records(records)
+        self._remove_file(user_id)
+        return tracker
+
+    def _path(self, user_id):
+        if self.spill_dir is None:
+            with self._lock:
+                if self.spill_dir is None:
+                    self.spill_dir = tempfile.mkdtemp(prefix='cardio-trackers-')
+                    self._owns_spill_dir = True
+        os.makedirs(self.spill_dir, exist_ok=True)
+        # Hashed so any user ID makes a safe, fixed-length file name
+        digest = hashlib.sha256(str(user_id).encode()).hexdigest()[:32]
+        return os.path.join(self.spill_dir, f"{digest}.npy")
+
+    def _remove_file(self, user_id):
+        try:
+            os.remove(self._path(user_id))
+        except FileNotFoundError:
+            pass
+
+    def _publish(self):
+        TRACKER_RESIDENT_BYTES.set(self.resident_bytes)
+        TRACKER_RESIDENT.set(len(self._resident))
+        TRACKER_SPILLED.set(len(self._spilled) + len(self._spilling))